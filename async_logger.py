@@ -0,0 +1,145 @@
+import asyncio
+from global_config import settings
+from logger import _batch_rest, _thin_batch
+from storage import DISK_SAMPLE, DISK_STOP
+
+# Backoff while the worker is full: short enough to keep up with the writer,
+# long enough not to spin the event loop
+_MIN_WAIT = 0.0005
+_MAX_WAIT = 0.01
+
+
+class AsyncLogger:
+    # asyncio front end for a started Logger.
+    #
+    # Records published from coroutines are collected on the event loop and
+    # handed to the Logger's worker as one batch per loop iteration (or every
+    # batch_size records), so there is no thread hop per record. When the
+    # queue or ring is full the publishing coroutine waits instead of dropping.
+    # Use it from one event loop thread only.
+
+    def __init__(self, logger, encode=None, batch_size=None):
+        self.logger = logger
+        self.encode = encode
+        self.batch_size = batch_size or settings.BATCH_SIZE
+
+        self._pending = []
+        self._lock = asyncio.Lock()
+        self._flusher = None
+        self.waits = 0          # times a hand off had to wait for the worker
+
+    # =========================== PUBLISH ========================
+    async def publish(self, values):
+        if not self._active():
+            return
+
+        self._pending.append(values)
+
+        if len(self._pending) >= self.batch_size:
+            # Backpressure: the producer waits here while the worker is full
+            await self._hand_off()
+        elif self._flusher is None:
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_soon())
+
+    async def publish_many(self, records):
+        if not self._active():
+            return
+
+        async with self._lock:
+            try:
+                await self._send(self._take_pending())
+                await self._send(records)
+            except Exception as e:
+                print(f"Exception in async publish_many: {e}")
+
+    async def flush(self):
+        # Everything published so far has been written by the worker
+        await self._hand_off()
+
+        logger = self.logger
+        wait = _MIN_WAIT
+        while logger._writing():
+            if logger._ring is not None:
+                pending = logger._ring.readable()
+            else:
+                pending = logger.q.unfinished_tasks
+            if not pending and not logger._shared_pending():
+                return
+            await asyncio.sleep(wait)
+            wait = min(wait * 2, _MAX_WAIT)
+
+    async def close(self):
+        await self.flush()
+        if self._flusher is not None:
+            self._flusher.cancel()
+            self._flusher = None
+
+    # =========================== HAND OFF ========================
+    def _active(self):
+        return self.logger._running and self.logger._enabled
+
+    def _take_pending(self):
+        rows, self._pending = self._pending, []
+        return rows
+
+    async def _flush_soon(self):
+        # Let every coroutine that is ready publish first, then send one batch
+        try:
+            await asyncio.sleep(0)
+            await self._hand_off()
+        finally:
+            self._flusher = None
+
+    async def _hand_off(self):
+        async with self._lock:
+            try:
+                await self._send(self._take_pending())
+            except Exception as e:
+                print(f"Exception in async publish: {e}")
+
+    async def _send(self, records):
+        if records is None or len(records) == 0:
+            return
+
+        logger = self.logger
+        batch = logger._build_batch(records, self.encode)
+        if not batch:
+            return
+
+        # Disk filling up: same thinning as publish_many, the gap follows the kept records
+        thinned = 0
+        if logger._disk_mode >= DISK_STOP:
+            logger._lose("disk_full", len(batch))
+            return
+        if logger._disk_mode >= DISK_SAMPLE:
+            kept = _thin_batch(batch, settings.STORAGE_SAMPLE_EVERY)
+            thinned = len(batch) - len(kept)
+            batch = kept
+
+        try:
+            wait = _MIN_WAIT
+            while True:
+                taken = logger._offer(batch)
+                if taken == len(batch):
+                    return
+
+                if taken:
+                    batch = _batch_rest(batch, taken)
+                    wait = _MIN_WAIT
+
+                if not self._active():
+                    logger._lose("dropped_newest", len(batch))
+                    return
+
+                self.waits += 1
+                await asyncio.sleep(wait)
+                wait = min(wait * 2, _MAX_WAIT)
+        finally:
+            if thinned:
+                logger._lose("disk_sampled", thinned)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
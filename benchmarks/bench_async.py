@@ -0,0 +1,110 @@
+# Event loop latency while logging from coroutines, run from the repo root:
+#   python benchmarks/bench_async.py [rate] [seconds]
+import sys
+import time
+import shutil
+import asyncio
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from global_config import settings
+from logger import Logger
+from async_logger import AsyncLogger
+from benchmarks.common import TELEMETRY_HEADERS, TELEMETRY_VALUES
+
+TICK = 0.001        # producer and probe period
+
+
+# =========================== LOOP LAG PROBE ========================
+async def probe(stop, lags):
+    # How late a 1 ms timer fires is how long something else held the loop
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK
+        await asyncio.sleep(TICK)
+        lags.append(max(loop.time() - expected, 0.0))
+
+
+async def producer(publish, rate, seconds):
+    # Publishes rate * TICK records per tick, catching up if a tick ran late
+    loop = asyncio.get_running_loop()
+    values = TELEMETRY_VALUES
+    start = loop.time()
+    sent = 0
+
+    while True:
+        elapsed = loop.time() - start
+        if elapsed >= seconds:
+            break
+        due = int(elapsed * rate)
+        while sent < due:
+            await publish(values)
+            sent += 1
+        await asyncio.sleep(TICK)
+
+    return sent
+
+
+# =========================== MODES ========================
+async def run(mode, rate, seconds):
+    tmp = Path(tempfile.mkdtemp(prefix="bench_async_"))
+    settings.LOG_DIRECTORY = tmp
+    settings.MAX_FILE_SIZE_MB = 64
+
+    logger = Logger()
+    logger.initialize("bin", compress=False)
+    logger.headers(*TELEMETRY_HEADERS)
+    logger.start()
+
+    alog = AsyncLogger(logger, encode=True)
+
+    async def publish_sync(values):
+        logger.publish(values, encode=True)
+
+    async def publish_none(values):
+        pass
+
+    publish = {
+        "none": publish_none,
+        "sync": publish_sync,
+        "async": alog.publish,
+    }[mode]
+
+    stop = asyncio.Event()
+    lags = []
+    probe_task = asyncio.get_running_loop().create_task(probe(stop, lags))
+
+    try:
+        start = time.perf_counter()
+        sent = await producer(publish, rate, seconds)
+        await alog.close()
+        elapsed = time.perf_counter() - start
+    finally:
+        stop.set()
+        await probe_task
+        logger.stop()
+        logger._worker.join()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    lags.sort()
+    ms = lambda q: lags[min(int(len(lags) * q), len(lags) - 1)] * 1000
+    print(
+        f"[Bench] {mode:<5}: {sent / elapsed:9.0f} rec/s, "
+        f"loop lag p50 {ms(0.5):6.3f} ms  p99 {ms(0.99):6.3f} ms  max {lags[-1] * 1000:6.3f} ms, "
+        f"dropped {logger.dropped_count}, waits {alog.waits}"
+    )
+
+
+def main():
+    rate = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    seconds = float(sys.argv[2]) if len(sys.argv) > 2 else 3.0
+
+    print(f"[Bench] {rate} rec/s for {seconds:.0f} s, 13-field typed bin, 1 ms timer probe")
+    for mode in ("none", "sync", "async"):
+        asyncio.run(run(mode, rate, seconds))
+
+
+if __name__ == "__main__":
+    main()
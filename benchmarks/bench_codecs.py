@@ -0,0 +1,109 @@
+# Compression ratio vs speed of every registered codec, run from the repo root:
+#   python benchmarks/bench_codecs.py [log files or directories ...]
+# Without arguments, sample csv / bin / tlv.bin telemetry payloads are generated.
+import os
+import sys
+import time
+import random
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import compressors
+from logger import Logger
+from benchmarks.common import TELEMETRY_HEADERS, TELEMETRY_VALUES
+
+SAMPLE_RECORDS = 100_000
+
+
+# =========================== PAYLOADS ========================
+def _telemetry_rows(n):
+    rng = random.Random(0)
+    ts = 45_000_000
+    for _ in range(n):
+        ts += rng.randint(0, 2)
+        row = list(TELEMETRY_VALUES)
+        row[0] = ts
+        row[3] += rng.uniform(-0.01, 0.01)   # a couple of noisy channels
+        row[4] += rng.uniform(-0.001, 0.001)
+        yield row
+
+
+def _encoded_payload(file_type, headers, n):
+    logger = Logger()
+    logger.file_type = file_type
+    logger.headers(*headers)
+
+    if file_type == "csv":
+        body = b"".join(
+            (",".join(map(str, row)) + "\n").encode("utf-8") for row in _telemetry_rows(n)
+        )
+    elif file_type == "bin":
+        body = b"".join(logger._encode_record_bin(row) for row in _telemetry_rows(n))
+    else:
+        body = b"".join(logger._encode_record_tlvbin(row) for row in _telemetry_rows(n))
+
+    return logger.headers_blob + body
+
+
+def sample_payloads():
+    untyped = [h.split(":")[0] for h in TELEMETRY_HEADERS]
+    return {
+        "csv": _encoded_payload("csv", untyped, SAMPLE_RECORDS),
+        "bin": _encoded_payload("bin", TELEMETRY_HEADERS, SAMPLE_RECORDS),
+        "tlv.bin": _encoded_payload("tlv.bin", untyped, SAMPLE_RECORDS),
+    }
+
+
+def recorded_payloads(paths):
+    payloads = {}
+    for arg in paths:
+        p = Path(arg)
+        files = sorted(f for f in p.iterdir() if f.is_file() and not f.name.startswith(".")) \
+            if p.is_dir() else [p]
+        for f in files:
+            with compressors.open_log(f) as fh:
+                payloads[f.name] = fh.read()
+    return payloads
+
+
+# =========================== MEASURE ========================
+def measure(codec, level, payload, tmp):
+    path = os.path.join(tmp, "payload" + codec.suffix)
+
+    start = time.perf_counter()
+    with codec.open(path, "wb", level) as f:
+        f.write(payload)
+    compress_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with codec.open(path, "rb") as f:
+        while f.read(1024 * 1024):
+            pass
+    decompress_s = time.perf_counter() - start
+
+    size = os.path.getsize(path)
+    os.unlink(path)
+
+    mb = len(payload) / (1024 * 1024)
+    return len(payload) / size, mb / compress_s, mb / decompress_s
+
+
+def main():
+    payloads = recorded_payloads(sys.argv[1:]) if len(sys.argv) > 1 else sample_payloads()
+
+    with tempfile.TemporaryDirectory(prefix="bench_codecs_") as tmp:
+        for name, payload in payloads.items():
+            print(f"\n[Bench] {name}: {len(payload) / (1024 * 1024):.2f} MB")
+            print(f"{'codec':<6} {'level':>5} {'ratio':>7} {'comp MB/s':>10} {'decomp MB/s':>12}")
+
+            for codec in compressors.CODECS.values():
+                levels = sorted({codec.levels[0], codec.default_level, codec.levels[-1]})
+                for level in levels:
+                    ratio, comp, decomp = measure(codec, level, payload, tmp)
+                    print(f"{codec.name:<6} {level:>5} {ratio:>7.2f} {comp:>10.1f} {decomp:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
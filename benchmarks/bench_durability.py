@@ -0,0 +1,99 @@
+# Throughput of every durability policy, run from the repo root:
+#   python benchmarks/bench_durability.py [records] [log directory]
+# The log directory should be on the disk the logger writes to in production,
+# fsync costs depend entirely on it (tmpfs makes every sync free).
+import os
+import sys
+import time
+import shutil
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import binary_format
+from global_config import settings
+from logger import Logger
+from benchmarks.common import TELEMETRY_HEADERS, TELEMETRY_VALUES
+
+# (policy, interval_ms, bytes_kb)
+POLICIES = [
+    ("none", None, None),
+    ("rotation", None, None),
+    ("interval", 1000, None),
+    ("interval", 100, None),
+    ("interval", 10, None),
+    ("bytes", None, 4096),
+    ("bytes", None, 256),
+    ("bytes", None, 0),     # every batch
+]
+NAIVE_RECORDS = 2000
+
+
+# =========================== BASELINE ========================
+def bench_naive(base, record):
+    # What the policies avoid: one write + fsync per record
+    path = os.path.join(base, "naive.bin")
+    start = time.perf_counter()
+    with open(path, "wb", buffering=0) as f:
+        for _ in range(NAIVE_RECORDS):
+            f.write(record)
+            os.fsync(f.fileno())
+    elapsed = time.perf_counter() - start
+    os.unlink(path)
+    return NAIVE_RECORDS / elapsed
+
+
+# =========================== LOGGER ========================
+def bench_policy(base, n, writer, policy, interval_ms, bytes_kb):
+    tmp = Path(tempfile.mkdtemp(prefix="bench_durability_", dir=base))
+    settings.LOG_DIRECTORY = tmp
+    settings.MAX_FILE_SIZE_MB = 64
+    settings.WRITER = writer
+    settings.DURABILITY_POLICY = policy
+    settings.DURABILITY_INTERVAL_MS = interval_ms or 1000
+    settings.DURABILITY_BYTES_KB = 4096 if bytes_kb is None else bytes_kb
+
+    try:
+        logger = Logger()
+        logger.initialize("bin", compress=False)
+        logger.headers(*TELEMETRY_HEADERS)
+        logger.start()
+
+        rows = [TELEMETRY_VALUES] * 1000
+        start = time.perf_counter()
+        for _ in range(n // len(rows)):
+            logger.publish_many(rows, encode=True)
+        logger.stop()
+        logger._worker.join()
+        elapsed = time.perf_counter() - start
+        return n / elapsed, logger.metrics.fsync.snapshot()
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    base = sys.argv[2] if len(sys.argv) > 2 else None
+    settings.METRICS_JSON_PATH = None
+    settings.METRICS_PROMETHEUS_PATH = None
+    settings.OVERFLOW_POLICY = "block"
+
+    record = binary_format.compile_struct([h.split(":")[1] for h in TELEMETRY_HEADERS]).pack(*TELEMETRY_VALUES)
+    with tempfile.TemporaryDirectory(prefix="bench_durability_", dir=base) as tmp:
+        print(f"[Bench] {n} records, 13-field typed bin, in {tmp}")
+        print(f"[Bench] naive fsync per record: {bench_naive(tmp, record):12.0f} rec/s")
+        print(f"{'writer':<9}{'policy':<16}{'rec/s':>12}{'syncs':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+
+        for writer in ("buffered", "mmap"):
+            for policy, interval_ms, bytes_kb in POLICIES:
+                label = policy + (f" {interval_ms}ms" if interval_ms else "") + (f" {bytes_kb}KB" if bytes_kb is not None else "")
+                rate, fsync = bench_policy(tmp, n, writer, policy, interval_ms, bytes_kb)
+                print(
+                    f"{writer:<9}{label:<16}{rate:>12.0f}{fsync['count']:>8}"
+                    f"{fsync['p50_s'] * 1e3:>9.2f}{fsync['p99_s'] * 1e3:>9.2f}{fsync['max_s'] * 1e3:>9.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
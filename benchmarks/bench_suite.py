@@ -0,0 +1,409 @@
+# Headless benchmark of every format and pipeline stage, run from any directory:
+#   python benchmarks/bench_suite.py [--records N] [--out results.json] [--compare old.json]
+# Results are written as JSON so runs of two versions can be compared.
+import io
+import sys
+import json
+import time
+import shutil
+import struct
+import argparse
+import platform
+import tempfile
+import subprocess
+import contextlib
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from openpyxl import Workbook
+from global_config import settings
+from logger import Logger, _csv_line
+from convertors.bin_to_csv import convert_bin_to_csv
+from benchmarks.common import (
+    TELEMETRY_HEADERS, TELEMETRY_VALUES, DICT3_HEADERS, DICT3_RECORD,
+)
+
+SHAPES = {
+    "dict3": (DICT3_HEADERS, DICT3_RECORD),
+    "telemetry13": (TELEMETRY_HEADERS, TELEMETRY_VALUES),
+}
+
+# "bin-typed" is bin with name:type headers (fixed width LOG1 v2 records),
+# "tlv2" tlv.bin with tlv.version 2 (no delta field or dictionary)
+FORMATS = ("csv", "bin", "bin-typed", "tlv.bin", "tlv2", "col.bin", "xlsx")
+TYPED = ("bin-typed", "col.bin")
+
+XLSX_SHARE = 10     # xlsx is this many times slower, it gets fewer records
+
+
+# =========================== HELPERS ========================
+def _file_type(fmt):
+    return {"bin-typed": "bin", "tlv2": "tlv.bin"}.get(fmt, fmt)
+
+
+def _headers(fmt, shape):
+    headers = SHAPES[shape][0]
+    if fmt in TYPED:
+        return headers
+    return tuple(h.split(":")[0] for h in headers)
+
+
+def _record(shape):
+    record = SHAPES[shape][1]
+    return dict(record) if isinstance(record, dict) else list(record)
+
+
+def _values(shape):
+    record = SHAPES[shape][1]
+    return list(record.values()) if isinstance(record, dict) else list(record)
+
+
+def _configure(fmt, log_dir=None, max_file_size_mb=64, writer="buffered"):
+    # Same settings for every run, whatever config.yaml says: everything
+    # on the write path is pinned, so results of two checkouts compare
+    settings.LOG_DIRECTORY = log_dir
+    settings.MAX_FILE_SIZE_MB = max_file_size_mb
+
+    # Storage: no retention, and the disk monitor never leaves normal
+    settings.LOG_DIRECTORY_MAX_SIZE_MB = 1_000_000
+    settings.MAX_DIRECTORY_WARNING_THRESHOLD = 100
+    settings.MAX_FILES = 1_000_000
+    settings.STORAGE_COMPRESS_PERCENT = 100
+    settings.STORAGE_SAMPLE_PERCENT = 100
+    settings.STORAGE_THRESHOLD_PERCENT = 100
+    settings.STORAGE_SAMPLE_EVERY = 10
+    settings.STORAGE_RECOVER_MARGIN_PERCENT = 2
+    settings.STORAGE_POLL_INTERVAL_S = 0
+
+    settings.COMPRESS_EXECUTOR = "process"
+    settings.COMPRESS_WORKERS = 1
+    settings.COMPRESS_MAX_PENDING = 4
+    settings.COMPRESS_CODEC = "gzip"
+    settings.COMPRESS_LEVEL = None
+    settings.COMPRESS_STREAMING = False
+
+    settings.OVERFLOW_POLICY = "block"
+    settings.OVERFLOW_BLOCK_TIMEOUT_MS = 60_000
+    settings.GAP_MARKERS = False
+
+    settings.DURABILITY_POLICY = "none"
+    settings.ROTATION_INTERVAL_S = 0
+    settings.ROTATION_RECORDS = 0
+    settings.ROTATION_PREPARE_NEXT = True
+    settings.FRAMING_ENABLED = False
+    settings.FRAMING_RESUME = False
+    settings.INDEX_ENABLED = False
+
+    settings.TLV_VERSION = 2 if fmt == "tlv2" else 1
+    settings.TLV_FLOAT32 = "exact"
+    settings.TLV_DELTA_FIELD = None
+    settings.TLV_DICTIONARY_SIZE = 0
+    settings.COLUMNAR_BLOCK_ROWS = 65536
+    settings.COLUMNAR_CODEC = "zlib"
+    settings.COLUMNAR_LEVEL = None
+
+    settings.METRICS_LATENCY_SAMPLE_EVERY = 64
+    settings.METRICS_JSON_PATH = None
+    settings.METRICS_PROMETHEUS_PATH = None
+
+    settings.QUEUE_SIZE = 100_000
+    settings.BATCH_SIZE = 4096
+    settings.BATCH_BYTES = 1024 * 1024
+    settings.MAX_LINGER_MS = 0
+    settings.TRANSPORT = "queue"
+    settings.WRITER = writer
+    settings.STREAM_WORKERS = 1
+
+    settings.XLSX_MAX_ROWS = 1_000_000
+    settings.XLSX_DEFERRED = False
+
+
+def _best(repeat, fn):
+    # Fastest of `repeat` runs; fn returns (seconds, extra dict)
+    runs = [fn() for _ in range(repeat)]
+    return min(runs, key=lambda run: run[0])
+
+
+def _result(bench, fmt, shape, records, seconds, **extra):
+    return {
+        "name": "/".join(p for p in (bench, fmt, shape) if p),
+        "bench": bench,
+        "format": fmt,
+        "shape": shape,
+        "records": records,
+        "seconds": seconds,
+        "records_per_s": records / seconds if seconds else 0.0,
+        "ns_per_record": seconds * 1e9 / records if records else 0.0,
+        **extra,
+    }
+
+
+# =========================== ENCODE ========================
+def bench_encode(fmt, shape, n, repeat):
+    values = _values(shape)
+    _configure(fmt)
+
+    if fmt == "xlsx":
+        def run():
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet(title="log")
+            start = time.perf_counter()
+            for _ in range(n):
+                ws.append(list(values))
+            seconds = time.perf_counter() - start
+            wb.save(io.BytesIO())   # finish the sheet's row writer
+            return seconds, {}
+    elif fmt == "col.bin":
+        # Rows are encoded a block at a time: collect, transpose, compress
+        logger = Logger()
+        logger.file_type = "col.bin"
+        logger.headers(*_headers(fmt, shape))
+        columns, blocks = logger._columns, []
+        columns.write = blocks.append
+
+        def run():
+            blocks.clear()
+            start = time.perf_counter()
+            for _ in range(n):
+                columns.add(values)
+            columns.flush()
+            return time.perf_counter() - start, {"record_bytes": sum(map(len, blocks)) / n}
+    else:
+        logger = Logger()
+        logger.file_type = _file_type(fmt)
+        logger.headers(*_headers(fmt, shape))
+        encode = {
+            "csv": _csv_line,
+            "bin": logger._encode_record_bin,
+            "bin-typed": logger._encode_record_bin,
+            "tlv.bin": logger._encode_record_tlvbin,
+            "tlv2": logger._encode_record_tlvbin,
+        }[fmt]
+
+        def run():
+            start = time.perf_counter()
+            for _ in range(n):
+                encode(values)
+            return time.perf_counter() - start, {"record_bytes": len(encode(values))}
+
+    seconds, extra = _best(repeat, run)
+    return _result("encode", fmt, shape, n, seconds, **extra)
+
+
+# =========================== PIPELINE ========================
+def _run_logger(fmt, shape, n, batch=0, max_file_size_mb=64, compress=False, writer="buffered"):
+    # Publishes n records and waits for the worker to write all of them.
+    # Returns (publish seconds, end to end seconds, logger, files written).
+    tmp = Path(tempfile.mkdtemp(prefix="bench_suite_"))
+    _configure(fmt, tmp, max_file_size_mb, writer)
+    if compress:
+        settings.MAX_FILES = 2      # every rotation hands a file to the compressor
+
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            logger = Logger()
+            logger.initialize(_file_type(fmt), compress=compress)
+            logger.headers(*_headers(fmt, shape))
+            logger.start()
+
+            record = _record(shape)
+            start = time.perf_counter()
+            if batch:
+                rows = [record] * batch
+                for _ in range(n // batch):
+                    logger.publish_many(rows, encode=True)
+            else:
+                for _ in range(n):
+                    logger.publish(record, encode=True)
+            published = time.perf_counter() - start
+
+            logger.stop()
+            logger._worker.join()
+            drained = time.perf_counter() - start
+
+        files = sum(1 for f in tmp.iterdir() if f.name.startswith("log_"))
+        return published, drained, logger, files
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def bench_pipeline(fmt, shape, n, repeat, batch=0):
+    def run():
+        published, drained, logger, _ = _run_logger(fmt, shape, n, batch)
+        return drained, {
+            "publish_ns_per_record": published * 1e9 / n,
+            "written": logger.metrics.records_written,
+            "dropped": logger.dropped_count,
+        }
+
+    seconds, extra = _best(repeat, run)
+    bench = "publish_many" if batch else "publish"
+    return _result(bench, fmt, shape, n, seconds, batch=batch, **extra)
+
+
+def bench_rotation(fmt, shape, n, repeat, small_mb):
+    # Same records into one big file vs many small ones
+    def run(max_mb, compress=False):
+        def once():
+            _, drained, logger, files = _run_logger(fmt, shape, n, 1000, max_mb, compress)
+            return drained, {
+                "files": files,
+                "rotation_mean_s": logger.metrics.rotation.snapshot()["mean_s"],
+                "compress_logs_mean_s": logger.metrics.compress_logs.snapshot()["mean_s"],
+            }
+        return _best(repeat, once)
+
+    base, _ = run(64)
+    rotated, rot_extra = run(small_mb)
+    compressed, comp_extra = run(small_mb, compress=True)
+
+    return [
+        _result("rotation", fmt, shape, n, rotated, file_mb=small_mb,
+                overhead_pct=(rotated / base - 1) * 100, **rot_extra),
+        _result("compression", fmt, shape, n, compressed, file_mb=small_mb,
+                codec=settings.COMPRESS_CODEC, executor=settings.COMPRESS_EXECUTOR,
+                overhead_pct=(compressed / rotated - 1) * 100, **comp_extra),
+    ]
+
+
+def bench_writer(fmt, shape, n, repeat, writer):
+    # Batched publishing keeps the producer ahead, so the file writer is the limit
+    def run():
+        _, drained, _, _ = _run_logger(fmt, shape, n, 1000, 4, writer=writer)
+        return drained, {}
+
+    seconds, extra = _best(repeat, run)
+    return _result(f"writer-{writer}", fmt, shape, n, seconds, file_mb=4, **extra)
+
+
+# =========================== CONVERTER ========================
+def _converter_input(path, shape, n):
+    # The layout convertors/bin_to_csv.py reads: LOG1 header, then
+    # [u16 len][ [u16 len][utf-8 value] per field ] per record
+    names = [h.split(":")[0] for h in SHAPES[shape][0]]
+    payload = b"".join(
+        struct.pack("<H", len(v)) + v for v in (str(x).encode("utf-8") for x in _values(shape))
+    )
+    record = struct.pack("<H", len(payload)) + payload
+
+    header = bytearray(b"LOG1\x01")
+    header.append(len(names))
+    for name in names:
+        b = name.encode("utf-8")
+        header.append(len(b))
+        header += b
+
+    with open(path, "wb") as f:
+        f.write(header)
+        f.write(record * n)
+
+
+def bench_converter(shape, n, repeat):
+    tmp = Path(tempfile.mkdtemp(prefix="bench_suite_"))
+    try:
+        src, dst = tmp / "in.bin", tmp / "out.csv"
+        _converter_input(src, shape, n)
+
+        def run():
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                convert_bin_to_csv(src, dst)
+            return time.perf_counter() - start, {"input_bytes": src.stat().st_size}
+
+        seconds, extra = _best(repeat, run)
+        return _result("convert_bin_to_csv", None, shape, n, seconds, **extra)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# =========================== REPORT ========================
+def _meta(args):
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=Path(__file__).resolve().parent.parent,
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "records": args.records,
+        "repeat": args.repeat,
+    }
+
+
+def compare(results, baseline_path, tolerance):
+    # Names whose throughput fell by more than tolerance vs the baseline run
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {r["name"]: r for r in json.load(f)["results"]}
+
+    regressions = []
+    for r in results:
+        old = baseline.get(r["name"])
+        if not old or not old["records_per_s"]:
+            continue
+        change = r["records_per_s"] / old["records_per_s"] - 1
+        if change < -tolerance:
+            regressions.append((r["name"], old["records_per_s"], r["records_per_s"], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Logger benchmark suite")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=3, help="best of N runs")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--rotate-mb", type=float, default=0.5, help="small file size for the rotation run")
+    args = parser.parse_args()
+
+    n = args.records
+    results = []
+
+    def add(result):
+        results.append(result)
+        print(
+            f"[Bench] {result['name']:<42} {result['records_per_s']:12.0f} rec/s "
+            f"{result['ns_per_record']:10.0f} ns/rec"
+        )
+
+    for shape in SHAPES:
+        for fmt in FORMATS:
+            count = n // XLSX_SHARE if fmt == "xlsx" else n
+            add(bench_encode(fmt, shape, count, args.repeat))
+            add(bench_pipeline(fmt, shape, count, args.repeat))
+            add(bench_pipeline(fmt, shape, count, args.repeat, batch=1000))
+
+    for fmt in ("csv", "bin-typed", "tlv.bin", "tlv2", "col.bin"):
+        for result in bench_rotation(fmt, "telemetry13", n, args.repeat, args.rotate_mb):
+            add(result)
+
+    for fmt in ("csv", "bin-typed", "tlv.bin", "tlv2", "col.bin"):
+        for writer in ("buffered", "mmap"):
+            add(bench_writer(fmt, "telemetry13", n * 4, args.repeat, writer))
+
+    for shape in SHAPES:
+        add(bench_converter(shape, n, args.repeat))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"meta": _meta(args), "results": results}, f, indent=2)
+    print(f"[Bench] Results written to {args.out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for name, old, new, change in regressions:
+            print(f"[Bench] REGRESSION {name}: {old:.0f} -> {new:.0f} rec/s ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"[Bench] No regressions beyond {args.tolerance:.0%} vs {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
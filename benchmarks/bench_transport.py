@@ -0,0 +1,134 @@
+# Queue vs ring buffer transport, run from the repo root:
+#   python benchmarks/bench_transport.py [records]
+import sys
+import time
+import queue
+import shutil
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import binary_format
+from global_config import settings
+from logger import Logger
+from ring_buffer import RingBuffer
+from benchmarks.common import TELEMETRY_HEADERS, TELEMETRY_VALUES
+
+# =========================== RAW TRANSPORT ========================
+def bench_queue(n, st):
+    q = queue.Queue(maxsize=settings.QUEUE_SIZE)
+    received = 0
+
+    def consumer():
+        nonlocal received
+        while received < n:
+            try:
+                q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            received += 1
+
+    t = threading.Thread(target=consumer)
+    start = time.perf_counter()
+    t.start()
+
+    values = TELEMETRY_VALUES
+    sent = 0
+    while sent < n:
+        try:
+            q.put_nowait(st.pack(*values))
+            sent += 1
+        except queue.Full:
+            time.sleep(0)
+
+    t.join()
+    return time.perf_counter() - start
+
+
+def bench_ring(n, st):
+    ring = RingBuffer(settings.RING_SLOTS, st.size, fixed=True)
+    received = 0
+
+    def consumer():
+        nonlocal received
+        while received < n:
+            offset, count = ring.read_region(settings.BATCH_SIZE)
+            if not count:
+                time.sleep(0)
+                continue
+            with ring.data[offset:offset + count * ring.slot_size] as region:
+                len(region)
+            ring.release(count)
+            received += count
+
+    t = threading.Thread(target=consumer)
+    start = time.perf_counter()
+    t.start()
+
+    values = TELEMETRY_VALUES
+    pack_into = st.pack_into
+    data = ring.data
+    sent = 0
+    while sent < n:
+        offset = ring.claim()
+        if offset < 0:
+            time.sleep(0)
+            continue
+        pack_into(data, offset, *values)
+        ring.commit()
+        sent += 1
+
+    t.join()
+    return time.perf_counter() - start
+
+
+# =========================== END TO END ========================
+def bench_logger(n, transport):
+    tmp = Path(tempfile.mkdtemp(prefix="bench_transport_"))
+    settings.LOG_DIRECTORY = tmp
+    settings.TRANSPORT = transport
+    settings.MAX_FILE_SIZE_MB = 64
+
+    try:
+        logger = Logger()
+        logger.initialize("bin", compress=False)
+        logger.headers(*TELEMETRY_HEADERS)
+        logger.start()
+
+        values = TELEMETRY_VALUES
+        start = time.perf_counter()
+        for _ in range(n):
+            logger.publish(values, encode=True)
+        produced = time.perf_counter() - start
+
+        logger.stop()
+        logger._worker.join()
+        drained = time.perf_counter() - start
+        return produced, drained, logger.dropped_count
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    st = binary_format.compile_struct([h.split(":")[1] for h in TELEMETRY_HEADERS])
+
+    print(f"[Bench] {n} records, 13-field telemetry ({st.size} bytes/record)")
+
+    elapsed = bench_queue(n, st)
+    print(f"[Bench] raw queue.Queue   : {n / elapsed:12.0f} rec/s")
+    elapsed = bench_ring(n, st)
+    print(f"[Bench] raw RingBuffer    : {n / elapsed:12.0f} rec/s")
+
+    for transport in ("queue", "ring"):
+        produced, drained, dropped = bench_logger(n, transport)
+        print(
+            f"[Bench] Logger {transport:<5}      : publish {n / produced:12.0f} rec/s, "
+            f"end-to-end {n / drained:12.0f} rec/s, dropped {dropped}"
+        )
+
+
+if __name__ == "__main__":
+    main()
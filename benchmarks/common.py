@@ -0,0 +1,31 @@
+# Shared record shapes for the benchmarks
+
+TELEMETRY_HEADERS = (
+    "timestamp:u32",
+    "degrees0:f32", "degrees1:f32",
+    "volts0:f32", "amps0:f32", "watts0:f32",
+    "volts1:f32", "amps1:f32", "watts1:f32",
+    "satellite_count:u8",
+    "heading:f32",
+    "latitude:f32", "longitude:f32",
+)
+
+TELEMETRY_VALUES = [
+    0,
+    195.029296875, 314.12109375,
+    24.0538711547852, -0.014181817881763, -0.238541349768639,
+    -0.006679157260805, 0.018545454367995, -0.079513780772686,
+    9,
+    233.245483398438,
+    22.5792655944824,
+    75.7095489501953,
+]
+
+# main.py style record: 3 fields published as a dict
+DICT3_HEADERS = ("timestamp:f64", "payload1:i32", "payload2:f32")
+
+DICT3_RECORD = {
+    "timestamp": 1768900000.123,
+    "payload1": 1000,
+    "payload2": 1.1111,
+}
@@ -0,0 +1,549 @@
+import zlib
+import struct
+
+LOG1_MAGIC = b"LOG1"
+TLV1_MAGIC = b"TLV1"
+COL1_MAGIC = b"COL1"
+
+LOG1_VERSION = 1          # untyped fields, variable length records
+LOG1_TYPED_VERSION = 2    # every field declares a type, fixed width records
+
+# LOG1 v2 header flags
+LOG1_FLAG_GAP_MARKERS = 0x01   # every record starts with a kind byte (below)
+LOG1_FLAG_FRAMED = 0x02        # records after the header are in CRC checked frames (below)
+
+RECORD_DATA = 0x00
+RECORD_GAP = 0x01              # gap marker: u32 records lost, zero padded
+
+TLV1_VERSION = 1
+TLV_FIELD_DEF = 0x01
+TLV_TYPE_INT = 2               # value types written by the encoder (int64, float64)
+TLV_TYPE_FLOAT = 3
+TLV_TYPE_GAP = 7               # value type of a gap marker record: u64 records lost
+
+COL1_VERSION = 1               # columnar blocks, see columnar.py
+
+# TLV1 v2: varint record length, one type byte per field, no field lengths
+# except for strings/bytes. Header gets a flags byte and the delta field.
+TLV2_VERSION = 2
+TLV2_FLAG_DELTA = 0x01         # one int field is delta coded (index in the header)
+TLV2_FLAG_DICT = 0x02          # repeated strings/bytes/floats may be dictionary references
+TLV2_FLAG_FRAMED = 0x04        # records after the header are in CRC checked frames (below)
+TLV2_FALSE = 1
+TLV2_INT = 2                   # zigzag varint
+TLV2_FLOAT64 = 3
+TLV2_STRING = 4                # varint length + utf-8
+TLV2_BYTES = 5                 # varint length + bytes
+TLV2_NONE = 6
+TLV2_GAP = 7                   # varint records lost
+TLV2_TRUE = 8
+TLV2_FLOAT32 = 9
+TLV2_KEY = 10                  # zigzag varint, starts a delta chain
+TLV2_DELTA = 11                # zigzag varint difference to the chain's previous value
+TLV2_DICT_NEW = 12             # a STRING/BYTES/FLOAT value that also becomes the field's next dictionary entry
+TLV2_DICT_REF = 13             # varint id of an earlier entry of the field's dictionary
+
+# Declared field types for headers("name:type") -> struct format character
+FIELD_TYPES = {
+    "bool": "?",
+    "u8": "B",
+    "i8": "b",
+    "u16": "H",
+    "i16": "h",
+    "u32": "I",
+    "i32": "i",
+    "u64": "Q",
+    "i64": "q",
+    "f32": "f",
+    "f64": "d",
+}
+
+# Same types as NumPy dtype strings (little endian, packed)
+NUMPY_TYPES = {
+    "bool": "?",
+    "u8": "u1",
+    "i8": "i1",
+    "u16": "<u2",
+    "i16": "<i2",
+    "u32": "<u4",
+    "i32": "<i4",
+    "u64": "<u8",
+    "i64": "<i8",
+    "f32": "<f4",
+    "f64": "<f8",
+}
+
+
+# =========================== FIELD TYPES ========================
+def parse_field(spec):
+    name, _, type_name = spec.partition(":")
+    name = name.strip()
+    type_name = type_name.strip() or None
+
+    if not name:
+        raise ValueError(f"Empty field name in header: {spec!r}")
+
+    if type_name is not None:
+        struct_code(type_name)  # validate early
+
+    return name, type_name
+
+
+def struct_code(type_name):
+    code = FIELD_TYPES.get(type_name)
+    if code is not None:
+        return code
+
+    # Fixed width raw bytes, e.g. "bytes16"
+    if type_name.startswith("bytes") and type_name[5:].isdigit():
+        return f"{int(type_name[5:])}s"
+
+    raise ValueError(f"Unsupported field type: {type_name}")
+
+
+def compile_struct(types, gap_markers=False):
+    # With gap markers a pad byte (always 0 = RECORD_DATA) leads every record
+    kind = "x" if gap_markers else ""
+    return struct.Struct("<" + kind + "".join(struct_code(t) for t in types))
+
+
+def numpy_descr(schema, types, gap_markers=False):
+    # [(name, dtype string)] usable with np.dtype(), matches compile_struct()
+    descr = [("_kind", "u1")] if gap_markers else []
+    for name, type_name in zip(schema, types):
+        code = NUMPY_TYPES.get(type_name)
+        if code is None:
+            code = f"S{struct.calcsize(struct_code(type_name))}"
+        descr.append((name, code))
+    return descr
+
+
+# =========================== HEADERS ========================
+def build_log1_header(schema, types=None, flags=0):
+    buf = bytearray()
+    buf += LOG1_MAGIC
+
+    if not types:
+        buf += LOG1_VERSION.to_bytes(1, "little")
+        buf += len(schema).to_bytes(1, "little")
+        for name in schema:
+            b = name.encode("utf-8")
+            buf += len(b).to_bytes(1, "little")
+            buf += b
+        return bytes(buf)
+
+    # v2: flags byte then name + type for every field
+    buf += LOG1_TYPED_VERSION.to_bytes(1, "little")
+    buf += flags.to_bytes(1, "little")
+    buf += len(schema).to_bytes(1, "little")
+    for name, type_name in zip(schema, types):
+        b = name.encode("utf-8")
+        t = type_name.encode("ascii")
+        buf += len(b).to_bytes(1, "little")
+        buf += b
+        buf += len(t).to_bytes(1, "little")
+        buf += t
+    return bytes(buf)
+
+
+# =========================== GAP MARKERS ========================
+def log1_gap_record(record_size, lost):
+    # Same width as a data record so fixed width readers stay aligned. The
+    # count takes up to 4 bytes after the kind byte and saturates at what
+    # they hold: a record narrower than 5 bytes reports at most 255 or 65535
+    width = min(4, record_size - 1)
+    body = min(lost, (1 << 8 * width) - 1).to_bytes(width, "little")
+    return (bytes((RECORD_GAP,)) + body).ljust(record_size, b"\x00")
+
+
+def tlv1_gap_record(lost):
+    entry = struct.pack("<BHQ", TLV_TYPE_GAP, 8, lost)
+    return len(entry).to_bytes(2, "little") + entry
+
+
+def build_tlv1_header(schema, version=TLV1_VERSION, delta=None, dictionary=False, framed=False):
+    buf = bytearray()
+    buf += TLV1_MAGIC
+    buf += version.to_bytes(1, "little")
+    if version == TLV2_VERSION:
+        flags = (TLV2_FLAG_DELTA if delta is not None else 0) | (TLV2_FLAG_DICT if dictionary else 0)
+        flags |= TLV2_FLAG_FRAMED if framed else 0
+        buf += flags.to_bytes(1, "little")
+        buf += (delta if delta is not None else 0).to_bytes(1, "little")
+    buf += len(schema).to_bytes(1, "little")
+    for name in schema:
+        b = name.encode("utf-8")
+        buf += TLV_FIELD_DEF.to_bytes(1, "little")
+        buf += len(b).to_bytes(2, "little")
+        buf += b
+    return bytes(buf)
+
+
+def build_col1_header(schema, types):
+    # Same name + type list as LOG1 v2, the blocks describe themselves
+    buf = bytearray()
+    buf += COL1_MAGIC
+    buf += COL1_VERSION.to_bytes(1, "little")
+    buf += len(schema).to_bytes(1, "little")
+    for name, type_name in zip(schema, types):
+        b = name.encode("utf-8")
+        t = type_name.encode("ascii")
+        buf += len(b).to_bytes(1, "little")
+        buf += b
+        buf += len(t).to_bytes(1, "little")
+        buf += t
+    return bytes(buf)
+
+
+# =========================== FRAMES ========================
+# Framed files (LOG1 v2 / TLV1 v2 with the framed flag): after the header
+# every worker flush is one frame, FRAME_MAGIC, payload length, CRC32 of the
+# payload, then the payload (whole records). A crash mid-write leaves at most
+# one torn frame at the end, found by walking the frame heads.
+FRAME_MAGIC = b"FRM1"
+FRAME_HEAD = struct.Struct("<4sII")
+
+
+def frame_head(payload):
+    return FRAME_HEAD.pack(FRAME_MAGIC, len(payload), zlib.crc32(payload))
+
+
+def iter_frames(data, pos):
+    # (start, end) of every frame payload in data from pos on. Stops at the
+    # first frame that is cut short, never written (preallocated zeros) or
+    # fails its CRC, everything after it is a torn tail.
+    end = len(data)
+    head = FRAME_HEAD.size
+    view = memoryview(data)
+    while pos + head <= end:
+        magic, length, crc = FRAME_HEAD.unpack_from(data, pos)
+        start = pos + head
+        if magic != FRAME_MAGIC or start + length > end:
+            break
+        if zlib.crc32(view[start:start + length]) != crc:
+            print(f"[Frames] CRC mismatch in the frame at offset {pos}, ignoring the rest of the file")
+            break
+        yield start, start + length
+        pos = start + length
+
+
+def unframe(data, header_size):
+    # Header + the concatenated frame payloads, the record stream an unframed
+    # file would hold. Block index offsets refer to this stream.
+    view = memoryview(data)
+    parts = [view[:header_size]]
+    parts.extend(view[start:stop] for start, stop in iter_frames(data, header_size))
+    return b"".join(parts)
+
+
+def recover_frames(f, pos, size):
+    # Walks the frame heads of an open file from pos (end of header) without
+    # reading payloads, only the last frame's CRC is checked: frames are
+    # written in order, an earlier one is complete when a later one exists.
+    # Returns (end of the last good frame, payload bytes before it).
+    head = FRAME_HEAD.size
+    payload = 0
+    last = None
+    while pos + head <= size:
+        f.seek(pos)
+        magic, length, crc = FRAME_HEAD.unpack(f.read(head))
+        if magic != FRAME_MAGIC or pos + head + length > size:
+            break
+        last = (pos, length, crc)
+        payload += length
+        pos += head + length
+
+    if last is not None:
+        start, length, crc = last
+        f.seek(start + head)
+        if zlib.crc32(f.read(length)) != crc:
+            return start, payload - length
+    return pos, payload
+
+
+# =========================== ZEROED TAILS ========================
+def data_end(data, start, end, size=1):
+    # End of the last size-byte record in data[start:end] that is not all
+    # zero bytes; what follows is the unwritten tail of a preallocated (mmap)
+    # file. end - start must be a multiple of size. Scans back from the end.
+    view = memoryview(data)
+    chunk = size * max(1, (1 << 20) // size)
+    while end > start:
+        lo = max(end - chunk, start)
+        used = len(bytes(view[lo:end]).rstrip(b"\0"))
+        if used:
+            return lo + -(-used // size) * size
+        end = lo
+    return start
+
+
+class FrameReader:
+    # File-like read() over the payloads of a framed stream, for readers that
+    # go through a file chunk by chunk. pending: bytes already read past the
+    # header.
+    def __init__(self, f, pending=b""):
+        self._f = f
+        self._raw = bytearray(pending)
+        self._out = bytearray()
+        self._done = False
+
+    def _fill(self):
+        head = FRAME_HEAD.size
+        while not self._done:
+            if len(self._raw) >= head:
+                magic, length, crc = FRAME_HEAD.unpack_from(self._raw, 0)
+                if magic != FRAME_MAGIC:
+                    self._done = True
+                    break
+                if len(self._raw) >= head + length:
+                    payload = bytes(self._raw[head:head + length])
+                    del self._raw[:head + length]
+                    if zlib.crc32(payload) != crc:
+                        print("[Frames] CRC mismatch, ignoring the rest of the stream")
+                        self._done = True
+                        break
+                    self._out += payload
+                    return
+            chunk = self._f.read(1 << 20)
+            if not chunk:
+                self._done = True
+                break
+            self._raw += chunk
+
+    def read(self, n=-1):
+        while (n < 0 or len(self._out) < n) and not self._done:
+            self._fill()
+        if n < 0:
+            n = len(self._out)
+        chunk = bytes(self._out[:n])
+        del self._out[:n]
+        return chunk
+
+
+# =========================== TLV v2 ========================
+_SMALL = [bytes((n,)) for n in range(0x80)]
+_F32 = struct.Struct("<f")
+_F64 = struct.Struct("<d")
+
+
+def varint(n):
+    if n < 0x80:
+        return _SMALL[n]
+    out = bytearray()
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+    return bytes(out)
+
+
+def zigzag(n):
+    return n << 1 if n >= 0 else (-n << 1) - 1
+
+
+def read_varint(data, pos):
+    # -> (value, position after it)
+    result = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def unzigzag(n):
+    return (n >> 1) ^ -(n & 1)
+
+
+class Tlv2Encoder:
+    # float32: "never" keeps float64, "exact" uses float32 when the value
+    # survives the round trip, "always" rounds every float to float32.
+    # delta: index of an int field coded as the difference to the previous
+    # record. dictionary: entries per field for repeated strings, bytes and
+    # floats, 0 for none. Deltas and dictionary references are only written
+    # by encode(values, chain=True), which must see every record in file order.
+
+    def __init__(self, count, float32="exact", delta=None, dictionary=0):
+        if float32 not in ("never", "exact", "always"):
+            raise ValueError(f"Unknown float32 mode {float32!r}, use never, exact or always")
+        self.count = count
+        self.float32 = float32
+        self.delta = delta
+        self.dictionary = max(int(dictionary or 0), 0)
+        self.prev = None
+        self.entries = [{} for _ in range(count)]
+
+    def reset(self):
+        # Next chained record starts a new chain and new dictionaries (new file)
+        self.prev = None
+        for entries in self.entries:
+            entries.clear()
+
+    def encode(self, values, chain=False):
+        if len(values) != self.count:
+            raise ValueError("Record does not match schema length")
+
+        f32 = self.float32
+        delta = self.delta if chain else None
+        limit = self.dictionary if chain else 0
+        prev = self.prev
+        added = []
+        buf = bytearray()
+        put = buf.append
+
+        for i, value in enumerate(values):
+            kind = type(value)
+
+            if kind is float:
+                code = TLV2_FLOAT64
+                if f32 != "never":
+                    try:
+                        data = _F32.pack(value)
+                    except OverflowError:
+                        data = None
+                    if data is not None and (f32 == "always" or _F32.unpack(data)[0] == value or value != value):
+                        code = TLV2_FLOAT32
+                if code == TLV2_FLOAT64:
+                    data = _F64.pack(value)
+
+            elif kind is bool:
+                put(TLV2_TRUE if value else TLV2_FALSE)
+                continue
+
+            elif kind is int:
+                if i == delta:
+                    self.prev = value
+                    if prev is None:
+                        put(TLV2_KEY)
+                    else:
+                        put(TLV2_DELTA)
+                        value -= prev
+                else:
+                    put(TLV2_INT)
+                buf += varint(value << 1 if value >= 0 else (-value << 1) - 1)
+                continue
+
+            elif value is None:
+                put(TLV2_NONE)
+                continue
+
+            elif kind is str:
+                code = TLV2_STRING
+                data = value.encode("utf-8")
+                data = varint(len(data)) + data
+
+            elif kind is bytes:
+                code = TLV2_BYTES
+                data = varint(len(value)) + value
+
+            else:
+                # Subclasses (IntEnum, numpy floats, ...): again as their base
+                # types, with the state this record changed put back
+                base = next((t for t in (bool, int, float, str, bytes) if isinstance(value, t)), None)
+                if base is None:
+                    raise TypeError(f"Unsupported type: {type(value)}")
+                self.prev = prev
+                for entries, key in added:
+                    del entries[key]
+                values = list(values)
+                values[i] = base(value)
+                return self.encode(values, chain)
+
+            # Strings, bytes and floats: type byte + payload, or a dictionary reference
+            if limit:
+                entries = self.entries[i]
+                key = (code, data)
+                ref = entries.get(key)
+                if ref is not None:
+                    put(TLV2_DICT_REF)
+                    buf += varint(ref)
+                    continue
+                if len(entries) < limit and value == value:
+                    # Fields whose values do not repeat stop growing at the limit
+                    entries[key] = len(entries)
+                    added.append((entries, key))
+                    put(TLV2_DICT_NEW)
+            put(code)
+            buf += data
+
+        return varint(len(buf)) + buf
+
+
+def tlv2_gap_record(lost):
+    body = bytes((TLV2_GAP,)) + varint(lost)
+    return varint(len(body)) + body
+
+
+# =========================== READING ========================
+def parse_header(data):
+    # Header of a LOG1/TLV1/COL1 file from its first bytes. Returns a dict with
+    # magic, version, schema, types, flags, header_size, record_size
+    # (fixed width typed bin only, else None), delta (index of the delta
+    # coded TLV v2 field, else None), dictionary (TLV v2 dictionary
+    # references possible) and framed (records are in frames, see unframe()).
+    def take(n):
+        nonlocal pos
+        if pos + n > len(data):
+            raise ValueError("Truncated header")
+        chunk = bytes(data[pos:pos + n])
+        pos += n
+        return chunk
+
+    pos = 0
+    magic = take(4)
+    version = take(1)[0]
+    schema, types, flags, record_size = [], None, 0, None
+    delta_field = None
+    framed_flag = 0
+
+    if magic == LOG1_MAGIC:
+        if version == LOG1_TYPED_VERSION:
+            flags = take(1)[0]
+            framed_flag = LOG1_FLAG_FRAMED
+        count = take(1)[0]
+        if version == LOG1_TYPED_VERSION:
+            types = []
+        for _ in range(count):
+            schema.append(take(take(1)[0]).decode("utf-8"))
+            if types is not None:
+                types.append(take(take(1)[0]).decode("ascii"))
+        if types is not None:
+            record_size = compile_struct(types, bool(flags & LOG1_FLAG_GAP_MARKERS)).size
+
+    elif magic == TLV1_MAGIC:
+        if version == TLV2_VERSION:
+            flags = take(1)[0]
+            framed_flag = TLV2_FLAG_FRAMED
+            delta = take(1)[0]
+            if flags & TLV2_FLAG_DELTA:
+                delta_field = delta
+        count = take(1)[0]
+        for _ in range(count):
+            if take(1)[0] != TLV_FIELD_DEF:
+                raise ValueError("Bad TLV1 field definition")
+            schema.append(take(int.from_bytes(take(2), "little")).decode("utf-8"))
+
+    elif magic == COL1_MAGIC:
+        count = take(1)[0]
+        types = []
+        for _ in range(count):
+            schema.append(take(take(1)[0]).decode("utf-8"))
+            types.append(take(take(1)[0]).decode("ascii"))
+
+    else:
+        raise ValueError(f"Unknown log file magic {magic!r}")
+
+    return {
+        "magic": magic,
+        "version": version,
+        "schema": tuple(schema),
+        "types": tuple(types) if types is not None else None,
+        "flags": flags,
+        "header_size": pos,
+        "record_size": record_size,
+        "delta": delta_field,
+        "dictionary": bool(magic == TLV1_MAGIC and flags & TLV2_FLAG_DICT),
+        "framed": bool(flags & framed_flag),
+    }
@@ -0,0 +1,401 @@
+import io
+import os
+import sys
+import math
+import struct
+import bisect
+from collections import namedtuple
+from pathlib import Path
+import binary_format
+import manifest
+
+# Sidecar <log file>.idx: magic, version, block count, then one entry per block
+IDX_MAGIC = b"LIDX"
+IDX_VERSION = 1
+IDX_HEADER = struct.Struct("<4sBI")
+IDX_ENTRY = struct.Struct("<QIQdd")    # offset, records, first seq, first ts, last ts
+
+IndexBlock = namedtuple("IndexBlock", "offset records first_seq first_ts last_ts")
+
+NAN = float("nan")
+
+
+def index_path(path):
+    return Path(f"{path}.idx")
+
+
+# =========================== TIMESTAMPS ========================
+def timestamp_reader(header, field=None):
+    # record bytes -> float for the timestamp field (first field by default),
+    # None for gap markers. None when the format has no usable timestamp.
+    schema = header["schema"]
+    if not schema:
+        return None
+    if field and field not in schema:
+        raise ValueError(f"Index timestamp field {field!r} is not in the schema")
+    i = schema.index(field) if field else 0
+
+    if header["magic"] == binary_format.LOG1_MAGIC:
+        types = header["types"]
+        if types is None:
+            return None     # untyped records are not self delimiting
+        code = binary_format.struct_code(types[i])
+        if code == "?" or code.endswith("s"):
+            return None
+
+        gap_markers = bool(header["flags"] & binary_format.LOG1_FLAG_GAP_MARKERS)
+        offset = int(gap_markers) + struct.calcsize("<" + "".join(
+            binary_format.struct_code(t) for t in types[:i]
+        ))
+        unpack = struct.Struct("<" + code).unpack_from
+
+        def read(record):
+            if gap_markers and record[0] == binary_format.RECORD_GAP:
+                return None
+            return float(unpack(record, offset)[0])
+        return read
+
+    if header["version"] == binary_format.TLV2_VERSION:
+        return _tlv2_reader(i, i == header["delta"], header["dictionary"])
+
+    def read_tlv(record):
+        if record[2] == binary_format.TLV_TYPE_GAP:
+            return None
+        pos = 2
+        for _ in range(i):
+            pos += 3 + int.from_bytes(record[pos + 1:pos + 3], "little")
+        kind = record[pos]
+        if kind == binary_format.TLV_TYPE_INT:
+            return float(struct.unpack_from("<q", record, pos + 3)[0])
+        if kind == binary_format.TLV_TYPE_FLOAT:
+            return struct.unpack_from("<d", record, pos + 3)[0]
+        return None     # gap marker, None or non numeric value
+    return read_tlv
+
+
+_TLV2_SKIP = {
+    binary_format.TLV2_FALSE: 0, binary_format.TLV2_TRUE: 0, binary_format.TLV2_NONE: 0,
+    binary_format.TLV2_FLOAT64: 8, binary_format.TLV2_FLOAT32: 4,
+}
+
+
+def _tlv2_reader(i, chained, dictionary=False):
+    # A delta coded field only has a value for KEY records, or for DELTA
+    # records when the reader is given every record in order. The same
+    # goes for dictionary references.
+    read_varint = binary_format.read_varint
+    state = {"prev": None, "entries": []}
+
+    def read(record):
+        pos = read_varint(record, 0)[1]
+        if record[pos] == binary_format.TLV2_GAP:
+            return None
+        for _ in range(i):
+            kind = record[pos]
+            pos += 1
+            if kind == binary_format.TLV2_DICT_NEW:
+                kind = record[pos]
+                pos += 1
+            if kind in _TLV2_SKIP:
+                pos += _TLV2_SKIP[kind]
+            elif kind in (binary_format.TLV2_STRING, binary_format.TLV2_BYTES):
+                length, pos = read_varint(record, pos)
+                pos += length
+            else:
+                pos = read_varint(record, pos)[1]
+
+        kind = record[pos]
+        if kind == binary_format.TLV2_DICT_REF:
+            ref = read_varint(record, pos + 1)[0]
+            entries = state["entries"]
+            return entries[ref] if ref < len(entries) else None
+        new = kind == binary_format.TLV2_DICT_NEW
+        if new:
+            pos += 1
+            kind = record[pos]
+
+        value = None
+        if kind == binary_format.TLV2_FLOAT64:
+            value = struct.unpack_from("<d", record, pos + 1)[0]
+        elif kind == binary_format.TLV2_FLOAT32:
+            value = struct.unpack_from("<f", record, pos + 1)[0]
+        elif kind in (binary_format.TLV2_INT, binary_format.TLV2_KEY, binary_format.TLV2_DELTA):
+            value = binary_format.unzigzag(read_varint(record, pos + 1)[0])
+            if chained and kind == binary_format.TLV2_KEY:
+                state["prev"] = value
+            elif chained and kind == binary_format.TLV2_DELTA:
+                if state["prev"] is None:
+                    return None
+                value += state["prev"]
+                state["prev"] = value
+            value = float(value)
+
+        if new and dictionary:
+            state["entries"].append(value)     # strings/bytes entries read as None
+        return value
+    return read
+
+
+# =========================== WRITER SIDE ========================
+class BlockIndex:
+    # Index of the file being written. A block starts with the first record
+    # at or past block_bytes after the previous block's start; the worker
+    # reports every record (or run of fixed width records) with its offset.
+    # Timestamps are only read at block edges, unless the caller already
+    # knows them (delta coded TLV v2 records cannot be read on their own).
+
+    def __init__(self, block_bytes, timestamp=None):
+        self.block_bytes = max(int(block_bytes), 1)
+        self.timestamp = timestamp
+        self.seq = 0                # records in finished blocks, across files
+        self.blocks = []
+        self.partial = False        # file resumed after a crash: no sidecar, readers rebuild it
+
+        self._block = None          # [offset, records, first seq, first ts, last ts]
+        self._block_end = 0
+        self._count = 0
+        self._last = None           # last record, read at the next settle()
+        self._last_known = None     # its timestamp if the caller gave one
+        self._last_ts = NAN
+
+    def _ts(self, record):
+        if self.timestamp is None:
+            return NAN
+        try:
+            ts = self.timestamp(record)
+        except (IndexError, struct.error):
+            return NAN
+        return NAN if ts is None else ts
+
+    def record(self, pos, data, ts=None):
+        if pos >= self._block_end:
+            self._start(pos, data, ts)
+        self._count += 1
+        self._last = data
+        self._last_known = ts
+
+    def packed(self, pos, data, record_size):
+        # Fixed width records back to back in data, the first one at pos
+        n = len(data) // record_size
+        i = 0
+        while i < n:
+            at = pos + i * record_size
+            if at >= self._block_end:
+                if i:
+                    self._last = data[(i - 1) * record_size:i * record_size]
+                    self._last_known = None
+                self._start(at, data[i * record_size:(i + 1) * record_size])
+            take = min(n - i, -(-(self._block_end - at) // record_size))
+            self._count += take
+            i += take
+
+        if n:
+            self._last = data[(n - 1) * record_size:n * record_size]
+            self._last_known = None
+            self.settle()
+
+    def settle(self):
+        # Read the last timestamp while the record's memory is still valid
+        if self._last is not None:
+            known = self._last_known
+            self._last_ts = self._ts(self._last) if known is None else known
+            self._last = None
+
+    def _start(self, pos, data, ts=None):
+        self._end_block()
+        self._block = [pos, 0, self.seq, self._ts(data) if ts is None else ts, NAN]
+        self._block_end = pos + self.block_bytes
+
+    def _end_block(self):
+        block = self._block
+        if block is None:
+            return
+        self.settle()
+        block[1] = self._count
+        block[4] = self._last_ts
+        self.blocks.append(IndexBlock(*block))
+        self.seq += self._count
+        self._block = None
+        self._count = 0
+
+    def finish(self, path):
+        # The file is complete: write its sidecar and start over for the next one
+        self._end_block()
+        blocks, self.blocks = self.blocks, []
+        self._block_end = 0
+        if not self.partial:
+            write_index(path, blocks)
+        self.partial = False
+        return blocks
+
+
+def write_index(path, blocks):
+    target = index_path(path)
+    tmp = target.with_name(target.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(IDX_HEADER.pack(IDX_MAGIC, IDX_VERSION, len(blocks)))
+        for block in blocks:
+            f.write(IDX_ENTRY.pack(*block))
+    os.replace(tmp, target)
+
+
+# =========================== READER SIDE ========================
+def read_index(path):
+    # Blocks from the sidecar, None if it is missing or damaged
+    try:
+        data = index_path(path).read_bytes()
+        magic, version, count = IDX_HEADER.unpack_from(data)
+        if magic != IDX_MAGIC or version != IDX_VERSION:
+            return None
+        if len(data) != IDX_HEADER.size + count * IDX_ENTRY.size:
+            return None
+    except (FileNotFoundError, struct.error):
+        return None
+    return [IndexBlock(*e) for e in IDX_ENTRY.iter_unpack(data[IDX_HEADER.size:])]
+
+
+def _read_header(f):
+    head = f.read(64 * 1024)
+    return binary_format.parse_header(head)
+
+
+def scan_records(path):
+    # (offset, record bytes) of every complete record in a typed bin or
+    # tlv.bin file. Stops at a record cut short, a zero length or trailing
+    # all zero records (the unwritten tail of a crashed or preallocated file).
+    with open(path, "rb") as f:
+        header = _read_header(f)
+        f.seek(0)
+        data = f.read()
+    if header["framed"]:
+        data = binary_format.unframe(data, header["header_size"])
+
+    pos = header["header_size"]
+    size = header["record_size"]
+
+    if header["magic"] == binary_format.COL1_MAGIC:
+        raise ValueError(f"{path}: col.bin blocks carry their own stats, see columnar.scan_blocks()")
+    if header["magic"] == binary_format.LOG1_MAGIC:
+        if size is None:
+            raise ValueError(f"{path}: untyped bin records cannot be scanned")
+        end = pos + (len(data) - pos) // size * size
+        if not header["framed"] and not manifest.is_closed(path):
+            end = binary_format.data_end(data, pos, end, size)   # zeroed tail of a preallocated file
+        for offset in range(pos, end, size):
+            yield offset, data[offset:offset + size]
+        return
+
+    if header["version"] == binary_format.TLV2_VERSION:
+        while pos < len(data):
+            try:
+                length, body = binary_format.read_varint(data, pos)
+            except IndexError:
+                return
+            if not length or body + length > len(data):
+                return
+            yield pos, data[pos:body + length]
+            pos = body + length
+        return
+
+    while pos + 2 <= len(data):
+        length = int.from_bytes(data[pos:pos + 2], "little")
+        if not length or pos + 2 + length > len(data):
+            return
+        yield pos, data[pos:pos + 2 + length]
+        pos += 2 + length
+
+
+def build_index(path, block_bytes=64 * 1024, field=None, first_seq=0):
+    # Rebuild the blocks of a finished or crash-truncated file from its records
+    with open(path, "rb") as f:
+        header = _read_header(f)
+
+    # Every record is read in order, so delta coded timestamps resolve
+    read = timestamp_reader(header, field)
+    index = BlockIndex(block_bytes)
+    index.seq = first_seq
+    for offset, record in scan_records(path):
+        ts = read(record) if read is not None else None
+        index.record(offset, record, NAN if ts is None else ts)
+    index._end_block()
+    return index.blocks
+
+
+def load_index(path, rebuild=True, block_bytes=64 * 1024, field=None):
+    # Sidecar blocks; files without one (e.g. cut short by a crash) are
+    # scanned once and get their sidecar written
+    blocks = read_index(path)
+    if blocks is None and rebuild:
+        blocks = build_index(path, block_bytes, field)
+        write_index(path, blocks)
+    return blocks
+
+
+def blocks_in_time(blocks, t0=None, t1=None):
+    # Blocks that may hold records with t0 <= timestamp <= t1
+    out = []
+    for block in blocks:
+        first, last = block.first_ts, block.last_ts
+        if t1 is not None and not math.isnan(first) and first > t1:
+            continue
+        if t0 is not None and not math.isnan(last) and last < t0:
+            continue
+        out.append(block)
+    return out
+
+
+def block_of_record(blocks, seq):
+    # Block holding record number seq, None if it is not in this file
+    i = bisect.bisect_right([b.first_seq for b in blocks], seq) - 1
+    if i < 0 or seq >= blocks[i].first_seq + blocks[i].records:
+        return None
+    return blocks[i]
+
+
+def read_blocks(path, blocks):
+    # Record bytes of the given blocks, read with one seek per block
+    with open(path, "rb") as f:
+        header = _read_header(f)
+        if header["framed"]:
+            # Offsets are positions in the unframed record stream
+            f.seek(0)
+            f = io.BytesIO(binary_format.unframe(f.read(), header["header_size"]))
+        size = header["record_size"]
+        varint_lengths = header["version"] == binary_format.TLV2_VERSION and header["magic"] == binary_format.TLV1_MAGIC
+
+        for block in blocks:
+            f.seek(block.offset)
+            if size is not None:
+                data = f.read(block.records * size)
+                for i in range(0, len(data) - size + 1, size):
+                    yield data[i:i + size]
+                continue
+
+            for _ in range(block.records):
+                if varint_lengths:
+                    head = bytearray()
+                    while not head or head[-1] >= 0x80:
+                        byte = f.read(1)
+                        if not byte:
+                            return
+                        head += byte
+                    length = binary_format.read_varint(head, 0)[0]
+                else:
+                    head = f.read(2)
+                    if len(head) < 2:
+                        break
+                    length = int.from_bytes(head, "little")
+                body = f.read(length)
+                yield bytes(head) + body
+
+
+def main():
+    # python block_index.py FILE... : write missing sidecars, list the blocks
+    for name in sys.argv[1:]:
+        blocks = load_index(name)
+        records = sum(b.records for b in blocks)
+        print(f"{name}: {len(blocks)} blocks, {records} records")
+
+
+if __name__ == "__main__":
+    main()
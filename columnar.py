@@ -0,0 +1,271 @@
+import bz2
+import lzma
+import sys
+import math
+import zlib
+import struct
+from collections import namedtuple
+from itertools import starmap
+import binary_format
+
+try:
+    import zstandard
+except ImportError:  # zstd columns are only offered when the package is installed
+    zstandard = None
+
+try:
+    import numpy as np
+except ImportError:  # blocks are transposed in pure Python without NumPy
+    np = None
+
+# A col.bin file is the COL1 header (names and types) followed by blocks:
+#   block head: b"CBLK", rows, records lost just before the block, body size
+#   directory:  per column codec id, data size, min and max (in the column type)
+#   data:       every column's values packed back to back, compressed on its own
+# A block with rows = 0 is a gap marker.
+BLOCK_MAGIC = b"CBLK"
+BLOCK_HEAD = struct.Struct("<4sIQI")
+
+ColumnBlock = namedtuple("ColumnBlock", "offset rows lost stats columns")
+
+
+def _zstd_compress(data, level):
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+def _zstd_decompress(data):
+    return zstandard.ZstdDecompressor().decompress(data)
+
+
+# name -> (id, compress(data, level), decompress(data), default level)
+COLUMN_CODECS = {
+    "none": (0, None, None, None),
+    "zlib": (1, zlib.compress, zlib.decompress, 1),
+    "bz2": (2, bz2.compress, bz2.decompress, 9),
+    "lzma": (3, lambda data, level: lzma.compress(data, preset=level), lzma.decompress, 0),
+}
+if zstandard is not None:
+    COLUMN_CODECS["zstd"] = (4, _zstd_compress, _zstd_decompress, 3)
+
+_DECOMPRESS = {cid: dec for cid, _, dec, _ in COLUMN_CODECS.values()}
+
+
+def decompress(codec_id, data):
+    if not codec_id:
+        return data
+    dec = _DECOMPRESS.get(codec_id)
+    if dec is None:
+        raise ValueError(f"Unknown column codec id {codec_id}")
+    return dec(data)
+
+
+# =========================== LAYOUT ========================
+def _stat_code(type_name):
+    # Raw bytes columns carry no min/max
+    code = binary_format.struct_code(type_name)
+    return "" if code.endswith("s") else code
+
+
+def directory_struct(types):
+    return struct.Struct("<" + "".join("BI" + _stat_code(t) * 2 for t in types))
+
+
+def parse_directory(types, values):
+    # Unpacked directory -> [(codec id, size, min, max)], min/max None for bytes
+    out, i = [], 0
+    for t in types:
+        if _stat_code(t):
+            out.append(values[i:i + 4])
+            i += 4
+        else:
+            out.append((values[i], values[i + 1], None, None))
+            i += 2
+    return out
+
+
+def read_block_head(buf, pos, types, directory=None):
+    # (rows, lost, [(codec, size, min, max)], data start, block end) of the
+    # block at pos, None when buf ends inside its head or directory. A zeroed
+    # head (the unwritten tail of a preallocated file) raises EOFError.
+    directory = directory or directory_struct(types)
+    if pos + BLOCK_HEAD.size + directory.size > len(buf):
+        return None
+    magic, rows, lost, size = BLOCK_HEAD.unpack_from(buf, pos)
+    if magic != BLOCK_MAGIC:
+        if magic == b"\x00\x00\x00\x00":
+            raise EOFError
+        raise ValueError(f"Bad col.bin block at offset {pos}")
+
+    start = pos + BLOCK_HEAD.size
+    entries = parse_directory(types, directory.unpack_from(buf, start))
+    return rows, lost, entries, start + directory.size, start + size
+
+
+def block_matches(entry, lo=None, hi=None):
+    # Can a block whose column has these stats hold values in [lo, hi]?
+    _, _, vmin, vmax = entry
+    if vmin is None or (isinstance(vmin, float) and (math.isnan(vmin) or math.isnan(vmax))):
+        return True
+    if hi is not None and vmin > hi:
+        return False
+    if lo is not None and vmax < lo:
+        return False
+    return True
+
+
+# =========================== WRITER SIDE ========================
+class ColumnBlocks:
+    # Rows of a col.bin file waiting for their block. Every block_rows rows
+    # (and on flush) they are transposed, packed per column, compressed
+    # column by column and handed to write(block bytes).
+
+    def __init__(self, types, write, block_rows=65536, codec="zlib", level=None):
+        if codec not in COLUMN_CODECS:
+            raise ValueError(f"Unknown column codec {codec!r}, available: {', '.join(COLUMN_CODECS)}")
+        self.types = tuple(types)
+        self.codes = tuple(binary_format.struct_code(t) for t in self.types)
+        self.row_struct = struct.Struct("<" + "".join(self.codes))
+        self.dtype = None
+        if np is not None:
+            names = [f"c{i}" for i in range(len(self.types))]
+            self.dtype = np.dtype(binary_format.numpy_descr(names, self.types))
+        self.directory = directory_struct(self.types)
+        self.block_rows = max(int(block_rows), 1)
+        self.codec_id, self._compress, _, default_level = COLUMN_CODECS[codec]
+        self.level = default_level if level is None else level
+        self.write = write
+        self.rows = []
+        self.rejected = 0
+
+    def add(self, row):
+        rows = self.rows
+        rows.append(row)
+        if len(rows) >= self.block_rows:
+            self.flush()
+
+    def gap(self, lost):
+        # Rows so far, then an empty block carrying the loss
+        self.flush()
+        self.write(BLOCK_HEAD.pack(BLOCK_MAGIC, 0, lost, self.directory.size) + bytes(self.directory.size))
+
+    def flush(self):
+        rows, self.rows = self.rows, []
+        if not rows:
+            return
+        try:
+            block = self._encode(rows)
+        except (struct.error, TypeError, ValueError):
+            # Some rows do not fit the schema: keep the ones that do
+            good = [row for row in rows if self._fits(row)]
+            self.rejected += len(rows) - len(good)
+            print(f"[Logger] {len(rows) - len(good)} records do not match the col.bin schema, dropped")
+            if not good:
+                return
+            block = self._encode(good)
+        self.write(block)
+
+    def _fits(self, row):
+        try:
+            self.row_struct.pack(*row)
+            return True
+        except (struct.error, TypeError):
+            return False
+
+    def _columns(self, rows):
+        # (packed column, min, max) per field; min/max None for raw bytes
+        if self.dtype is not None:
+            # Pack the rows, then let NumPy split and scan the columns
+            table = np.frombuffer(b"".join(starmap(self.row_struct.pack, rows)), dtype=self.dtype)
+            for code, name in zip(self.codes, self.dtype.names):
+                values = np.ascontiguousarray(table[name])
+                if code.endswith("s"):
+                    yield values.tobytes(), None, None
+                elif code in "fd":
+                    finite = values[values == values]    # NaN carries no range
+                    values_range = finite if len(finite) else values
+                    yield values.tobytes(), values_range.min().item(), values_range.max().item()
+                else:
+                    yield values.tobytes(), values.min().item(), values.max().item()
+            return
+
+        columns = list(zip(*rows))
+        if len(columns) != len(self.codes):
+            raise struct.error("wrong field count")
+        n = len(rows)
+        for code, values in zip(self.codes, columns):
+            if code.endswith("s"):
+                yield struct.pack("<" + code * n, *values), None, None
+                continue
+            data = struct.pack(f"<{n}{code}", *values)
+            lo, hi = min(values), max(values)
+            if lo != lo or hi != hi:    # NaN first: stats of the other values
+                numbers = [v for v in values if v == v]
+                lo, hi = (min(numbers), max(numbers)) if numbers else (lo, hi)
+            yield data, lo, hi
+
+    def _encode(self, rows):
+        stats, parts = [], []
+        for data, lo, hi in self._columns(rows):
+            codec = 0
+            packed = data
+            if self._compress is not None:
+                packed = self._compress(data, self.level)
+                codec = self.codec_id
+                if len(packed) >= len(data):    # incompressible column, store it as is
+                    packed, codec = data, 0
+
+            stats += (codec, len(packed)) if lo is None else (codec, len(packed), lo, hi)
+            parts.append(packed)
+
+        directory = self.directory.pack(*stats)
+        body = sum(map(len, parts)) + len(directory)
+        return b"".join([BLOCK_HEAD.pack(BLOCK_MAGIC, len(rows), 0, body), directory, *parts])
+
+
+# =========================== READER SIDE ========================
+def scan_blocks(path):
+    # Every block of a plain col.bin file, read from its head and directory
+    # only. stats: {column: (min, max)}, columns: {column: (offset, size, codec)}
+    with open(path, "rb") as f:
+        header = binary_format.parse_header(f.read(64 * 1024))
+        schema, types = header["schema"], header["types"]
+        directory = directory_struct(types)
+        file_size = f.seek(0, 2)
+        pos = header["header_size"]
+
+        while True:
+            f.seek(pos)
+            try:
+                info = read_block_head(f.read(BLOCK_HEAD.size + directory.size), 0, types, directory)
+            except EOFError:
+                return
+            if info is None:
+                return
+            rows, lost, entries, at, end = info
+            if pos + end > file_size:
+                return      # cut short by a crash
+
+            stats, columns = {}, {}
+            at += pos
+            for name, (codec, length, vmin, vmax) in zip(schema, entries):
+                stats[name] = (vmin, vmax)
+                columns[name] = (at, length, codec)
+                at += length
+            yield ColumnBlock(pos, rows, lost, stats, columns)
+            pos += end
+
+
+def main():
+    # python columnar.py FILE... : list the blocks of col.bin files
+    for name in sys.argv[1:]:
+        blocks = list(scan_blocks(name))
+        rows = sum(b.rows for b in blocks)
+        lost = sum(b.lost for b in blocks)
+        print(f"{name}: {len(blocks)} blocks, {rows} records, {lost} lost")
+        for b in blocks:
+            stats = ", ".join(f"{k}=[{lo}, {hi}]" for k, (lo, hi) in b.stats.items() if lo is not None)
+            print(f"  @{b.offset}: {b.rows} rows {stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+import io
+import bz2
+import gzip
+import lzma
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd is only offered when the package is installed
+    zstandard = None
+
+
+class Codec:
+    def __init__(self, name, suffix, opener, default_level, levels):
+        self.name = name
+        self.suffix = suffix          # appended to the log file name, e.g. ".gz"
+        self._opener = opener
+        self.default_level = default_level
+        self.levels = levels          # valid range, used by the benchmark
+
+    def open(self, path, mode="rb", level=None):
+        if level is None:
+            level = self.default_level
+        return self._opener(path, mode, level)
+
+
+CODECS = {}
+
+
+def register(codec):
+    CODECS[codec.name] = codec
+    return codec
+
+
+def get_codec(name):
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ValueError(
+            f"Unknown compression codec {name!r}, available: {', '.join(CODECS)}"
+        )
+    return codec
+
+
+def codec_for_path(path):
+    # Codec that produced a compressed log file, or None for plain files
+    name = str(path)
+    for codec in CODECS.values():
+        if name.endswith(codec.suffix):
+            return codec
+    return None
+
+
+def compressed_suffixes():
+    return tuple(codec.suffix for codec in CODECS.values())
+
+
+def open_log(path, mode="rb"):
+    # Open a log file for reading whether it is plain or compressed
+    codec = codec_for_path(path)
+    if codec is None:
+        return open(path, mode)
+    return codec.open(path, mode)
+
+
+# =========================== ZLIB STREAM ========================
+class ZlibFile(io.RawIOBase):
+    # Plain zlib stream (no gzip header/CRC), streaming in both directions
+
+    def __init__(self, path, mode="rb", level=-1):
+        self._fp = open(path, mode)
+        self._writing = "w" in mode or "a" in mode
+        if self._writing:
+            self._z = zlib.compressobj(level)
+        else:
+            self._z = zlib.decompressobj()
+            self._pending = b""
+
+    def writable(self):
+        return self._writing
+
+    def readable(self):
+        return not self._writing
+
+    def write(self, data):
+        self._fp.write(self._z.compress(data))
+        return len(data)
+
+    def readinto(self, b):
+        while not self._pending:
+            chunk = self._fp.read(64 * 1024)
+            if not chunk:
+                self._pending = self._z.flush()
+                if not self._pending:
+                    return 0
+                break
+            self._pending = self._z.decompress(chunk)
+
+        n = min(len(b), len(self._pending))
+        b[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+    def flush(self):
+        if self._writing and not self._fp.closed:
+            self._fp.write(self._z.flush(zlib.Z_SYNC_FLUSH))
+            self._fp.flush()
+
+    def fileno(self):
+        return self._fp.fileno()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._writing:
+                self._fp.write(self._z.flush())
+        finally:
+            self._fp.close()
+            super().close()
+
+
+def _open_zlib(path, mode, level):
+    f = ZlibFile(path, mode, level)
+    return f if f.writable() else io.BufferedReader(f)
+
+
+def _open_lzma(path, mode, level):
+    if "r" in mode:
+        return lzma.open(path, mode)
+    return lzma.open(path, mode, preset=level)
+
+
+# =========================== ZSTD ========================
+def _open_zstd(path, mode, level):
+    fp = open(path, mode)
+    if "r" in mode:
+        return zstandard.ZstdDecompressor().stream_reader(fp, closefd=True)
+    return zstandard.ZstdCompressor(level=level).stream_writer(fp, closefd=True)
+
+
+register(Codec("gzip", ".gz", lambda p, m, l: gzip.open(p, m, compresslevel=l), 9, range(1, 10)))
+register(Codec("zlib", ".zz", _open_zlib, 6, range(1, 10)))
+register(Codec("bz2", ".bz2", lambda p, m, l: bz2.open(p, m, compresslevel=l), 9, range(1, 10)))
+register(Codec("lzma", ".xz", _open_lzma, 6, range(0, 10)))
+
+if zstandard is not None:
+    register(Codec("zstd", ".zst", _open_zstd, 3, range(1, 23)))
@@ -0,0 +1,171 @@
+# Converts every bin/tlv.bin/col.bin log (plain or compressed) under a directory to
+# CSV, one file per worker process. Run from the repo root:
+#   python convertors/convert_logs.py LOG_DIR [--out CSV_DIR] [--workers N] [--force]
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import binary_format
+import compressors
+import log_reader
+from manifest import MANIFEST_NAME
+
+LOG_SUFFIXES = (".tlv.bin", ".col.bin", ".bin")
+
+
+# =========================== DISCOVERY ========================
+def _log_name(path):
+    # log_x.tlv.bin.gz -> log_x.tlv.bin, None for anything that is not a log
+    name = path.name
+    codec = compressors.codec_for_path(name)
+    if codec is not None:
+        name = name[:-len(codec.suffix)]
+    return name if name.endswith(LOG_SUFFIXES) else None
+
+
+def csv_name(path):
+    # log_x.tlv.bin.gz -> log_x.tlv.bin.csv: the log type stays in the name,
+    # log_x.bin and log_x.tlv.bin of the same time do not share a CSV
+    name = _log_name(path)
+    return name + ".csv" if name else None
+
+
+def csv_dir(src, out_dir=None):
+    # Not the log directory itself by default: a logger there would take
+    # the CSVs for its own files (manifest, compression, retention)
+    if out_dir:
+        return Path(out_dir)
+    return src.parent.with_name(src.parent.name + "_csv")
+
+
+def find_logs(paths):
+    files = []
+    for p in map(Path, paths):
+        candidates = sorted(p.iterdir()) if p.is_dir() else [p]
+        for f in candidates:
+            if f.is_file() and f.name != MANIFEST_NAME and _log_name(f):
+                files.append(f)
+    return files
+
+
+def _schema(path):
+    with compressors.open_log(path, "rb") as f:
+        return binary_format.parse_header(log_reader._read_full(f, log_reader.HEADER_PEEK))["schema"]
+
+
+def up_to_date(src, dst):
+    try:
+        return dst.stat().st_mtime >= src.stat().st_mtime
+    except FileNotFoundError:
+        return False
+
+
+# =========================== CONVERSION ========================
+def convert_file(src, dst, chunk_bytes=log_reader.CHUNK_BYTES):
+    # Runs in a pool worker. Returns (records, gap markers, seconds).
+    start = time.perf_counter()
+    part = dst.with_name(dst.name + ".part")
+    records = gaps = 0
+
+    try:
+        with open(part, "w", encoding="utf-8", buffering=1024 * 1024) as out:
+            fmt = None
+            for data, gap_rows in log_reader.iter_log(src, chunk_bytes, columns=True, with_gaps=True):
+                names = list(data)
+                if fmt is None:
+                    out.write(",".join(names) + "\n")
+                    fmt = ",".join(["%s"] * len(names)) + "\n"
+
+                rows = [fmt % row for row in zip(*(data[n].tolist() for n in names))]
+
+                # Gap markers go back where the logger wrote them, as in csv logs
+                for before, lost in reversed(gap_rows.tolist()):
+                    rows.insert(before, f"#gap,{lost}\n")
+
+                out.write("".join(rows))
+                records += len(rows) - len(gap_rows)
+                gaps += len(gap_rows)
+
+            if fmt is None:     # no records, just the header line
+                out.write(",".join(_schema(src)) + "\n")
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+
+    os.replace(part, dst)
+    return records, gaps, time.perf_counter() - start
+
+
+def convert_all(files, out_dir=None, workers=None, force=False, chunk_bytes=log_reader.CHUNK_BYTES):
+    jobs, skipped = [], 0
+    for src in files:
+        dst = csv_dir(src, out_dir) / csv_name(src)
+        if not force and up_to_date(src, dst):
+            skipped += 1
+            continue
+        jobs.append((src, dst))
+
+    for parent in {dst.parent for _, dst in jobs}:
+        parent.mkdir(parents=True, exist_ok=True)
+
+    totals = {
+        "files": 0, "skipped": skipped, "unsupported": 0, "failed": 0,
+        "records": 0, "gaps": 0, "bytes_in": 0,
+    }
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(convert_file, src, dst, chunk_bytes): (src, dst) for src, dst in jobs}
+        for future in as_completed(futures):
+            src, dst = futures[future]
+            try:
+                records, gaps, seconds = future.result()
+            except ValueError as e:     # untyped bin or not a log file
+                totals["unsupported"] += 1
+                print(f"[Convert] {src.name}: skipped ({e})")
+                continue
+            except Exception as e:
+                totals["failed"] += 1
+                print(f"[Convert] {src.name}: failed ({e})")
+                continue
+
+            totals["files"] += 1
+            totals["records"] += records
+            totals["gaps"] += gaps
+            totals["bytes_in"] += src.stat().st_size
+            print(f"[Convert] {src.name} -> {dst.name}: {records} records in {seconds:.2f} s")
+
+    totals["seconds"] = time.perf_counter() - start
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert bin/tlv.bin logs to CSV")
+    parser.add_argument("paths", nargs="+", help="log directories or files (.gz etc. included)")
+    parser.add_argument("--out", help="directory for the CSV files (default: <log dir>_csv next to each log directory)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--chunk-mb", type=float, default=64, help="log data decoded per chunk")
+    parser.add_argument("--force", action="store_true", help="convert even if the CSV is up to date")
+    args = parser.parse_args()
+
+    files = find_logs(args.paths)
+    totals = convert_all(files, args.out, args.workers, args.force, int(args.chunk_mb * 1024 * 1024))
+
+    seconds = totals["seconds"] or 1e-9
+    print(
+        f"[Convert] {totals['files']} files converted, {totals['skipped']} up to date, "
+        f"{totals['unsupported']} unsupported, {totals['failed']} failed: "
+        f"{totals['records']} records in {seconds:.2f} s "
+        f"({totals['records'] / seconds:.0f} rec/s, {totals['bytes_in'] / seconds / 1e6:.1f} MB/s of log data)"
+    )
+    if totals["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,105 @@
+import os
 import time
 import datetime
-import gzip
 import shutil
+import threading
+import mmap
+import secrets
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
 from global_config import settings
+from manifest import RAW, COMPRESSED, for_directory, in_use, lock_file, unlock_file
+from mmap_writer import MmapFile
+from xlsx_render import render_segment, segment_path
+import binary_format
+import block_index
+import columnar
+import compressors
+from storage import DiskMonitor, DISK_COMPRESS
+
+
+def _compress_file(src, dst, codec_name, level):
+    # Runs in the compression pool; the .part name keeps half written
+    # archives out of gz_files_sort() until they are complete.
+    # Returns (archive size, seconds spent compressing).
+    # Loggers of other processes see the same raw files: the one holding
+    # the lock compresses, the others get BlockingIOError or FileNotFoundError.
+    start = time.perf_counter()
+    part = dst + ".part"
+    codec = compressors.get_codec(codec_name)
+    lock = lock_file(src, exclusive=True, wait=False)
+    try:
+        with open(src, "rb") as f_in, codec.open(part, "wb", level) as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        os.replace(part, dst)
+        os.unlink(src)
+    finally:
+        unlock_file(lock)
+    try:
+        os.unlink(src + ".idx")     # block offsets do not apply to the archive
+    except FileNotFoundError:
+        pass
+    return os.path.getsize(dst), time.perf_counter() - start
+
+
+def _data_end(f, header, size):
+    # End of the data in an unframed file the mmap writer may have left with
+    # a zeroed tail: after the last complete typed bin record that is not
+    # all zeros, the last tlv.bin record or col.bin block, or the last non
+    # zero byte (csv, untyped bin)
+    if header is None or header["magic"] == binary_format.LOG1_MAGIC:
+        start = header["header_size"] if header else 0
+        width = (header and header["record_size"]) or 1
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = binary_format.data_end(mm, start, start + (size - start) // width * width, width)
+        # Untyped bin records may end in zero bytes themselves: only a run
+        # of a page or more is taken for a preallocated tail
+        if header is not None and header["types"] is None and size - end < mmap.PAGESIZE:
+            return size
+        return end
+
+    end = header["header_size"]
+    if header["magic"] == binary_format.COL1_MAGIC:
+        for block in columnar.scan_blocks(f.name):
+            end = max(offset + length for offset, length, _ in block.columns.values())
+    else:
+        for offset, record in block_index.scan_records(f.name):
+            end = offset + len(record)
+    return end
+
+
+def _pid_alive(pid):
+    if os.name == "nt":
+        return True     # os.kill() would terminate it
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass            # alive, another user's
+    return True
+
+
+class _SharedDirectory:
+    # What the FileManagers of all streams in one log directory share:
+    # the manifest, the compression pool with its pending jobs, and so
+    # one retention budget over every stream's files, and the free space
+    # monitor of the filesystem they are on.
+
+    def __init__(self, log_dir):
+        log_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest = for_directory(log_dir)   # one per directory and process
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.executor = None
+        self.rendering = {}     # deferred xlsx workbooks not written yet
+        self.render_executor = None
+        self.spare_executor = None  # one thread opening the next file of every stream
+        self.members = []       # FileManagers with a file being written
+        self.uncompressed = []  # FileManagers without compression, stopped ones too
+        self.disk = DiskMonitor(log_dir)
+        self.disk.start()
+
 
 class FileManager:
 
@@ -11,14 +107,32 @@ class FileManager:
                 log_directory: Path = None, # Use None here
                 max_file_size_mb: int = None, # Use None here
                 dir_max_size_mb: int = None, 
-                compress: bool = False):
+                compress: bool = False,
+                stream: str = None,
+                shared: "FileManager" = None):
         
         self.file_type = file_type.lstrip(".")
-        self.log_dir = log_directory or settings.LOG_DIRECTORY
+        self.log_dir = shared.log_dir if shared is not None else (log_directory or settings.LOG_DIRECTORY)
+
+        # Named stream files are log_<stream>_<time>.<type>
+        self.stream = stream
+        self.prefix = f"log_{stream}_" if stream else "log_"
         self.max_file_size = (max_file_size_mb or settings.MAX_FILE_SIZE_MB) * 1024 * 1024
         self.dir_max_size = (dir_max_size_mb or settings.LOG_DIRECTORY_MAX_SIZE_MB) * 1024 * 1024
         self.compress = compress
 
+        # Codec for rotated files; streaming writes through it while logging
+        self.codec = compressors.get_codec(settings.COMPRESS_CODEC)
+        self.level = settings.COMPRESS_LEVEL
+        self.streaming = bool(compress and settings.COMPRESS_STREAMING and self.file_type != "xlsx")
+
+        # Preallocated memory mapped files; the compressor needs a stream
+        self.mmap = settings.WRITER == "mmap" and not self.streaming and self.file_type != "xlsx"
+        self._writer = None
+
+        # Deferred xlsx: rows go to a segment, workbooks are rendered in a process pool
+        self.deferred = self.file_type == "xlsx" and settings.XLSX_DEFERRED
+
         self.warning_bytes = (
             settings.LOG_DIRECTORY_MAX_SIZE_MB *
             settings.MAX_DIRECTORY_WARNING_THRESHOLD / 100 *
@@ -28,17 +142,318 @@ class FileManager:
         print(f"warning bytes: {self.warning_bytes}")
 
 
-        self.log_dir.mkdir(parents=True, exist_ok=True)
+        # Background compression: rotation only submits a job
+        self._shared = shared._shared if shared is not None else _SharedDirectory(self.log_dir)
+        self._lock = self._shared.lock
+        self._pending = self._shared.pending
+        self.completed_jobs = 0
+        self.failed_jobs = 0
+        self.last_error = None
+        self.critical_error = None
+        self.on_compress_pending = None   # hook(path)
+        self.on_compress_done = None      # hook(src, gz_path, error)
+        self._compress_after_render = False
+        self.metrics = None               # LoggerMetrics of the owning Logger
+
+        # Free space of the log directory's filesystem, polled in the background
+        self.disk = self._shared.disk
+        self.on_disk_mode = None          # hook(old, new) with storage.DISK_* modes
+
+        # Sizes and states of every file, kept up to date without rescanning
+        self.manifest = self._shared.manifest
+
+        # <pid>-<token>: this FileManager among all writers of the directory
+        self.owner = f"{os.getpid()}-{secrets.token_hex(4)}"
+
+        # path -> lock fd of the files this FileManager writes (or renders):
+        # their manifest entries are active and other Loggers must not recover them
+        self._locks = {}
+
+        # Crash recovery: the file the last run left open, torn tail cut off
+        self.recovered = self._recover()
+
+        # Next file, created, opened and headered ahead of the rotation.
+        # Named after its owner: other Loggers may write the same directory.
+        self._spare = None
+        self._retiring = None       # last finished file the spare thread closes
+        self._spare_path = self.log_dir / f"{self.prefix}next.{self.owner}.{self.file_type}{self.codec.suffix if self.streaming else ''}.spare"
+        self._remove_dead_spares()
+
+        self.current_file = None
         self.current_file = self._new_log_file()
+        with self._lock:
+            self._shared.members.append(self)
+            if not self.compress:
+                self._shared.uncompressed.append(self)
+            self.disk.listeners.append(self._disk_changed)
 
     def _new_log_file(self):
-        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-        path = self.log_dir / f"log_{ts}.{self.file_type}"
+        # Rotation: the previous file is closed by the caller before this
         self.log_dir.mkdir(parents=True, exist_ok=True)
-        path.touch(exist_ok=False)
+        path = self._claim()
+        self._hold(path)    # before the manifest lists it as active
+        if self.current_file is not None:
+            self.manifest.rotated(self.current_file, self._closed_state(), path)
+            if not self.deferred:
+                self._release(self.current_file)    # a workbook once it is rendered
+        else:
+            self.manifest.add(path)
         return path
 
+    def _hold(self, path):
+        try:
+            self._locks[path] = lock_file(path)
+        except OSError as e:
+            print(f"Exception in hold: {e}")
+
+    def _release(self, path):
+        unlock_file(self._locks.pop(path, None))
+
+    def _claim(self, spare=None):
+        # Creates the next log_<time> file, or gives the spare its name,
+        # without ever replacing a file: another Logger in the directory may
+        # take the same name in the same millisecond
+        while True:
+            path = self._log_path()
+            try:
+                if spare is None:
+                    path.touch(exist_ok=False)
+                    return path
+                try:
+                    os.link(spare, path)
+                except FileExistsError:
+                    raise
+                except OSError:
+                    os.rename(spare, path)  # no hard links on this filesystem
+                    return path
+                os.unlink(spare)
+                return path
+            except FileExistsError:
+                continue
+
+    def _log_path(self):
+        # log_<time>.<type>; a second file in the same millisecond gets _1, _2, ...
+        ts = datetime.datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
+        suffix = f".{self.file_type}" + (self.codec.suffix if self.streaming else "")
+        path = self.log_dir / f"{self.prefix}{ts}{suffix}"
+        n = 0
+        while path.name in self.manifest or path.exists():
+            n += 1
+            path = self.log_dir / f"{self.prefix}{ts}_{n}{suffix}"
+        return path
 
+    def _recover(self):
+        # Files of this logger and type that were still being written when
+        # the last run stopped. Framed files are walked frame head by frame
+        # head and cut after the last complete frame, unframed ones after the
+        # last record that holds data (the rest is the zeroed tail of an mmap
+        # preallocation). Returns (path, header bytes, logical size) of the
+        # newest one for resume() when it is framed.
+        if self.file_type == "xlsx":
+            return None
+        with self._lock:
+            names = [
+                name for name in self.manifest.interrupted
+                if self._owns(name) and name[len(self.prefix):].partition(".")[2] == self.file_type
+            ]
+            for name in names:
+                self.manifest.interrupted.remove(name)
+
+        recovered = None
+        for name in names:      # oldest first
+            path = self.log_dir / name
+            fd = None
+            try:
+                fd = lock_file(path, exclusive=True, wait=False)
+                recovered = self._recover_file(path)
+            except BlockingIOError:
+                recovered = None    # another Logger took it up since the manifest was loaded
+                continue
+            except ValueError:
+                recovered = None    # no complete header, nothing to continue
+            except OSError as e:
+                print(f"Exception in recover: {e}")
+                recovered = None
+                continue
+            finally:
+                unlock_file(fd)
+            self.manifest.close_active(path, RAW)   # its true size
+        return recovered
+
+    def _recover_file(self, path):
+        with open(path, "r+b") as f:
+            size = os.fstat(f.fileno()).st_size
+            if not size:
+                return None
+            recovered = None
+            if self.file_type == "csv":
+                end = _data_end(f, None, size)
+            else:
+                header = binary_format.parse_header(f.read(64 * 1024))
+                start = header["header_size"]
+                if header["framed"]:
+                    f.seek(0)
+                    blob = f.read(start)
+                    end, payload = binary_format.recover_frames(f, start, size)
+                    recovered = path, blob, start + payload
+                else:
+                    end = _data_end(f, header, size)
+            if end < size:
+                f.truncate(end)
+                print(f"[Logger] {path.name}: cut {size - end} bytes of torn or unwritten tail")
+        return recovered
+
+    def resume(self, headers_blob):
+        # Append to the recovered file instead of the fresh one when its
+        # header is the same byte for byte. Returns the logical size written
+        # so far (header + frame payloads), None to start the fresh file.
+        recovered, self.recovered = self.recovered, None
+        if recovered is None or self.streaming:
+            return None
+        path, blob, size = recovered
+        if blob != headers_blob:
+            return None
+        try:
+            lock = lock_file(path, exclusive=True, wait=False)
+        except OSError:
+            return None     # another Logger recovered it in the meantime
+
+        fresh = self.current_file
+        self._release(fresh)
+        self._locks[path] = lock
+        self.manifest.remove(fresh)
+        try:
+            fresh.unlink()
+        except FileNotFoundError:
+            pass
+        self.manifest.reopen(path)
+        self.current_file = path
+        print(f"[Logger] Resuming {path.name}")
+        return size
+
+    def _owns(self, name):
+        # Unnamed logger files are log_<time>, stream files log_<stream>_<time>
+        if not name.startswith(self.prefix):
+            return False
+        return self.stream is not None or name[len(self.prefix):][:1].isdigit()
+
+    def _closed_state(self):
+        return COMPRESSED if self.streaming else RAW
+
+    def open_current(self):
+        self._writer = self._open_writer(self.current_file)
+        return self._writer
+
+    def _open_writer(self, path):
+        # Writer for a log file, compressing on the fly in streaming mode
+        if self.streaming:
+            return self.codec.open(path, "wb", self.level)
+        if self.mmap:
+            return MmapFile(path, self.max_file_size)
+        return open(path, "ab")
+
+    # =========================== NEXT FILE ========================
+    def _remove_dead_spares(self):
+        # Spares left by a crash were never written to; those of live
+        # processes belong to other Loggers
+        for spare in self.log_dir.glob(f"{self.prefix}next.*.spare"):
+            pid = spare.name[len(self.prefix) + 5:].partition("-")[0]
+            if pid.isdigit() and not _pid_alive(int(pid)):
+                try:
+                    spare.unlink()
+                except FileNotFoundError:
+                    pass
+
+    def prepare_next(self, headers_blob=None):
+        # Create, open and header the next file on the spare thread; the
+        # rotation then only swaps handles (take_next)
+        if self._spare is not None:
+            return
+        with self._lock:
+            shared = self._shared
+            if shared.spare_executor is None:
+                shared.spare_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="log-next-file")
+            self._spare = shared.spare_executor.submit(self._open_spare, headers_blob)
+
+    def _open_spare(self, headers_blob):
+        writer = self._open_writer(self._spare_path)
+        self._hold(self._spare_path)
+        if headers_blob:
+            writer.write(headers_blob)
+            writer.flush()
+        return writer
+
+    def take_next(self):
+        # Rotation: the spare gets its log_<time> name and becomes the current
+        # file. Closing the finished one (munmap/truncate, codec trailer) and
+        # the manifest update for both happen on the spare thread.
+        # Returns (writer, headers already written).
+        future, self._spare = self._spare, None
+        finished, finished_writer = self.current_file, self._writer
+        writer = None
+        if future is not None:
+            try:
+                writer = future.result()
+                path = self._claim(self._spare_path)
+                self._locks[path] = self._locks.pop(self._spare_path, None)
+            except Exception as e:
+                print(f"Exception in take_next: {e}")
+                self._release(self._spare_path)
+                if writer is not None:
+                    writer.close()
+                    writer = None
+                    try:
+                        self._spare_path.unlink()
+                    except FileNotFoundError:
+                        pass
+
+        if writer is None:
+            finished_writer.close()
+            self.current_file = self._new_log_file()
+            return self.open_current(), False
+
+        if isinstance(writer, MmapFile):
+            writer.path = path
+        self.current_file = path
+        self._writer = writer
+        self._retiring = self._shared.spare_executor.submit(self._retire, finished_writer, finished, path)
+        return writer, True
+
+    def _retire(self, writer, finished, path):
+        try:
+            writer.close()
+            self.manifest.rotated(finished, self._closed_state(), path)
+            self._release(finished)
+        except Exception as e:
+            print(f"Exception in retire: {e}")
+
+    def _discard_spare(self):
+        future, self._spare = self._spare, None
+        if future is None:
+            return
+        try:
+            future.result().close()
+        except Exception as e:
+            print(f"Exception in prepare_next: {e}")
+        self._release(self._spare_path)
+        try:
+            self._spare_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def sync(self):
+        # Durability: what was written to the current file goes to disk.
+        # Compressed streams only hand over what their codec has emitted.
+        writer = self._writer
+        if isinstance(writer, MmapFile):
+            writer.sync()
+            return
+        writer.flush()
+        try:
+            fd = writer.fileno()
+        except (AttributeError, OSError):
+            return
+        os.fsync(fd)
 
     def directory_size(self):
         # total_size = 0
@@ -50,49 +465,250 @@ class FileManager:
 
         # return total_size
 
-        return sum(f.stat().st_size for f in self.log_dir.iterdir() if f.is_file())
+        # Manifest total plus the live size of every file being written
+        total = self.manifest.total_size()
+        for member in tuple(self._shared.members):
+            total += member._live_growth()
+        return total
+
+    def _live_growth(self):
+        # Bytes written to the current file that the manifest does not know yet
+        try:
+            current = self.current_file
+            writer = self._writer
+            if isinstance(writer, MmapFile) and not writer.closed:
+                size = writer.tell()    # the file itself is preallocated
+            else:
+                size = current.stat().st_size
+            return size - self.manifest.size_of(current.name)
+        except (AttributeError, FileNotFoundError):
+            return 0
     
     #=================================== COMPRESSOR ======================================
     def compress_worker(self, compress_file):
         
-        gz_path = compress_file.with_suffix(compress_file.suffix + ".gz")
-
-        with open(compress_file, "rb") as f_in, gzip.open(gz_path, "wb") as f_out:
-            shutil.copyfileobj(f_in, f_out)
-            compress_file.unlink()
+        gz_path = compress_file.with_name(compress_file.name + self.codec.suffix)
+        size, _ = _compress_file(str(compress_file), str(gz_path), self.codec.name, self.level)
+        self.manifest.compressed(compress_file, gz_path, size)
+
+    def _get_executor(self):
+        shared = self._shared
+        if shared.executor is None:
+            if settings.COMPRESS_EXECUTOR == "process":
+                shared.executor = ProcessPoolExecutor(max_workers=settings.COMPRESS_WORKERS)
+            else:
+                shared.executor = ThreadPoolExecutor(
+                    max_workers=settings.COMPRESS_WORKERS,
+                    thread_name_prefix="compress",
+                )
+        return shared.executor
+
+    #=================================== XLSX RENDERING ===================================
+    def render(self, workbook):
+        # The segment of a finished deferred xlsx file goes to the render
+        # pool; the workbook is not compressed before it is written
+        segment = segment_path(workbook)
+        with self._lock:
+            shared = self._shared
+            if shared.render_executor is None:
+                shared.render_executor = ProcessPoolExecutor(max_workers=settings.XLSX_RENDER_WORKERS)
+            future = shared.render_executor.submit(render_segment, str(segment), str(workbook))
+            shared.rendering[workbook] = future
+
+        future.add_done_callback(lambda fut, path=workbook: self._render_done(path, fut))
+
+    def _render_done(self, workbook, future):
+        error = future.exception()
+        with self._lock:
+            self._shared.rendering.pop(workbook, None)
+            if error is None:
+                size, _, seconds = future.result()
+                self.manifest.close_active(workbook, RAW)     # its real size now
+                self._release(workbook)
+                if self.metrics is not None:
+                    self.metrics.bytes_written += size
+                    self.metrics.render.observe(seconds)
+            else:
+                self.failed_jobs += 1
+                self.last_error = error
+                print(f"[Logger] Rendering of {workbook} failed, its rows stay in {segment_path(workbook)}: {error}")
+            retry, self._compress_after_render = self._compress_after_render, False
+
+        # A rotation skipped this workbook while it was rendering
+        if retry and error is None:
+            try:
+                self.compress_logs()
+            except RuntimeError as e:
+                print(e)
+
+    def rendering_jobs(self):
+        with self._lock:
+            return list(self._shared.rendering)
+
+    def pending_jobs(self):
+        with self._lock:
+            return list(self._pending)
+
+    def compression_status(self):
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "completed": self.completed_jobs,
+                "failed": self.failed_jobs,
+                "last_error": str(self.last_error) if self.last_error else None,
+            }
+
+    def shutdown(self, wait=True):
+        # The pools are shared by the streams of the directory, the last one stops them
+        self._discard_spare()
+        if self._retiring is not None:
+            self._retiring.result()     # its manifest update comes before the final one below
+        shared = self._shared
+        with self._lock:
+            if self in shared.members:
+                shared.members.remove(self)
+            last = not shared.members
+            renderer = shared.render_executor if last else None
+            if renderer is not None:
+                shared.render_executor = None
+            spare = shared.spare_executor if last else None
+            if spare is not None:
+                shared.spare_executor = None
+            if self._disk_changed in self.disk.listeners:
+                self.disk.listeners.remove(self._disk_changed)
+
+        if spare is not None:
+            spare.shutdown(wait=wait)
+        if last:
+            self.disk.stop()
+
+        # Workbooks first: a finished one may still submit its compression
+        if renderer is not None:
+            renderer.shutdown(wait=wait)
+
+        with self._lock:
+            executor = shared.executor if last else None
+            if executor is not None:
+                shared.executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+        # Writer is done with the current file: record its final size
+        if self.current_file is not None:
+            self.manifest.close_active(self.current_file, self._closed_state())
+        for path in list(self._locks):
+            self._release(path)
 
     #=================================== GZ_SORTER ========================================
     def gz_files_sort(self):
-        files = sorted(
-            (f for f in self.log_dir.rglob("*.gz") if f.is_file()),
-            key=lambda f: f.stat().st_mtime
-        )
-
-        return files
+        # Oldest first, straight from the manifest
+        return [self.log_dir / name for name in self.manifest.files(COMPRESSED)]
     
 
+    #================================= DISK SPACE =========================================
+    def _disk_changed(self, old, new):
+        # Runs on the monitor thread. Filling up: compress what is already closed now
+        if new >= DISK_COMPRESS > old:
+            try:
+                self.compress_logs()
+            except RuntimeError as e:
+                print(e)
+        if self.on_disk_mode:
+            self.on_disk_mode(old, new)
+
     #================================= COMPRESSOR LOGS ====================================
     def compress_logs(self):
 
-        if not self.compress:
+        # With the disk filling up every closed file is compressed, whatever the logger's setting
+        filling = self.disk.mode >= DISK_COMPRESS
+        if not self.compress and not filling:
             return
-        # Compress oldest non-gz file
-        sorted_files = sorted(
-            (
-                f for f in self.log_dir.iterdir()
-                if f.is_file()
-                and not f.name.endswith(".gz")
-                and f != self.current_file
-            ),
-            key=lambda f: f.stat().st_mtime,
-        )
 
-        if not sorted_files:
+        # A retention failure from a finished job stops logging like before
+        if self.critical_error is not None:
+            raise self.critical_error
+
+        # Files were compressed while written, only retention is left
+        if self.streaming:
+            with self._lock:
+                self._enforce_retention()
             return
 
-        compress_file = sorted_files[0]
-        self.compress_worker(compress_file)
+        with self._lock:
+            # Compress oldest non-gz files that are not already being compressed
+            sorted_files = [
+                f for f in (self.log_dir / name for name in self.manifest.files(RAW))
+                if f != self.current_file
+                and f not in self._pending
+                and self._owns(f.name)
+            ]
+
+            # Normally one file per rotation; catch up when earlier rotations
+            # found the pool busy and left more than MAX_FILES raw files behind
+            excess = len(sorted_files) if filling else max(len(sorted_files) + 1 - settings.MAX_FILES, 1)
+            jobs = []
+
+            for compress_file in sorted_files[:excess]:
+                if len(self._pending) >= settings.COMPRESS_MAX_PENDING:
+                    break  # pool is busy, the file is picked up on a later rotation
+                if compress_file in self._shared.rendering:
+                    self._compress_after_render = True    # its workbook is not written yet
+                    continue
+                if in_use(compress_file):
+                    continue    # written or compressed by a Logger of another process
+
+                gz_path = compress_file.with_name(compress_file.name + self.codec.suffix)
+                future = self._get_executor().submit(
+                    _compress_file, str(compress_file), str(gz_path), self.codec.name, self.level
+                )
+                self._pending[compress_file] = future
+                jobs.append((compress_file, gz_path, future))
+
+        for compress_file, gz_path, future in jobs:
+            if self.on_compress_pending:
+                self.on_compress_pending(compress_file)
+
+            future.add_done_callback(
+                lambda fut, src=compress_file, dst=gz_path: self._compress_done(src, dst, fut)
+            )
 
+    def _compress_done(self, compress_file, gz_path, future):
+        error = future.exception()
+
+        with self._lock:
+            self._pending.pop(compress_file, None)
+            if error is None:
+                size, seconds = future.result()
+                self.completed_jobs += 1
+                self.manifest.compressed(compress_file, gz_path, size)
+                if self.metrics is not None:
+                    self.metrics.compression.observe(seconds)
+            elif isinstance(error, (BlockingIOError, FileNotFoundError)):
+                # A Logger of another process compresses it or already has
+                if not compress_file.exists():
+                    self.manifest.remove(compress_file)
+            else:
+                self.failed_jobs += 1
+                if not compress_file.exists():
+                    self.manifest.remove(compress_file)
+                self.last_error = error
+                print(f"[Logger] Compression of {compress_file} failed: {error}")
+
+            # Retention runs under the lock so overlapping jobs never
+            # delete the same archive twice or count a file twice.
+            # A logger without compression only compresses because the
+            # disk is filling up, it never deletes or stops over it.
+            if error is None and self.compress:
+                try:
+                    self._enforce_retention()
+                except RuntimeError as e:
+                    self.critical_error = e
+                    print(e)
+
+        if self.on_compress_done:
+            self.on_compress_done(compress_file, gz_path if error is None else None, error)
+
+    def _enforce_retention(self):
         dir_size = self.directory_size()
 
         if dir_size >= self.warning_bytes:
@@ -102,18 +718,26 @@ class FileManager:
             )
 
         if dir_size >= self.dir_max_size:
-            gz_files = self.gz_files_sort()
+            # Archives of streams without compression are not retention's to delete
+            keep = self._shared.uncompressed
+            gz_files = [f for f in self.gz_files_sort() if not any(m._owns(f.name) for m in keep)]
 
             for old_gz in gz_files:
-                size = old_gz.stat().st_size
-                old_gz.unlink()
+                size = self.manifest.size_of(old_gz.name)
+                try:
+                    old_gz.unlink()
+                except FileNotFoundError:
+                    pass
+                self.manifest.remove(old_gz)
                 print(f"[Logger] Deleted {old_gz} to free space.")
                 dir_size -= size
                 if dir_size < self.dir_max_size:
                     break
 
-        if dir_size >= self.dir_max_size:
-            raise Exception(
+        # Still over the limit: only fatal when no other job is in flight
+        # that will shrink another raw file
+        if dir_size >= self.dir_max_size and not self._pending:
+            raise RuntimeError(
                 f"[CRITICAL] Logging stopped: {self.log_dir} exceeds "
                 f"{self.dir_max_size // (1024 * 1024)} MB."
             )
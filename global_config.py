@@ -3,25 +3,97 @@ from pathlib import Path
 
 class LoggerConfig:
     def __init__(self, path="config.yaml"):
+        # A relative path not found in the working directory is taken from
+        # next to this module, so scripts started elsewhere still load it
+        path = Path(path)
+        if not path.is_absolute() and not path.exists():
+            path = Path(__file__).resolve().parent / path
         with open(path, "r") as f:
             data = yaml.safe_load(f)
         
         # --- Storage Safety Settings ---
         self.STORAGE_THRESHOLD_PERCENT = data['storage']['threshold_percent']
+        self.STORAGE_COMPRESS_PERCENT = data['storage']['compress_percent']
+        self.STORAGE_SAMPLE_PERCENT = data['storage']['sample_percent']
+        self.STORAGE_SAMPLE_EVERY = data['storage']['sample_every']
+        self.STORAGE_RECOVER_MARGIN_PERCENT = data['storage']['recover_margin_percent']
+        self.STORAGE_POLL_INTERVAL_S = data['storage']['poll_interval_s']
         self.LOG_DIRECTORY_MAX_SIZE_MB = data['storage']['max_directory_size_mb']
         self.MAX_DIRECTORY_WARNING_THRESHOLD = data['storage']['max_dir_warning_threshold']
         self.MAX_FILES = data['storage']['max_files']
 
+        # --- Background Compression ---
+        self.COMPRESS_EXECUTOR = data['compression']['executor']
+        self.COMPRESS_WORKERS = data['compression']['workers']
+        self.COMPRESS_MAX_PENDING = data['compression']['max_pending']
+        self.COMPRESS_CODEC = data['compression']['codec']
+        self.COMPRESS_LEVEL = data['compression']['level']
+        self.COMPRESS_STREAMING = data['compression']['streaming']
+
+        # --- Queue / Ring Overflow ---
+        self.OVERFLOW_POLICY = data['overflow']['policy']
+        self.OVERFLOW_BLOCK_TIMEOUT_MS = data['overflow']['block_timeout_ms']
+        self.OVERFLOW_SAMPLE_EVERY = data['overflow']['sample_every']
+        self.OVERFLOW_WINDOW_S = data['overflow']['window_s']
+        self.OVERFLOW_WINDOWS = data['overflow']['windows']
+        self.GAP_MARKERS = data['overflow']['gap_markers']
+
+        # --- Durability ---
+        self.DURABILITY_POLICY = data['durability']['policy']
+        self.DURABILITY_INTERVAL_MS = data['durability']['interval_ms']
+        self.DURABILITY_BYTES_KB = data['durability']['bytes_kb']
+
+        # --- File Rotation ---
+        self.ROTATION_INTERVAL_S = data['rotation']['interval_s']
+        self.ROTATION_RECORDS = data['rotation']['records']
+        self.ROTATION_PREPARE_NEXT = data['rotation']['prepare_next']
+
+        # --- Crash Recovery ---
+        self.FRAMING_ENABLED = data['framing']['enabled']
+        self.FRAMING_RESUME = data['framing']['resume']
+
+        # --- Block Index ---
+        self.INDEX_ENABLED = data['index']['enabled']
+        self.INDEX_BLOCK_KB = data['index']['block_kb']
+        self.INDEX_TIMESTAMP_FIELD = data['index']['timestamp_field']
+
+        # --- TLV Encoding ---
+        self.TLV_VERSION = data['tlv']['version']
+        self.TLV_FLOAT32 = data['tlv']['float32']
+        self.TLV_DELTA_FIELD = data['tlv']['delta_field']
+        self.TLV_DICTIONARY_SIZE = data['tlv']['dictionary_size']
+
+        # --- Columnar Files (col.bin) ---
+        self.COLUMNAR_BLOCK_ROWS = data['columnar']['block_rows']
+        self.COLUMNAR_CODEC = data['columnar']['codec']
+        self.COLUMNAR_LEVEL = data['columnar']['level']
+
+        # --- Pipeline Metrics ---
+        self.METRICS_LATENCY_SAMPLE_EVERY = data['metrics']['latency_sample_every']
+        self.METRICS_INTERVAL_S = data['metrics']['interval_s']
+        self.METRICS_JSON_PATH = data['metrics']['json_path']
+        self.METRICS_PROMETHEUS_PATH = data['metrics']['prometheus_path']
+
         # --- Logger Performance & Defaults ---
         self.LOG_DIRECTORY = Path(data['logger']['directory'])
         self.MAX_FILE_SIZE_MB = data['logger']['max_file_size_mb']
         self.QUEUE_SIZE = data['logger']['queue_size']
+        self.BATCH_SIZE = data['logger']['batch_size']
+        self.BATCH_BYTES = data['logger']['batch_bytes']
+        self.MAX_LINGER_MS = data['logger']['max_linger_ms']
+        self.WRITER = data['logger']['writer']
+        self.STREAM_WORKERS = data['logger']['stream_workers']
+        self.TRANSPORT = data['logger']['transport']
+        self.RING_SLOTS = data['logger']['ring_slots']
+        self.RING_SLOT_SIZE = data['logger']['ring_slot_size']
         self.DEFAULT_FILE_TYPE = data['logger']['default_file_type']
         self.DEFAULT_COMPRESS = data['logger']['default_compress']
         self.ENCODER = data['logger']['encoder']
 
         # --- XLSX Configs & Defaults ---
         self.XLSX_MAX_ROWS = data['xlsxconfig']['rows']
+        self.XLSX_DEFERRED = data['xlsxconfig']['deferred']
+        self.XLSX_RENDER_WORKERS = data['xlsxconfig']['render_workers']
 
 # This is the SHARED instance
 settings = LoggerConfig()
\ No newline at end of file
@@ -0,0 +1,620 @@
+import os
+import mmap
+import binary_format
+import block_index
+import columnar
+import compressors
+import manifest
+
+try:
+    import numpy as np
+except ImportError:  # the reader is the one part of the package that needs NumPy
+    np = None
+
+HEADER_PEEK = 64 * 1024
+CHUNK_BYTES = 64 * 1024 * 1024
+
+# TLV1 value types (see Logger._encode_record_tlvbin)
+_TLV_BOOL, _TLV_INT, _TLV_FLOAT, _TLV_STRING, _TLV_BYTES, _TLV_NONE = 1, 2, 3, 4, 5, 6
+
+
+# =========================== PUBLIC API ========================
+def read_log(path, columns=False, with_gaps=False, fields=None):
+    # Whole LOG1 (typed), TLV1 or COL1 file, plain or compressed, as a NumPy
+    # structured array (columns=True: dict of name -> array). Plain files
+    # are memory mapped; fixed width records are a zero copy view of them.
+    # with_gaps=True also returns an (n, 2) array of gap markers:
+    # [data rows before the gap, records lost]. fields keeps only those
+    # columns; col.bin files then only decompress them.
+    _need_numpy()
+    buf, header = _source(path)
+    decoder = _decoder(header, fields, _zero_tail(path, header))
+
+    data, gaps, _ = decoder(buf, header["header_size"], len(buf))
+    return _result(_select(data, fields), gaps, columns, with_gaps)
+
+
+def iter_log(path, chunk_bytes=CHUNK_BYTES, columns=False, with_gaps=False, fields=None):
+    # Same as read_log() in chunks of about chunk_bytes of file data, for
+    # files (or archives) larger than memory. Gap rows count within a chunk.
+    _need_numpy()
+    with compressors.open_log(path, "rb") as f:
+        pending = _read_full(f, HEADER_PEEK)
+        header = binary_format.parse_header(pending)
+        decoder = _decoder(header, fields, _zero_tail(path, header))
+        pending = pending[header["header_size"]:]
+        if header["framed"]:
+            f = binary_format.FrameReader(f, pending)
+            pending = b""
+
+        while True:
+            # A col.bin block bigger than a chunk doubles the read
+            more = _read_full(f, max(chunk_bytes - len(pending), len(pending), 1))
+            buf = pending + more
+
+            data, gaps, used = decoder(buf, 0, len(buf))
+            if _count(data) or gaps is not None:
+                yield _result(_select(data, fields), gaps, columns, with_gaps)
+
+            # End of file or its zeroed tail; trailing zero records of a
+            # fixed width chunk wait in pending until data follows them
+            if not more or used < 0:
+                return
+            pending = buf[used:]
+
+
+def read_window(path, t0=None, t1=None, field=None, columns=False):
+    # Records with t0 <= field <= t1 (first field by default). Plain files
+    # only decode the blocks the block index points at, col.bin files only
+    # the blocks whose min/max overlap. Compressed files and delta or
+    # dictionary coded TLV v2 (a block needs the records before it) are read whole.
+    _need_numpy()
+    buf, header = _source(path)
+    field = field or header["schema"][0]
+
+    if header["magic"] == binary_format.COL1_MAGIC:
+        decoder = _ColumnDecoder(header, where=(field, t0, t1))
+        data = decoder(buf, header["header_size"], len(buf))[0]
+    elif compressors.codec_for_path(path) is None and header["delta"] is None and not header["dictionary"]:
+        decoder = _decoder(header, None, _zero_tail(path, header))
+        blocks = block_index.load_index(path, field=field)
+        # A block ends where the next one starts
+        ends = [b.offset for b in blocks[1:]] + [len(buf)]
+        spans = {b.offset: end for b, end in zip(blocks, ends)}
+        parts = [
+            decoder(buf, block.offset, spans[block.offset])[0]
+            for block in block_index.blocks_in_time(blocks, t0, t1)
+        ]
+        data = _concat(parts, header)
+    else:
+        data = _decoder(header, None, _zero_tail(path, header))(buf, header["header_size"], len(buf))[0]
+
+    values = _column(data, field).astype("f8")
+    mask = np.ones(len(values), dtype=bool)
+    if t0 is not None:
+        mask &= values >= t0
+    if t1 is not None:
+        mask &= values <= t1
+    return _result(_take(data, mask), None, columns, False)
+
+
+# =========================== SOURCES ========================
+def _need_numpy():
+    if np is None:
+        raise ImportError("log_reader needs NumPy (pip install numpy)")
+
+
+def _load(path):
+    # Plain files are mapped, archives are decompressed into memory
+    if compressors.codec_for_path(path) is not None:
+        with compressors.open_log(path, "rb") as f:
+            return f.read()
+
+    with open(path, "rb") as f:
+        if not os.fstat(f.fileno()).st_size:
+            raise ValueError(f"{path} is empty")
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _source(path):
+    # File data and header; framed files without their frame heads, the
+    # record stream block index offsets refer to
+    buf = _load(path)
+    header = binary_format.parse_header(bytes(buf[:HEADER_PEEK]))
+    if header["framed"]:
+        buf = binary_format.unframe(buf, header["header_size"])
+    return buf, header
+
+
+def _zero_tail(path, header):
+    # Fixed width records of a plain file may end in the zeroed tail of a
+    # preallocated file, unless the manifest has closed the file at this
+    # size. Archives and framed files never do.
+    return (
+        compressors.codec_for_path(path) is None
+        and not header["framed"]
+        and not manifest.is_closed(path)
+    )
+
+
+def _read_full(f, n):
+    # Stream readers (zstd) may return less than asked before the end
+    parts = []
+    while n > 0:
+        chunk = f.read(n)
+        if not chunk:
+            break
+        parts.append(chunk)
+        n -= len(chunk)
+    return b"".join(parts)
+
+
+def _decoder(header, fields=None, zero_tail=False):
+    if header["magic"] == binary_format.COL1_MAGIC:
+        return _ColumnDecoder(header, fields)
+    if header["magic"] == binary_format.LOG1_MAGIC:
+        if header["types"] is None:
+            raise ValueError(
+                "Untyped bin records carry no field types and cannot be decoded, "
+                "log with typed headers (name:type)"
+            )
+        return _FixedDecoder(header, zero_tail)
+    if header["version"] == binary_format.TLV2_VERSION:
+        return _Tlv2Decoder(header)
+    return _TlvDecoder(header)
+
+
+# =========================== FIXED WIDTH (LOG1 v2) ========================
+class _FixedDecoder:
+    def __init__(self, header, zero_tail=False):
+        self.schema = header["schema"]
+        self.zero_tail = zero_tail
+        self.gap_markers = bool(header["flags"] & binary_format.LOG1_FLAG_GAP_MARKERS)
+        self.dtype = np.dtype(binary_format.numpy_descr(self.schema, header["types"], self.gap_markers))
+        self.size = self.dtype.itemsize
+
+    def __call__(self, buf, start, end):
+        # Complete records in buf[start:end] -> (array, gaps, bytes used).
+        # All zero records at the end are not used: a zeroed tail, or
+        # records whose data only the next chunk shows.
+        count = (end - start) // self.size
+        used = start + count * self.size
+        if self.zero_tail:
+            used = binary_format.data_end(buf, start, used, self.size)
+            count = (used - start) // self.size
+        arr = np.frombuffer(buf, dtype=self.dtype, count=count, offset=start)
+
+        if not self.gap_markers:
+            return arr, None, used
+
+        kinds = arr["_kind"]
+        gap_rows = np.flatnonzero(kinds == binary_format.RECORD_GAP)
+        gaps = None
+        if gap_rows.size:
+            width = min(4, self.size - 1)
+            lost = [
+                int.from_bytes(bytes(buf[start + r * self.size + 1:start + r * self.size + 1 + width]), "little")
+                for r in gap_rows.tolist()
+            ]
+            gaps = np.column_stack([gap_rows - np.arange(gap_rows.size), lost]).astype(np.int64)
+            arr = arr[kinds == binary_format.RECORD_DATA]
+        return arr[list(self.schema)], gaps, used
+
+
+# =========================== VARIABLE WIDTH (TLV1) ========================
+def _u16(u8, at):
+    return u8[at].astype(np.int64) | (u8[at + 1].astype(np.int64) << 8)
+
+
+def _gather(u8, at, width, dtype):
+    # width bytes at every offset in at -> one value each
+    if not len(at):
+        return np.zeros(0, dtype=dtype)
+    return np.ascontiguousarray(u8[at[:, None] + np.arange(width)]).view(dtype).ravel()
+
+
+class _TlvDecoder:
+    def __init__(self, header):
+        self.schema = header["schema"]
+
+    def _starts(self, u8, pos, end):
+        # Offsets of the complete records in u8[pos:end]. Runs of equal
+        # length records (the usual case) are found and checked with one
+        # vectorized step; the window grows while runs continue.
+        # Returns (starts, end of the last record, hit a zero length).
+        runs = []
+        window = 64
+        while pos + 2 <= end:
+            length = int(u8[pos]) | int(u8[pos + 1]) << 8
+            if not length:
+                return _concat_int(runs), pos, True   # unwritten (zeroed) tail
+            step = length + 2
+            n = min((end - pos) // step, window)
+            if not n:
+                break
+            starts = pos + np.arange(n, dtype=np.int64) * step
+            bad = np.flatnonzero(_u16(u8, starts) != length)
+            k = int(bad[0]) if bad.size else n
+            runs.append(starts[:k])
+            pos += k * step
+            window = window * 2 if k == n else 64
+        return _concat_int(runs), pos, False
+
+    def __call__(self, buf, start, end):
+        u8 = np.frombuffer(buf, dtype=np.uint8)
+        starts, used, zero_tail = self._starts(u8, start, end)
+
+        # Gap markers are records with a single type 7 entry
+        first_type = u8[starts + 2] if len(starts) else np.zeros(0, np.uint8)
+        is_gap = first_type == binary_format.TLV_TYPE_GAP
+        gaps = None
+        if is_gap.any():
+            gap_rows = np.flatnonzero(is_gap)
+            lost = _gather(u8, starts[gap_rows] + 5, 8, "<u8").astype(np.int64)
+            gaps = np.column_stack([gap_rows - np.arange(gap_rows.size), lost])
+            starts = starts[~is_gap]
+
+        columns = {}
+        at = starts + 2
+        for name in self.schema:
+            kinds = u8[at]
+            lengths = _u16(u8, at + 1)
+            columns[name] = self._values(u8, buf, kinds, at + 3, lengths)
+            at = at + 3 + lengths
+
+        # A zeroed tail ends the file, nothing after it is read
+        return (columns, len(starts)), gaps, -1 if zero_tail else used
+
+    @staticmethod
+    def _values(u8, buf, kinds, at, lengths):
+        present = set(np.unique(kinds).tolist())
+
+        if present <= {_TLV_INT}:
+            return _gather(u8, at, 8, "<i8")
+        if present <= {_TLV_INT, _TLV_FLOAT, _TLV_NONE}:
+            # Mixed numbers (or missing values) become float64, None is NaN
+            out = np.full(len(kinds), np.nan)
+            ints = kinds == _TLV_INT
+            floats = kinds == _TLV_FLOAT
+            out[ints] = _gather(u8, at[ints], 8, "<i8")
+            out[floats] = _gather(u8, at[floats], 8, "<f8")
+            return out
+        if present <= {_TLV_BOOL}:
+            return u8[at] != 0
+
+        # Strings, bytes and anything mixed: one Python object per value
+        out = np.empty(len(kinds), dtype=object)
+        for i, (kind, offset, length) in enumerate(zip(kinds.tolist(), at.tolist(), lengths.tolist())):
+            raw = bytes(buf[offset:offset + length])
+            if kind == _TLV_STRING:
+                out[i] = raw.decode("utf-8")
+            elif kind == _TLV_INT:
+                out[i] = int.from_bytes(raw, "little", signed=True)
+            elif kind == _TLV_FLOAT:
+                out[i] = np.frombuffer(raw, "<f8")[0]
+            elif kind == _TLV_BOOL:
+                out[i] = raw != b"\x00"
+            elif kind == _TLV_NONE:
+                out[i] = None
+            else:
+                out[i] = raw
+        return out
+
+
+# =========================== COLUMNAR (COL1) ========================
+class _ColumnDecoder:
+    def __init__(self, header, fields=None, where=None):
+        self.schema = header["schema"]
+        self.types = header["types"]
+        self.directory = columnar.directory_struct(self.types)
+        self.dtypes = [np.dtype(d) for _, d in binary_format.numpy_descr(self.schema, self.types)]
+        if fields is not None:
+            unknown = set(fields) - set(self.schema)
+            if unknown:
+                raise ValueError(f"Unknown fields {sorted(unknown)}")
+        self.fields = set(fields) if fields is not None else set(self.schema)
+        # where=(field, lo, hi): skip blocks whose stats rule out the range
+        self.where = where
+        if where is not None:
+            self.fields.add(where[0])
+
+    def __call__(self, buf, start, end):
+        # Complete blocks in buf[start:end]; only the wanted columns are
+        # decompressed, blocks ruled out by their min/max are not touched
+        parts = {name: [] for name in self.schema if name in self.fields}
+        gaps, count, pos = [], 0, start
+        where = self.where
+        if where is not None:
+            where_at = self.schema.index(where[0])
+
+        while True:
+            try:
+                info = columnar.read_block_head(buf, pos, self.types, self.directory)
+            except EOFError:
+                pos = -1        # zeroed tail of a preallocated file
+                break
+            if info is None or info[4] > end:
+                break
+            rows, lost, entries, at, block_end = info
+
+            if lost:
+                gaps.append((count, lost))
+            if rows and (where is None or columnar.block_matches(entries[where_at], where[1], where[2])):
+                for name, dtype, (codec, length, _, _) in zip(self.schema, self.dtypes, entries):
+                    if name in parts:
+                        raw = columnar.decompress(codec, buf[at:at + length])
+                        parts[name].append(np.frombuffer(raw, dtype=dtype, count=rows))
+                    at += length
+                count += rows
+            pos = block_end
+
+        columns = {
+            name: (np.concatenate(arrays) if len(arrays) > 1 else arrays[0]) if arrays
+            else np.zeros(0, dtype=self.dtypes[self.schema.index(name)])
+            for name, arrays in parts.items()
+        }
+        gaps = np.array(gaps, dtype=np.int64) if gaps else None
+        return (columns, count), gaps, pos
+
+
+# =========================== VARIABLE WIDTH (TLV1 v2) ========================
+def _varints(u8, at):
+    # Varint at every offset in at -> (uint64 values, bytes used)
+    value = np.zeros(len(at), dtype=np.uint64)
+    used = np.zeros(len(at), dtype=np.int64)
+    active = np.ones(len(at), dtype=bool)
+    last = len(u8) - 1
+    for k in range(10):
+        byte = u8[np.minimum(at + k, last)].astype(np.uint64)
+        value |= np.where(active, (byte & 0x7F) << np.uint64(7 * k), np.uint64(0))
+        used += active
+        active &= byte >= 0x80
+        if not active.any():
+            break
+    return value, used
+
+
+def _unzigzag(raw):
+    return (raw >> np.uint64(1)).astype(np.int64) ^ -(raw & np.uint64(1)).astype(np.int64)
+
+
+class _Tlv2Decoder:
+    _INTS = {binary_format.TLV2_INT, binary_format.TLV2_KEY, binary_format.TLV2_DELTA}
+    _NUMBERS = _INTS | {binary_format.TLV2_FLOAT64, binary_format.TLV2_FLOAT32, binary_format.TLV2_NONE}
+    _BOOLS = {binary_format.TLV2_TRUE, binary_format.TLV2_FALSE}
+
+    def __init__(self, header):
+        self.schema = header["schema"]
+        self.delta = header["delta"]
+        self.prev = None        # delta chain value carried from the previous chunk
+        self.entries = [([], []) for _ in self.schema]   # per field dictionary: (kinds, values)
+
+    def _starts(self, u8, pos, end):
+        # Offsets of the record bodies in u8[pos:end], found in vectorized runs
+        # of records with the same (varint) length like TLV v1.
+        # Returns (body offsets, end of the last record, hit a zero length).
+        runs = []
+        window = 64
+        while pos < end:
+            length = shift = 0
+            body = pos
+            while body < end:
+                byte = int(u8[body])
+                body += 1
+                length |= (byte & 0x7F) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            else:
+                break       # length cut off at the end of the chunk
+            if not length:
+                return _concat_int(runs), pos, True   # unwritten (zeroed) tail
+            head = body - pos
+            step = head + length
+            n = min((end - pos) // step, window)
+            if not n:
+                break
+            starts = pos + np.arange(n, dtype=np.int64) * step
+            same = np.ones(n, dtype=bool)
+            for k in range(head):
+                same &= u8[starts + k] == u8[pos + k]
+            bad = np.flatnonzero(~same)
+            k = int(bad[0]) if bad.size else n
+            runs.append(starts[:k] + head)
+            pos += k * step
+            window = window * 2 if k == n else 64
+        return _concat_int(runs), pos, False
+
+    def __call__(self, buf, start, end):
+        u8 = np.frombuffer(buf, dtype=np.uint8)
+        at, used, zero_tail = self._starts(u8, start, end)
+
+        is_gap = u8[at] == binary_format.TLV2_GAP if len(at) else np.zeros(0, dtype=bool)
+        gaps = None
+        if is_gap.any():
+            gap_rows = np.flatnonzero(is_gap)
+            lost = _varints(u8, at[gap_rows] + 1)[0].astype(np.int64)
+            gaps = np.column_stack([gap_rows - np.arange(gap_rows.size), lost])
+            at = at[~is_gap]
+
+        columns = {}
+        for i, name in enumerate(self.schema):
+            columns[name], at = self._column(u8, buf, u8[at], at + 1, i)
+
+        return (columns, len(at)), gaps, -1 if zero_tail else used
+
+    def _column(self, u8, buf, kinds, at, field):
+        # Values of one field at every offset -> (column, offsets of the next field)
+        width = np.zeros(len(kinds), dtype=np.int64)
+
+        # Dictionary entries: the value follows with its own type byte
+        is_new = kinds == binary_format.TLV2_DICT_NEW
+        has_new = bool(is_new.any())
+        if has_new:
+            at = at.copy()
+            kinds = kinds.copy()
+            kinds[is_new] = u8[at[is_new]]
+            at[is_new] += 1
+            entry_kinds, entry_values = self.entries[field]
+            entry_kinds.extend(kinds[is_new].tolist())
+
+        # References: the kind of the entry they point at decides the column type
+        is_ref = kinds == binary_format.TLV2_DICT_REF
+        refs = None
+        present_kinds = kinds
+        if is_ref.any():
+            refs, width[is_ref] = _varints(u8, at[is_ref])
+            entry_kinds = self.entries[field][0]
+            if len(refs) and int(refs.max()) >= len(entry_kinds):
+                raise ValueError("TLV v2 dictionary reference to a missing entry")
+            present_kinds = kinds.copy()
+            present_kinds[is_ref] = np.asarray(entry_kinds, dtype=np.uint8)[refs]
+        present = set(np.unique(present_kinds).tolist())
+
+        is_int = np.isin(kinds, list(self._INTS))
+        ints = None
+        if is_int.any():
+            raw, width[is_int] = _varints(u8, at[is_int])
+            ints = _unzigzag(raw)
+            if field == self.delta:
+                ints = self._chain(ints, kinds[is_int])
+
+        f64 = kinds == binary_format.TLV2_FLOAT64
+        f32 = kinds == binary_format.TLV2_FLOAT32
+        width[f64] = 8
+        width[f32] = 4
+
+        text = (kinds == binary_format.TLV2_STRING) | (kinds == binary_format.TLV2_BYTES)
+        lengths = None
+        if text.any():
+            lengths, head = _varints(u8, at[text])
+            lengths = lengths.astype(np.int64)
+            width[text] = head + lengths
+
+        after = at + width
+
+        if present <= self._INTS:
+            return ints, after
+        if present <= self._NUMBERS:
+            out = np.full(len(kinds), np.nan)
+            if ints is not None:
+                out[is_int] = ints
+            out[f64] = _gather(u8, at[f64], 8, "<f8")
+            out[f32] = _gather(u8, at[f32], 4, "<f4")
+            return self._expand(out, field, is_new, has_new, is_ref, refs), after
+        if present <= self._BOOLS:
+            return kinds == binary_format.TLV2_TRUE, after
+
+        # Strings, bytes and anything mixed: one Python object per value
+        out = np.empty(len(kinds), dtype=object)
+        if ints is not None:
+            out[is_int] = ints.tolist()
+        if f64.any():
+            out[f64] = _gather(u8, at[f64], 8, "<f8").tolist()
+        if f32.any():
+            out[f32] = _gather(u8, at[f32], 4, "<f4").tolist()
+        out[kinds == binary_format.TLV2_TRUE] = True
+        out[kinds == binary_format.TLV2_FALSE] = False
+        if lengths is not None:
+            rows = np.flatnonzero(text)
+            starts = (at[text] + head).tolist()
+            for row, offset, length in zip(rows.tolist(), starts, lengths.tolist()):
+                raw = bytes(buf[offset:offset + length])
+                out[row] = raw.decode("utf-8") if kinds[row] == binary_format.TLV2_STRING else raw
+        return self._expand(out, field, is_new, has_new, is_ref, refs), after
+
+    def _expand(self, out, field, is_new, has_new, is_ref, refs):
+        # Keep this chunk's new dictionary entries, then fill in the references
+        entry_values = self.entries[field][1]
+        if has_new:
+            entry_values.extend(out[is_new].tolist())
+        if refs is not None:
+            table = np.empty(len(entry_values), dtype=object)
+            table[:] = entry_values
+            out[is_ref] = table[refs]
+        return out
+
+    def _chain(self, values, kinds):
+        # KEY values start a chain, DELTA values add to the one before;
+        # plain INT values (from encoders outside the worker) are left alone
+        chained = kinds != binary_format.TLV2_INT
+        x = values[chained]
+        if not len(x):
+            return values
+
+        is_key = kinds[chained] == binary_format.TLV2_KEY
+        total = np.cumsum(x)
+        segment = np.cumsum(is_key)
+        if not segment[0] and self.prev is None:
+            raise ValueError("TLV v2 delta record without a preceding key")
+        bases = (total - x)[is_key]
+        offset = np.where(segment > 0, bases[np.maximum(segment - 1, 0)] if len(bases) else 0, -(self.prev or 0))
+
+        out = values.copy()
+        out[chained] = total - offset
+        self.prev = int(out[chained][-1])
+        return out
+
+
+def _concat_int(runs):
+    if not runs:
+        return np.zeros(0, dtype=np.int64)
+    return runs[0] if len(runs) == 1 else np.concatenate(runs)
+
+
+# =========================== RESULTS ========================
+def _select(data, fields):
+    if fields is None:
+        return data
+    if isinstance(data, tuple):
+        return {name: data[0][name] for name in fields}, data[1]
+    return data[list(fields)]
+
+
+def _count(data):
+    return data[1] if isinstance(data, tuple) else len(data)
+
+
+def _column(data, name):
+    if isinstance(data, tuple):
+        return data[0][name]
+    return data[name]
+
+
+def _take(data, mask):
+    if isinstance(data, tuple):
+        columns = {name: col[mask] for name, col in data[0].items()}
+        return columns, int(mask.sum())
+    return data[mask]
+
+
+def _concat(parts, header):
+    if header["magic"] == binary_format.LOG1_MAGIC:
+        if not parts:
+            return _FixedDecoder(header)(b"", 0, 0)[0]
+        return np.concatenate(parts)
+
+    schema = header["schema"]
+    if not parts:
+        return {name: np.zeros(0) for name in schema}, 0
+    columns = {name: np.concatenate([p[0][name] for p in parts]) for name in schema}
+    return columns, sum(p[1] for p in parts)
+
+
+def _result(data, gaps, columns, with_gaps):
+    if isinstance(data, tuple):
+        cols, count = data
+        if columns:
+            out = cols
+        else:
+            out = np.empty(count, dtype=[(name, col.dtype) for name, col in cols.items()])
+            for name, col in cols.items():
+                out[name] = col
+    elif columns:
+        out = {name: data[name] for name in data.dtype.names}
+    else:
+        out = data
+
+    if with_gaps:
+        return out, gaps if gaps is not None else np.zeros((0, 2), dtype=np.int64)
+    return out
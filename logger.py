@@ -1,10 +1,88 @@
 import threading
 import queue
 import struct
+import time
+import math
+from collections import deque
 from openpyxl import Workbook
 from global_config import settings
-from storage import SystemStorage
+from storage import DISK_MODES, DISK_NORMAL, DISK_COMPRESS, DISK_SAMPLE, DISK_STOP
 from file_manager import FileManager
+import binary_format
+from ring_buffer import RingBuffer
+from shared_logger import SharedChannel
+from overflow import OverflowStats
+import metrics as metrics_export
+from metrics import LoggerMetrics
+from streams import StreamScheduler, STREAM_NAME
+from block_index import NAN, BlockIndex, timestamp_reader
+from columnar import ColumnBlocks
+import xlsx_render
+
+# When the byte workers fsync what they wrote (see config.yaml durability)
+DURABILITY_POLICIES = ("none", "interval", "bytes", "rotation")
+
+try:
+    import numpy as np
+except ImportError:  # NumPy input for publish_many() is optional
+    np = None
+
+
+class _Batch(list):
+    # Several records travelling through the queue as one item (publish_many)
+    pass
+
+
+class _PackedBatch:
+    # Fixed width records packed back to back (typed "bin" schema)
+    __slots__ = ("data", "record_size")
+
+    def __init__(self, data, record_size):
+        self.data = data
+        self.record_size = record_size
+
+    def __len__(self):
+        return len(self.data) // self.record_size
+
+
+class _Marked:
+    # Queue item carrying extras for the worker: `lost` records were dropped
+    # just before it (gap marker), `t` is its publish time (latency sample)
+    __slots__ = ("item", "lost", "t")
+
+    def __init__(self, item, lost=0, t=0.0):
+        self.item = item
+        self.lost = lost
+        self.t = t
+
+
+def _record_count(item):
+    kind = type(item)
+    if kind is _Batch or kind is _PackedBatch:
+        return len(item)
+    if kind is _Marked:
+        return _record_count(item.item)
+    return 1
+
+
+def _batch_rest(batch, taken):
+    # Records of a batch that were not taken by the worker yet
+    if type(batch) is _PackedBatch:
+        return _PackedBatch(batch.data[taken * batch.record_size:], batch.record_size)
+    return _Batch(batch[taken:])
+
+
+def _thin_batch(batch, every):
+    # First 1/every of a batch's records; what sampling keeps of it
+    keep = -(-len(batch) // every)
+    if type(batch) is _PackedBatch:
+        return _PackedBatch(batch.data[:keep * batch.record_size], batch.record_size)
+    return _Batch(batch[:keep])
+
+
+def _csv_line(record):
+    return (",".join(map(str, record)) + "\n").encode("utf-8")
+
 
 class Logger:
     def __init__(self):
@@ -13,15 +91,70 @@ class Logger:
             self._running = False
             self.file_type = None
             self.schema = None
+            self.field_types = None
             self._enabled = True
 
             self.q = queue.Queue(maxsize=settings.QUEUE_SIZE)
+            self._ring = None
+            self._channels = {}
+            self._header_specs = ()
             self.headers_blob = None
+            self._bin_struct = None
+            self._np_dtype = None
+            self._pack_local = threading.local()
             self.dropped_count = 0
             self.file_no = 0
 
+            # Overflow policy and exact loss counters (see overflow.py)
+            self.overflow = OverflowStats(
+                settings.OVERFLOW_POLICY, settings.OVERFLOW_WINDOW_S, settings.OVERFLOW_WINDOWS
+            )
+            self._policy = settings.OVERFLOW_POLICY
+            self._overloaded = False    # sample policy: thinning until the queue drains
+            self._sample_n = 0
+            self._gap_lost = 0          # queue: lost records the next item carries as a gap
+            self._ring_gaps = deque()   # ring: [slot sequence, lost] in slot order
+            self._disk_mode = DISK_NORMAL    # storage.DISK_*, set by the disk monitor
+            self._disk_n = 0
+
+            # Pipeline metrics; one in N publishes is timestamped for latency
+            self.metrics = LoggerMetrics()
+            self._sample_every = settings.METRICS_LATENCY_SAMPLE_EVERY
+            self._publish_n = 0
+            self._ring_stamps = deque()  # ring: (slot sequence, publish time)
+            self._metrics_stop = threading.Event()
+            self._exporter = None
+            self._exported = None       # the exporter's previous snapshot, its rate interval
+
+            # Durability: one fsync covers every batch written since the last one
+            self._durability = settings.DURABILITY_POLICY
+            if self._durability not in DURABILITY_POLICIES:
+                raise ValueError(
+                    f"Unknown durability policy {self._durability!r}, use one of {', '.join(DURABILITY_POLICIES)}"
+                )
+            self._sync_interval = settings.DURABILITY_INTERVAL_MS / 1000
+            self._sync_bytes = settings.DURABILITY_BYTES_KB * 1024
+            self._synced_bytes = 0      # metrics.bytes_written at the last sync
+            self._synced_at = 0.0
+
+            # Named streams: child Loggers written by a shared scheduler
+            self.stream_name = None
+            self._hub = None
+            self._streams = {}
+            self._scheduler = None
+            self._streams_started = False
+
             self._worker = None
             self._compressor = None
+            self._fh = None
+            self._direct = False
+            self._index = None
+            self._columns = None        # col.bin: rows waiting for their block
+            self._tlv2 = None           # tlv.bin v2 encoder
+            self._chained = False       # v2 delta field: records are encoded on the worker
+            self._chain_ts = None       # field index whose value the block index is given
+            self._framing = 0           # frame head bytes before every written batch (see binary_format)
+            self._rotate_at = None      # monotonic deadline of interval rotation
 
             # self._compress_event = threading.Event()
 
@@ -29,49 +162,196 @@ class Logger:
             print(f"Exception in init: {e}")
 
     # =========================== INITILIZER ========================
-    def initialize(self, file_type: str, compress: bool):
+    def initialize(self, file_type: str, compress: bool, stream: str = None, shared: FileManager = None):
         try:
-            if not SystemStorage().checking():
-                self._enabled = False
-                self._running = False
-                self.file_manager = None
-                return   
-
             self.file_type = file_type or settings.DEFAULT_FILE_TYPE
             do_compress = compress if compress is not None else settings.DEFAULT_COMPRESS
 
-            self.file_manager = FileManager(file_type=self.file_type, compress=do_compress)
+            self.file_manager = FileManager(
+                file_type=self.file_type, compress=do_compress, stream=stream, shared=shared
+            )
+            self.file_manager.metrics = self.metrics
+            self.metrics.file_type = self.file_type
+
+            # The disk monitor degrades publishing instead of refusing to start
+            self.file_manager.on_disk_mode = self._disk_changed
+            self._disk_mode = self.file_manager.disk.mode
+            if self._disk_mode >= DISK_SAMPLE:
+                disk = self.file_manager.disk
+                print(f"[Logger] Disk {disk.used_percent:.1f}% used on {disk.path}, starting in {DISK_MODES[self._disk_mode]} mode")
 
         except Exception as e:
             print(f"Exception in initilizer: {e}")
             self._enabled = False
 
+    # =========================== STREAMS ========================
+    def stream(self, name, file_type=None, headers=(), compress=None):
+        # A named stream with its own files, schema and rotation, written by
+        # the scheduler threads shared by all streams of this Logger. The
+        # streams share the log directory's compression pool and retention.
+        try:
+            if self._hub is not None:
+                raise ValueError("Streams cannot have streams of their own")
+            if not isinstance(name, str) or not STREAM_NAME.fullmatch(name):
+                raise ValueError(f"Invalid stream name {name!r}, use letters, digits, _ and -")
+            if name in self._streams:
+                raise ValueError(f"Stream {name!r} already exists")
+
+            if self._scheduler is None:
+                self._scheduler = StreamScheduler(settings.STREAM_WORKERS)
+
+            # First file manager in the directory owns the shared budget
+            shared = self.file_manager
+            if shared is None and self._streams:
+                shared = next(iter(self._streams.values())).file_manager
+
+            if compress is None and self.file_manager is not None:
+                compress = self.file_manager.compress
+
+            child = Logger()
+            child.stream_name = name
+            child._hub = self
+            child.initialize(file_type, compress, stream=name, shared=shared)
+            if child.file_manager is None:
+                return None
+            if headers:
+                child.headers(*headers)
+
+            self._streams[name] = child
+            if self._streams_started:
+                child.start()
+            return child
+
+        except Exception as e:
+            print(f"Exception in stream: {e}")
+            return None
+
+    def streams(self):
+        return dict(self._streams)
+
     # =========================== START ========================
     def start(self):
         try:
-            if not self._enabled or self.file_manager is None:
-                return   
+            if not self._enabled:
+                return
 
-            self._running = True
+            # Named streams first, their writers are the scheduler threads
+            self._streams_started = True
+            for child in tuple(self._streams.values()):
+                child.start()
 
-            match self.file_type:
-                case "csv":
-                    self._worker = threading.Thread(target=self.csv_worker, daemon=True)
-                case "bin":
-                    self._worker = threading.Thread(target=self.bin_worker, daemon=True)
-                case "tlv.bin":
-                    self._worker = threading.Thread(target=self.tlv_worker, daemon=True)
-                case "xlsx":
-                    self._worker = threading.Thread(target=self.xlsx_worker, daemon=True)
-                case _:
-                    return
+            if self.file_manager is not None:
+                self._start_worker()
 
-            self._worker.start()
+            if (settings.METRICS_JSON_PATH or settings.METRICS_PROMETHEUS_PATH) and self._hub is None:
+                self._exporter = threading.Thread(target=self._metrics_loop, daemon=True)
+                self._exporter.start()
 
         except Exception as e:
             print(f"Exception in start: {e}")
             self._enabled = False
 
+    def _start_worker(self):
+        self._running = True
+
+        if settings.TRANSPORT == "ring":
+            self._ring = self._create_ring()
+
+        # Deltas and dictionary references refer to the records written
+        # before, so they are only computed on the worker, after drops, in
+        # file order. The ring carries encoded records: plain values there.
+        self._chained = (
+            self._tlv2 is not None
+            and (self._tlv2.delta is not None or self._tlv2.dictionary > 0)
+            and self._ring is None
+        )
+
+        if self._ring is not None and self._policy == "drop_oldest":
+            # Only the worker may move the ring tail
+            print("[Logger] drop_oldest needs the queue transport, using drop_newest on the ring")
+            self._policy = "drop_newest"
+
+        match self.file_type:
+            case "csv" | "bin" | "tlv.bin" | "col.bin" if self._hub is not None:
+                self._hub._scheduler.add(self)
+                return
+            case _ if self._ring is not None:
+                self._worker = threading.Thread(target=self.ring_worker, daemon=True)
+            case "csv":
+                self._worker = threading.Thread(target=self.csv_worker, daemon=True)
+            case "bin":
+                self._worker = threading.Thread(target=self.bin_worker, daemon=True)
+            case "tlv.bin":
+                self._worker = threading.Thread(target=self.tlv_worker, daemon=True)
+            case "col.bin":
+                self._worker = threading.Thread(target=self.col_worker, daemon=True)
+            case "xlsx":
+                target = self.xlsx_worker
+                if self.file_manager.deferred:
+                    if self.schema:
+                        target = self.xlsx_segment_worker
+                    else:
+                        print("[Logger] Deferred xlsx needs headers(), rendering on the worker")
+                self._worker = threading.Thread(target=target, daemon=True)
+            case _:
+                return
+
+        self._worker.start()
+
+    def _create_ring(self):
+        if self.file_type not in ("bin", "tlv.bin"):
+            print(f"[Logger] Ring transport only supports bin/tlv.bin, using queue for {self.file_type}")
+            return None
+
+        # Typed bin: one record per slot, slots are written to the file as is
+        if self._bin_struct is not None:
+            return RingBuffer(settings.RING_SLOTS, self._bin_struct.size, fixed=True)
+
+        return RingBuffer(settings.RING_SLOTS, settings.RING_SLOT_SIZE, fixed=False)
+
+    # =========================== SHARED CHANNELS ========================
+    def shared_channel(self, slots=None):
+        # Shared memory ring another process can publish to with
+        # SharedLogger(name); drained by this Logger's worker into its files
+        try:
+            if self.file_type not in ("csv", "bin", "tlv.bin"):
+                raise ValueError(f"Shared channels do not support {self.file_type}")
+
+            if self._bin_struct is not None:
+                slot_size, fixed = self._bin_struct.size, True
+            else:
+                slot_size, fixed = settings.RING_SLOT_SIZE, False
+
+            channel = SharedChannel(
+                self.file_type, self._header_specs, self.headers_blob,
+                slots or settings.RING_SLOTS, slot_size, fixed,
+                self._tlv2.float32 if self._tlv2 is not None else "exact",
+            )
+            self._channels[channel.name] = channel
+            return channel.name
+
+        except Exception as e:
+            print(f"Exception in shared channel: {e}")
+            return None
+
+    def shared_stats(self):
+        # Per producer counters: published, dropped, pending
+        return {name: channel.stats() for name, channel in self._channels.items()}
+
+    def _drain_shared(self):
+        count = 0
+        for channel in tuple(self._channels.values()):
+            count += self._consume_ring(channel.ring)
+        return count
+
+    def _shared_pending(self):
+        return any(channel.ring.readable() for channel in tuple(self._channels.values()))
+
+    def _close_shared(self):
+        for channel in tuple(self._channels.values()):
+            channel.close()
+        self._channels.clear()
+
     # =========================== HEADER WRITER ========================
     def headers(self, *headers):
         try:
@@ -81,35 +361,79 @@ class Logger:
             if not headers:
                 return
 
-            self.schema = tuple(headers)
+            # Optional per-field types: headers("timestamp:u32", "volts0:f32", ...).
+            # Only the fixed layouts have types, other files keep the names as given.
+            self._header_specs = tuple(headers)
+            if self.file_type in ("bin", "col.bin"):
+                fields = [binary_format.parse_field(h) for h in headers]
+            else:
+                fields = [(h, None) for h in headers]
+            self.schema = tuple(name for name, _ in fields)
+            types = tuple(t for _, t in fields)
+
+            if all(types):
+                self.field_types = types
+            elif any(types):
+                raise ValueError("Declare a type for every field or for none")
+            else:
+                self.field_types = None
 
             match self.file_type:
                 case "csv":
                     self.headers_blob = (",".join(self.schema) + "\n").encode("utf-8")
 
                 case "bin":
-                    buf = bytearray()
-                    buf += b"LOG1"
-                    buf += (1).to_bytes(1, "little")
-                    buf += len(self.schema).to_bytes(1, "little")
-                    for name in self.schema:
-                        b = name.encode("utf-8")
-                        buf += len(b).to_bytes(1, "little")
-                        buf += b
-                    self.headers_blob = bytes(buf)
+                    flags = 0
+                    if self.field_types:
+                        gap_markers = settings.GAP_MARKERS
+                        if gap_markers:
+                            flags |= binary_format.LOG1_FLAG_GAP_MARKERS
+
+                        # One precompiled struct for the whole fixed width record
+                        self._bin_struct = binary_format.compile_struct(self.field_types, gap_markers)
+                        if np is not None:
+                            self._np_dtype = np.dtype(
+                                binary_format.numpy_descr(self.schema, self.field_types, gap_markers)
+                            )
+                        if settings.FRAMING_ENABLED:
+                            flags |= binary_format.LOG1_FLAG_FRAMED
+                    elif settings.GAP_MARKERS:
+                        print("[Logger] Gap markers need a typed bin schema, none will be written")
+                    if settings.FRAMING_ENABLED and not self.field_types:
+                        print("[Logger] Framing needs a typed bin schema, records will not be framed")
+
+                    self.headers_blob = binary_format.build_log1_header(
+                        self.schema, self.field_types, flags
+                    )
 
                 case "tlv.bin":
-                    buf = bytearray()
-                    buf += b"TLV1"
-                    buf += (1).to_bytes(1, "little")
-                    buf += len(self.schema).to_bytes(1, "little")
-                    FIELD_DEF = 0x01
-                    for name in self.schema:
-                        b = name.encode("utf-8")
-                        buf += FIELD_DEF.to_bytes(1, "little")
-                        buf += len(b).to_bytes(2, "little")
-                        buf += b
-                    self.headers_blob = bytes(buf)
+                    if settings.TLV_VERSION == binary_format.TLV2_VERSION:
+                        delta = settings.TLV_DELTA_FIELD
+                        if delta is not None and delta not in self.schema:
+                            raise ValueError(f"TLV delta field {delta!r} is not in the schema")
+                        delta = self.schema.index(delta) if delta is not None else None
+                        self._tlv2 = binary_format.Tlv2Encoder(
+                            len(self.schema), settings.TLV_FLOAT32, delta, settings.TLV_DICTIONARY_SIZE
+                        )
+                        self.headers_blob = binary_format.build_tlv1_header(
+                            self.schema, binary_format.TLV2_VERSION, delta, self._tlv2.dictionary > 0,
+                            settings.FRAMING_ENABLED,
+                        )
+                    else:
+                        self._tlv2 = None
+                        self.headers_blob = binary_format.build_tlv1_header(self.schema)
+                        if settings.FRAMING_ENABLED:
+                            print("[Logger] Framing needs tlv.version 2, records will not be framed")
+
+                case "col.bin":
+                    if not self.field_types:
+                        raise ValueError("col.bin needs a type for every field (name:type)")
+                    self.headers_blob = binary_format.build_col1_header(self.schema, self.field_types)
+                    # Full blocks go through the write buffer like any record
+                    self._columns = ColumnBlocks(
+                        self.field_types, self._buffer_block, settings.COLUMNAR_BLOCK_ROWS,
+                        settings.COLUMNAR_CODEC, settings.COLUMNAR_LEVEL,
+                    )
 
                 case "xlsx":
                     self.headers_blob = self.schema
@@ -117,6 +441,10 @@ class Logger:
                 case _:
                     raise ValueError(f"Unsupported file type: {self.file_type}")
 
+            if self.file_type in ("bin", "tlv.bin"):
+                framed = binary_format.parse_header(self.headers_blob)["framed"]
+                self._framing = binary_format.FRAME_HEAD.size if framed else 0
+
         except Exception as e:
             print(f"Exception in header: {e}")
 
@@ -126,6 +454,21 @@ class Logger:
         if not self._running or not self._enabled:
             return
 
+        # Sample policy while overloaded: only every Nth record goes on
+        if self._overloaded and not self._keep_sample():
+            return
+
+        # Disk filling up: only every Nth record, then none
+        if self._disk_mode >= DISK_SAMPLE and not self._keep_disk():
+            return
+
+        # Latency / encode sample
+        t0 = 0.0
+        if self._sample_every:
+            self._publish_n += 1
+            if self._publish_n % self._sample_every == 0:
+                t0 = time.perf_counter()
+
         try:
             if values is None:
                 raise ValueError("Values cannot be None")
@@ -133,6 +476,26 @@ class Logger:
             record = None
             encode = encode or settings.ENCODER
 
+            # ---- RING + TYPED BIN: pack straight into the slot ----
+            ring = self._ring
+            if ring is not None and ring.fixed and encode \
+                    and not isinstance(values, (bytes, bytearray)):
+                if isinstance(values, dict):
+                    values = [values.get(k) for k in self.schema]
+
+                offset = ring.claim()
+                if offset < 0:
+                    self._overflow(self._bin_struct.pack(*values))
+                    return
+
+                self._bin_struct.pack_into(ring.data, offset, *values)
+                ring.commit()
+
+                if t0:
+                    self.metrics.encode.observe(time.perf_counter() - t0)
+                    self._ring_stamps.append((ring.head() - 1, t0))
+                return
+
             # =======================
             # 1. NORMALIZE INPUT
             # =======================
@@ -176,42 +539,457 @@ class Logger:
 
                     if self.file_type == "bin":
                         record = self._encode_record_bin(processed_values)
+                    elif self._chained:
+                        record = processed_values   # encoded by the worker
                     else:
                         record = self._encode_record_tlvbin(processed_values)
 
-            elif self.file_type in ("csv", "xlsx"):
+            elif self.file_type in ("csv", "xlsx", "col.bin"):
                 if processed_values is None:
                     raise TypeError(
-                        "CSV/XLSX do not accept raw binary input"
+                        "CSV/XLSX/col.bin do not accept raw binary input"
                     )
                 record = processed_values
 
             else:
                 raise ValueError(f"Unsupported file type: {self.file_type}")
 
+            if t0 and encode and self.file_type in ("bin", "tlv.bin"):
+                self.metrics.encode.observe(time.perf_counter() - t0)
+
             # =======================
             # 3. QUEUE
             # =======================
-            try:
-                self.q.put_nowait(values)
-            except queue.Full:
-                self.dropped_count += 1
+            if ring is None:
+                if t0:
+                    record = _Marked(record, t=t0)
+                if not self._gap_lost:
+                    try:
+                        self.q.put_nowait(record)
+                        return
+                    except queue.Full:
+                        pass
+                elif self._offer(record):
+                    return
+
+            elif self._offer(record):
+                if t0:
+                    self._ring_stamps.append((ring.head() - 1, t0))
+                return
+
+            self._overflow(record)
 
         except Exception as e:
             self._enabled = False
             print(f"Exception in publish: {e}")
 
+    # =========================== BATCH PUBLISHER ========================
+    def publish_many(self, records=None, encode=None):
+
+        if not self._running or not self._enabled:
+            return
+
+        try:
+            t0 = time.perf_counter()
+            batch = self._build_batch(records, encode)
+            if not batch:
+                return
+
+            if encode and self.file_type in ("bin", "tlv.bin"):
+                self.metrics.encode.observe((time.perf_counter() - t0) / len(batch), len(batch))
+
+            if self._disk_mode >= DISK_SAMPLE:
+                self._disk_batch(batch)
+            elif self._overloaded:
+                self._sample_batch(batch)
+            else:
+                self._enqueue_batch(batch, t0 if self._sample_every else 0.0)
+
+        except Exception as e:
+            self._enabled = False
+            print(f"Exception in publish_many: {e}")
+
+    def _build_batch(self, records, encode=None):
+        # One queue item (_Batch or _PackedBatch) for a whole batch of records
+        if records is None:
+            raise ValueError("Records cannot be None")
+
+        encode = encode or settings.ENCODER
+
+        # ---- TYPED BIN FROM NUMPY: pack the whole array at once ----
+        if (self._bin_struct is not None and encode
+                and np is not None and isinstance(records, np.ndarray)):
+            return self._pack_numpy_bin(records)
+
+        rows = self._normalize_batch(records)
+
+        if not rows:
+            return None
+
+        raw = isinstance(rows[0], (bytes, bytearray))
+
+        if self.file_type in ("bin", "tlv.bin"):
+
+            # ---- RAW BINARY PATH ----
+            if not encode:
+                if not raw:
+                    raise TypeError(
+                        "encode=False requires raw bytes input or make it encode = True"
+                    )
+                return _Batch(rows)
+
+            # ---- STRUCTURED → BINARY ----
+            if raw:
+                raise TypeError(
+                    "encode=True requires structured input (list/dict) or make it encode = False"
+                )
+
+            if self._bin_struct is not None:
+                return self._encode_batch_bin(rows)
+            if self._chained:
+                return _Batch(rows)
+            if self.file_type == "bin":
+                return _Batch(map(self._encode_record_bin, rows))
+            return _Batch(map(self._encode_record_tlvbin, rows))
+
+        if self.file_type in ("csv", "xlsx", "col.bin"):
+            if raw:
+                raise TypeError(
+                    "CSV/XLSX/col.bin do not accept raw binary input"
+                )
+            return _Batch(rows)
+
+        raise ValueError(f"Unsupported file type: {self.file_type}")
+
+    def _enqueue_batch(self, batch, t0=0.0):
+        # Whole batch is one queue item, drops are still counted per row
+        ring = self._ring
+        item = _Marked(batch, t=t0) if t0 and ring is None else batch
+
+        taken = self._offer(item)
+        if taken < len(batch):
+            self._overflow(_batch_rest(batch, taken) if taken else item)
+        elif t0 and ring is not None:
+            self._ring_stamps.append((ring.head() - 1, t0))
+
+    def _offer(self, item):
+        # Hand a record or batch to the worker without blocking. Returns how
+        # many records from the front of it were taken; the rest did not fit.
+        ring = self._ring
+        if ring is not None:
+            kind = type(item)
+            if kind is _PackedBatch:
+                return ring.put_packed(item.data)
+
+            batch = item if kind is _Batch else (item,)
+            taken = 0
+            for record in batch:
+                if not ring.fits(len(record)):
+                    self._lose("oversized", 1)     # never fits a slot, drop it
+                elif not ring.put(record):
+                    break
+                taken += 1
+            return taken
+
+        lost = 0
+        if self._gap_lost:
+            with self.overflow.lock:
+                lost, self._gap_lost = self._gap_lost, 0
+
+        marked = item
+        if lost:
+            if type(item) is _Marked:
+                item.lost = lost
+            else:
+                marked = _Marked(item, lost=lost)
+
+        try:
+            self.q.put_nowait(marked)
+        except queue.Full:
+            if lost:
+                if marked is item:
+                    item.lost = 0
+                with self.overflow.lock:
+                    self._gap_lost += lost
+            return 0
+        return _record_count(item)
+
+    # =========================== OVERFLOW ========================
+    def _overflow(self, item):
+        # Queue or ring is full: apply the overflow policy to item
+        policy = self._policy
+
+        if policy == "block":
+            item = self._block(item)
+            if item is not None:
+                self._lose("block_timeouts", _record_count(item))
+            return
+
+        if policy == "drop_oldest" and self._ring is None:
+            self._drop_oldest(item)
+            return
+
+        if policy == "sample":
+            self._overloaded = True
+
+        self._lose("dropped_newest", _record_count(item))
+
+    def _lose(self, counter, n, gap=True):
+        with self.overflow.lock:
+            self.overflow.count(counter, n)
+            self.dropped_count += n
+
+            if not gap or not settings.GAP_MARKERS:
+                return
+
+            # Where the gap goes: before the next item or ring slot
+            ring = self._ring
+            if ring is None:
+                self._gap_lost += n
+                return
+
+            head = ring.head()
+            gaps = self._ring_gaps
+            if gaps and gaps[-1][0] == head:
+                gaps[-1][1] += n
+            else:
+                gaps.append([head, n])
+
+    def _block(self, item):
+        # Wait up to block_timeout_ms for space. Returns what was not taken.
+        start = time.perf_counter()
+        deadline = start + settings.OVERFLOW_BLOCK_TIMEOUT_MS / 1000
+
+        try:
+            while time.perf_counter() < deadline:
+                time.sleep(0.0005)
+                taken = self._offer(item)
+                if taken == _record_count(item):
+                    return None
+                if taken:
+                    item = _batch_rest(item, taken)
+            return item
+        finally:
+            self.overflow.add_blocked(time.perf_counter() - start)
+
+    def _drop_oldest(self, item):
+        # Make room by discarding the oldest queued item; the gap it leaves is
+        # in front of whatever is now at the head of the queue
+        q = self.q
+        with q.mutex:
+            lost = gap = 0
+            if q.queue:
+                old = q.queue.popleft()
+                lost = _record_count(old)
+                gap = lost + (old.lost if type(old) is _Marked else 0)
+            else:
+                q.unfinished_tasks += 1
+
+            q.queue.append(item)
+
+            if gap and settings.GAP_MARKERS:
+                head = q.queue[0]
+                if type(head) is _Marked:
+                    head.lost += gap
+                else:
+                    q.queue[0] = _Marked(head, lost=gap)
+
+            q.not_empty.notify()
+
+        if lost:
+            self._lose("dropped_oldest", lost, gap=False)
+
+    def _depth(self):
+        # (queued, capacity) in queue items or ring slots
+        ring = self._ring
+        if ring is not None:
+            return ring.readable(), ring.slots
+        return self.q.qsize(), self.q.maxsize
+
+    def _still_overloaded(self):
+        # Sampling ends once the queue/ring is back to half full
+        depth, capacity = self._depth()
+        if depth <= capacity // 2:
+            self._overloaded = False
+        return self._overloaded
+
+    def _keep_sample(self):
+        if not self._still_overloaded():
+            return True
+
+        self._sample_n += 1
+        if self._sample_n % settings.OVERFLOW_SAMPLE_EVERY == 0:
+            return True
+
+        self._lose("sampled_out", 1)
+        return False
+
+    def _sample_batch(self, batch):
+        # While overloaded a batch keeps its first 1/N records, so the gap it
+        # leaves is one contiguous run right after them
+        if not self._still_overloaded():
+            self._enqueue_batch(batch)
+            return
+
+        kept = _thin_batch(batch, settings.OVERFLOW_SAMPLE_EVERY)
+        self._enqueue_batch(kept)
+        self._lose("sampled_out", len(batch) - len(kept))
+
+    def overflow_stats(self):
+        return self.overflow.snapshot()
+
+    # =========================== DISK SPACE ========================
+    def _disk_changed(self, old, new):
+        # Called on the disk monitor thread; publish reads the mode without a lock
+        self._disk_mode = new
+
+    def _keep_disk(self):
+        if self._disk_mode >= DISK_STOP:
+            self._lose("disk_full", 1)
+            return False
+
+        self._disk_n += 1
+        if self._disk_n % settings.STORAGE_SAMPLE_EVERY == 0:
+            return True
+
+        self._lose("disk_sampled", 1)
+        return False
+
+    def _disk_batch(self, batch):
+        if self._disk_mode >= DISK_STOP:
+            self._lose("disk_full", len(batch))
+            return
+
+        kept = _thin_batch(batch, settings.STORAGE_SAMPLE_EVERY)
+        if self._overloaded:
+            self._sample_batch(kept)
+        else:
+            self._enqueue_batch(kept)
+        self._lose("disk_sampled", len(batch) - len(kept))
+
+    # =========================== METRICS ========================
+    def metrics_snapshot(self, since=None):
+        # since: an earlier snapshot of this Logger, records/s and bytes/s are
+        # then over the time between the two (see LoggerMetrics.snapshot)
+        snap = self.metrics.snapshot(since)
+        depth, capacity = self._depth()
+        snap.update(
+            transport="ring" if self._ring is not None else "queue",
+            queue_depth=depth,
+            queue_capacity=capacity,
+            dropped_count=self.dropped_count,
+            overflow=self.overflow.snapshot(),
+            compression_jobs=self.file_manager.compression_status() if self.file_manager else None,
+            disk=self.file_manager.disk.snapshot() if self.file_manager else None,
+            shared=self.shared_stats(),
+        )
+        if self._streams:
+            before = (since or {}).get("streams") or {}
+            snap["streams"] = {name: child.metrics_snapshot(before.get(name)) for name, child in self._streams.items()}
+        return snap
+
+    def export_metrics(self):
+        try:
+            snap = self.metrics_snapshot(self._exported)
+            self._exported = snap
+            if settings.METRICS_JSON_PATH:
+                metrics_export.write_json(settings.METRICS_JSON_PATH, snap)
+            if settings.METRICS_PROMETHEUS_PATH:
+                metrics_export.write_prometheus(settings.METRICS_PROMETHEUS_PATH, snap)
+        except Exception as e:
+            print(f"Exception in metrics export: {e}")
+
+    def _metrics_loop(self):
+        while not self._metrics_stop.wait(settings.METRICS_INTERVAL_S):
+            self.export_metrics()
+
+    def _worker_done(self):
+        self._report_overflow()
+        self._metrics_stop.set()
+        if self._exporter is not None:
+            self.export_metrics()   # final numbers after the last write
+
+    def _normalize_batch(self, records):
+        width = len(self.schema) if self.schema else None
+
+        # ---- NUMPY ----
+        if np is not None and isinstance(records, np.ndarray):
+            if records.dtype.names:
+                if self.schema:
+                    missing = [k for k in self.schema if k not in records.dtype.names]
+                    if missing:
+                        raise ValueError(f"Structured array is missing fields: {missing}")
+                    records = records[list(self.schema)]
+                return records.tolist()
+
+            if records.ndim != 2:
+                raise ValueError(f"Expected a 2-D array, got {records.ndim}-D")
+
+            if width is not None and records.shape[1] != width:
+                raise ValueError(
+                    f"Array has {records.shape[1]} columns, schema has {width}"
+                )
+            return records.tolist()
+
+        # ---- SEQUENCE OF ROWS ----
+        if not isinstance(records, (list, tuple)):
+            raise TypeError(f"Unsupported batch type: {type(records)}")
+
+        if not records:
+            return []
+
+        first = records[0]
+
+        if isinstance(first, dict):
+            if not self.schema:
+                raise RuntimeError(
+                    "Schema not set. Call headers() before using dict input."
+                )
+            keys = self.schema
+            return [[row.get(k) for k in keys] for row in records]
+
+        if isinstance(first, (bytes, bytearray)):
+            return list(records)
+
+        if isinstance(first, (list, tuple)):
+            if width is not None and any(len(row) != width for row in records):
+                raise ValueError("Record does not match schema length")
+            return list(records)
+
+        raise TypeError(f"Unsupported input type: {type(first)}")
+
     # =========================== STOP ========================
     def stop(self):
         try:
             self._enabled = False
             self._running = False
+
+            for child in tuple(self._streams.values()):
+                child.stop()
+            if self._scheduler is not None:
+                self._scheduler.close()
         except Exception as e:
             print(f"Exception in stop: {e}")
 
+    def join(self, timeout=None):
+        # Wait after stop() until this Logger and its streams are written out
+        if self._worker is not None:
+            self._worker.join(timeout)
+        for child in tuple(self._streams.values()):
+            child.join(timeout)
+        if self._scheduler is not None:
+            self._scheduler.join(timeout)
+
+        if self._worker is None and self._exporter is not None:
+            self._metrics_stop.set()
+            self.export_metrics()   # final numbers of the streams
+
     # =========================== ENCODERS ========================
     def _encode_record_bin(self, values):
         try:
+            if self._bin_struct is not None:
+                return self._bin_struct.pack(*values)
+
             payload = bytearray()
 
             for value in values:
@@ -239,6 +1017,48 @@ class Logger:
         except Exception as e:
             print(f"Exception in binary encoder: {e}")
 
+    def _encode_batch_bin(self, rows):
+        # pack_into a per-thread reusable buffer, one copy out for the queue
+        st = self._bin_struct
+        size = st.size
+        total = size * len(rows)
+
+        buf = getattr(self._pack_local, "buf", None)
+        if buf is None or len(buf) < total:
+            buf = self._pack_local.buf = bytearray(total)
+
+        pack_into = st.pack_into
+        offset = 0
+        for row in rows:
+            pack_into(buf, offset, *row)
+            offset += size
+
+        with memoryview(buf) as view:
+            return _PackedBatch(bytes(view[:total]), size)
+
+    def _pack_numpy_bin(self, records):
+        dtype = self._np_dtype
+        names = records.dtype.names
+
+        if names:
+            missing = [k for k in self.schema if k not in names]
+            if missing:
+                raise ValueError(f"Structured array is missing fields: {missing}")
+            packed = np.zeros(len(records), dtype=dtype)
+            for name in self.schema:
+                packed[name] = records[name]
+
+        else:
+            if records.ndim != 2 or records.shape[1] != len(self.schema):
+                raise ValueError(
+                    f"Expected a 2-D array with {len(self.schema)} columns, got shape {records.shape}"
+                )
+            packed = np.zeros(records.shape[0], dtype=dtype)
+            for i, name in enumerate(self.schema):
+                packed[name] = records[:, i]
+
+        return _PackedBatch(packed.tobytes(), dtype.itemsize)
+
     def _encode_record_tlvbin(self, values):
         try:
             if not self.schema:
@@ -246,7 +1066,10 @@ class Logger:
 
             if len(values) != len(self.schema):
                 raise ValueError("Record does not match schema length")
-            
+
+            if self._tlv2 is not None:
+                return self._tlv2.encode(values)
+
             TYPE_BOOL   = 1
             TYPE_INT    = 2
             TYPE_FLOAT  = 3
@@ -306,175 +1129,586 @@ class Logger:
 
 
         
-    # =========================== BIN WORKER ========================
-    def bin_worker(self):
-        try:
-            max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-            current_size = 0
-            # start = time.time()
-            # sec_count = 0
-
-            # open first file
-            f = open(self.file_manager.current_file, "ab")
-
-            # WRITE HEADER 
-            f.write(self.headers_blob)
-            f.flush()
-
-            current_size = len(self.headers_blob)
+    # =========================== DRAIN ========================
+    def _drain(self, timeout=0.1):
+        # Block for the first item, then take everything already queued
+        # (up to BATCH_SIZE records) under a single acquisition of the queue lock.
+        # timeout=0 neither waits nor lingers (streams on the shared scheduler).
+        q = self.q
 
+        try:
+            items = [q.get(timeout=timeout) if timeout else q.get_nowait()]
+        except queue.Empty:
+            return None
+
+        limit = settings.BATCH_SIZE
+        count = _record_count(items[0])
+        deadline = None
+
+        if settings.MAX_LINGER_MS and timeout:
+            deadline = time.perf_counter() + settings.MAX_LINGER_MS / 1000
+
+        while count < limit:
+            with q.mutex:
+                taken = 0
+                pending = q.queue
+                self.metrics.observe_depth(len(pending) + len(items))
+                while pending and count < limit:
+                    item = pending.popleft()
+                    items.append(item)
+                    count += _record_count(item)
+                    taken += 1
+                if taken:
+                    q.not_full.notify(taken)
+
+            if count >= limit or deadline is None:
+                break
+
+            # Linger for more records to trade latency for bigger writes
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
             try:
-                while self._running or not self.q.empty():
-                    # end = time.time()
-                    try:
-                        record = self.q.get(timeout=0.1)
-                    except queue.Empty:
-                        continue
-
-                    size = len(record)
-
-                    if current_size + size >= max_bytes:
-                        f.close()
-
-                        self.file_manager.current_file = self.file_manager._new_log_file()
-                        f = open(self.file_manager.current_file, "ab")
-                        current_size = 0
-                        self.file_no += 1
-
-                        if self.headers_blob:
-                            f.write(self.headers_blob)
-                            f.flush()
-                            current_size += len(self.headers_blob)
+                item = q.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            count += _record_count(item)
+
+        return items
+
+    # =========================== FILE HANDLING ========================
+    def _open_current(self):
+        if self.file_type == "col.bin" and self._columns is None:
+            raise ValueError("col.bin needs typed headers() before start()")
+        self._max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
+        self._max_records = settings.ROTATION_RECORDS or math.inf
+        self._rotate_every = settings.ROTATION_INTERVAL_S or None
+        self._prepare_next = settings.ROTATION_PREPARE_NEXT
+        self._header_size = len(self.headers_blob or b"")
+        self._file_records = 0
+
+        # mmap writer: the mapping itself is the write buffer
+        self._direct = self.file_manager.mmap
+        self._wbuf = None if self._direct else bytearray(settings.BATCH_BYTES)
+        self._wpos = 0
+
+        # Framed files may continue the file a crash interrupted; dictionary
+        # references cannot point at entries of the previous run
+        resumed = None
+        if self._framing and settings.FRAMING_RESUME and not (self._tlv2 is not None and self._tlv2.dictionary):
+            resumed = self.file_manager.resume(self.headers_blob)
+
+        self._fh = self.file_manager.open_current()
+        self._current_size = 0
+
+        if resumed is not None:
+            self._current_size = resumed    # logical bytes: header + frame payloads
+        elif self.headers_blob:
+            self._fh.write(self.headers_blob)
+            self._fh.flush()
+            self._current_size += len(self.headers_blob)
+            self.metrics.bytes_written += len(self.headers_blob)
+
+        self._reset_window()
+        self._index = self._make_index()
+        if resumed is not None and self._index is not None:
+            self._index.partial = True
+        if self._tlv2 is not None:
+            self._tlv2.reset()
+
+        self._rotate_at = time.monotonic() + self._rotate_every if self._rotate_every else None
+        if self._prepare_next:
+            self.file_manager.prepare_next(self.headers_blob)
+
+    def _make_index(self):
+        # Block index sidecar for typed bin and tlv.bin files; offsets would
+        # be meaningless in a file compressed while it is written
+        if not settings.INDEX_ENABLED or self.file_manager.streaming:
+            return None
+        if self.file_type == "tlv.bin" or (self.file_type == "bin" and self._bin_struct is not None):
+            header = binary_format.parse_header(self.headers_blob)
+            # A delta or dictionary coded timestamp is handed over by the
+            # worker, it cannot be read back from a single record
+            field = settings.INDEX_TIMESTAMP_FIELD
+            at = header["schema"].index(field) if field else 0
+            self._chain_ts = at if self._chained and (at == header["delta"] or header["dictionary"]) else None
+            return BlockIndex(
+                settings.INDEX_BLOCK_KB * 1024,
+                timestamp_reader(header, field),
+            )
+        return None
+
+    def _rotate(self):
+        start = time.perf_counter()
+        if self._durability != "none":
+            self._sync()
+        if self._index is not None:
+            self._index.finish(self.file_manager.current_file)
+
+        # Normally the next file is open and headered already (prepare_next),
+        # take_next() also closes the finished one
+        self._fh, headered = self.file_manager.take_next()
+        self._current_size = 0
+        self._file_records = 0
+        self.file_no += 1
+        if self._tlv2 is not None:
+            self._tlv2.reset()  # every file starts its own delta chain and dictionaries
+
+        if self.headers_blob:
+            if not headered:
+                self._fh.write(self.headers_blob)
+                self._fh.flush()
+            self._current_size += len(self.headers_blob)
+            self.metrics.bytes_written += len(self.headers_blob)
+        self._reset_window()
+        if self._prepare_next:
+            self.file_manager.prepare_next(self.headers_blob)
+        if self._rotate_every:
+            self._rotate_at = time.monotonic() + self._rotate_every
+
+        self._compress_rotated()
+
+        self.metrics.files_rotated += 1
+        self.metrics.rotation.observe(time.perf_counter() - start)
+
+    def _roll(self):
+        # Interval or record count rotation: what is buffered ends the file
+        if self._columns is not None:
+            self._columns.flush()
+        self._flush_wbuf()
+        self._rotate()
+
+    def _rotation_due(self):
+        # Interval rotation; a file without records starts its interval over
+        now = time.monotonic()
+        if now < self._rotate_at or self._fh is None:
+            return
+        if self._current_size + self._wpos > self._header_size or (self._columns is not None and self._columns.rows):
+            self._roll()
+        else:
+            self._rotate_at = now + self._rotate_every
+
+    def _compress_rotated(self):
+        # Normally once MAX_FILES files were written; after every rotation
+        # while the disk is filling up
+        if self.file_no >= settings.MAX_FILES:
+            self._compress_logs()
+            self.file_no -= 1
+        elif self._disk_mode >= DISK_COMPRESS:
+            self._compress_logs()
+
+    def _compress_logs(self):
+        start = time.perf_counter()
+        try:
+            self.file_manager.compress_logs()
+        finally:
+            self.metrics.compress_logs.observe(time.perf_counter() - start)
 
-                        if self.file_no >= settings.MAX_FILES:
-                            self.file_manager.compress_logs()
-                            self.file_no -= 1
+    def _close_current(self):
+        if self._fh is None:
+            return
+        try:
+            if self._columns is not None:
+                self._columns.flush()   # last, partial block
+            self._flush_wbuf()
+            if self._durability != "none":
+                self._sync()
+        finally:
+            self._fh.close()
+            self._fh = None
+            if self._index is not None:
+                self._index.finish(self.file_manager.current_file)
+
+    # =========================== WRITE BUFFER ========================
+    def _reset_window(self):
+        # Records are copied to _wbuf[_wbase + _wpos], at most _wlimit bytes
+        if self._direct:
+            # Framed: the frame head goes in the bytes kept free before _wbase
+            self._wbuf = self._fh.buffer
+            self._wbase = self._fh.tell() + self._framing
+            self._wlimit = self._fh.capacity - self._wbase
+        else:
+            self._wbase = 0
+            self._wlimit = len(self._wbuf)
+
+    def _flush_wbuf(self):
+        if self._index is not None:
+            self._index.settle()
+        if not self._wpos:
+            return
+        framing = self._framing
+        if self._direct:
+            if framing:
+                base = self._wbase
+                with memoryview(self._wbuf) as view, view[base:base + self._wpos] as payload:
+                    view[base - framing:base] = binary_format.frame_head(payload)
+            self._fh.commit(framing + self._wpos)     # already in the file, move its end
+        else:
+            with memoryview(self._wbuf) as view:
+                if framing:
+                    self._fh.write(binary_format.frame_head(view[:self._wpos]))
+                self._fh.write(view[:self._wpos])
+        # Offsets stay logical (frame heads left out) for the block index
+        self._current_size += self._wpos
+        self.metrics.bytes_written += framing + self._wpos
+        self._wpos = 0
+        if self._direct:
+            self._reset_window()
+
+    def _write_through(self, data):
+        self._flush_wbuf()
+        if self._framing:
+            self._fh.write(binary_format.frame_head(data))
+        self._fh.write(data)
+        self._current_size += len(data)
+        self.metrics.bytes_written += self._framing + len(data)
+        if self._direct:
+            self._reset_window()
+
+    def _buffer_bytes(self, data):
+        size = len(data)
+        end = self._wpos + size
+
+        if end > self._wlimit:
+            self._flush_wbuf()
+            if size > self._wlimit:
+                self._write_through(data)
+                return
+            end = size
+
+        base = self._wbase
+        self._wbuf[base + self._wpos:base + end] = data
+        self._wpos = end
+
+    def _buffer_record(self, data, ts=None):
+        # Rotation is decided per record so files end at the exact boundary
+        if self._current_size + self._wpos + len(data) >= self._max_bytes or self._file_records >= self._max_records:
+            self._flush_wbuf()
+            self._rotate()
+        self._file_records += 1
+
+        if self._index is not None:
+            self._index.record(self._current_size + self._wpos, data, ts)
+        self._buffer_bytes(data)
+
+    def _put_chained(self, values):
+        # tlv.bin v2 with a delta field or dictionaries: encoded here so every
+        # delta and reference points at records written before in the same file
+        tlv2 = self._tlv2
+        record = tlv2.encode(values, chain=True)
+        if self._current_size + self._wpos + len(record) >= self._max_bytes or self._file_records >= self._max_records:
+            self._flush_wbuf()
+            self._rotate()
+            record = tlv2.encode(values, chain=True)
+
+        at = self._chain_ts
+        if at is None:
+            self._buffer_record(record)
+            return
+        ts = values[at]
+        self._buffer_record(record, float(ts) if isinstance(ts, (int, float)) else NAN)
+
+    def _buffer_block(self, data):
+        # col.bin: one block of rows that _add_row counted
+        if self._current_size + self._wpos + len(data) >= self._max_bytes:
+            self._flush_wbuf()
+            self._rotate()
+        self._buffer_bytes(data)
+
+    def _add_row(self, row):
+        # col.bin with a record limit: the partial block ends the file
+        if self._file_records >= self._max_records:
+            self._roll()
+        self._file_records += 1
+        self._columns.add(row)
+
+    def _buffer_packed(self, batch, direct=False):
+        # Fixed width records: copy as many whole records as fit per file.
+        # direct=True writes the caller's memory as is (ring regions).
+        record_size = batch.record_size
+        offset = 0
+
+        with memoryview(batch.data) as data:
+            total = len(data)
+
+            while offset < total:
+                used = self._current_size + self._wpos
+                fit = min(int((self._max_bytes - used - 1) // record_size), self._max_records - self._file_records)
+
+                if fit <= 0:
+                    self._flush_wbuf()
+                    self._rotate()
+                    fit = max(min(int((self._max_bytes - self._current_size - 1) // record_size), self._max_records), 1)
+
+                take = min(total - offset, fit * record_size)
+                self._file_records += take // record_size
+                if self._index is not None:
+                    self._index.packed(self._current_size + self._wpos, data[offset:offset + take], record_size)
+                if direct:
+                    self._write_through(data[offset:offset + take])
+                else:
+                    self._buffer_bytes(data[offset:offset + take])
+                offset += take
+
+    # =========================== GAP MARKERS ========================
+    def _gap_record(self, lost):
+        match self.file_type:
+            case "csv":
+                return f"#gap,{lost}\n".encode("utf-8")
+            case "bin" if self._bin_struct is not None:
+                return binary_format.log1_gap_record(self._bin_struct.size, lost)
+            case "tlv.bin" if self._tlv2 is not None:
+                return binary_format.tlv2_gap_record(lost)
+            case "tlv.bin":
+                return binary_format.tlv1_gap_record(lost)
+        return None     # untyped bin records are not self delimiting
+
+    def _write_gap(self, lost):
+        if self._columns is not None:
+            self._columns.gap(lost)
+            self.overflow.add("gaps")
+            return
+        record = self._gap_record(lost)
+        if record is not None:
+            self._buffer_record(record)
+            self.overflow.add("gaps")
+
+    def _write_trailing_gap(self):
+        # Records lost after the last one that made it into the queue
+        with self.overflow.lock:
+            lost, self._gap_lost = self._gap_lost, 0
+        if lost:
+            self._write_gap(lost)
+            self._flush_wbuf()
+
+    def _report_overflow(self):
+        if self.dropped_count:
+            totals = {k: v for k, v in self.overflow.totals.items() if v}
+            print(f"[Logger] {self.dropped_count} records lost ({self._policy}): {totals}")
+
+    def _write_items(self, items, to_bytes=None):
+        metrics = self.metrics
+        stamps = []
+        records = 0
+        # col.bin rows are collected into blocks, delta coded tlv.bin rows
+        # are encoded here, everything else is bytes
+        put = self._buffer_record
+        if self._columns is not None:
+            put = self._add_row if self._max_records < math.inf else self._columns.add
+        elif self._chained:
+            put = self._put_chained
+
+        for item in items:
+            kind = type(item)
+            stamp = 0.0
+
+            if kind is _Marked:
+                if item.lost:
+                    self._write_gap(item.lost)
+                stamp = item.t
+                if stamp:
+                    stamps.append(stamp)
+                item = item.item
+                kind = type(item)
+
+            if kind is _PackedBatch:
+                self._buffer_packed(item)
+                records += len(item)
+            elif kind is _Batch:
+                if to_bytes:
+                    # csv lines are formatted here, on the worker
+                    start = time.perf_counter()
+                    item = list(map(to_bytes, item))
+                    metrics.encode.observe((time.perf_counter() - start) / len(item), len(item))
+                for record in item:
+                    put(record)
+                records += len(item)
+            else:
+                if to_bytes:
+                    if stamp:
+                        start = time.perf_counter()
+                        item = to_bytes(item)
+                        metrics.encode.observe(time.perf_counter() - start)
+                    else:
+                        item = to_bytes(item)
+                put(item)
+                records += 1
+
+        # One write for the whole drained batch
+        self._flush_wbuf()
+
+        metrics.records_written += records
+        if stamps:
+            now = time.perf_counter()
+            for t in stamps:
+                metrics.latency.observe(now - t)
+        return records
+
+    # =========================== WORKER STEPS ========================
+    def _to_bytes(self):
+        return _csv_line if self.file_type == "csv" else None
+
+    def _writing(self):
+        # A thread still writes this Logger's records: its worker, or for a
+        # named stream the scheduler thread it belongs to
+        if self._hub is not None:
+            scheduler = self._hub._scheduler
+            return scheduler is not None and scheduler.writes(self)
+        return self._worker is not None and self._worker.is_alive()
+
+    def _alive(self):
+        # Worker keeps going until stopped and everything published is written
+        if self._ring is not None:
+            return self._running or self._ring.readable() or self._ring_gaps or self._shared_pending()
+        return self._running or not self.q.empty() or self._shared_pending()
+
+    def _step(self, to_bytes=None, timeout=0):
+        # Write one batch (at most BATCH_SIZE records), returns how many
+        if self._ring is not None:
+            count = self._consume_ring(self._ring, self._ring_gaps)
+        else:
+            count = 0
+            items = self._drain(timeout)
+            if items:
+                try:
+                    count = self._write_items(items, to_bytes)
+                finally:
+                    for _ in items:
+                        self.q.task_done()
 
+        if self._channels:
+            count += self._drain_shared()
+        if self._rotate_at is not None:
+            self._rotation_due()
+        if self._durability != "none":
+            self._group_commit()
+        return count
+
+    def _group_commit(self):
+        # interval/bytes: sync once enough time or data has piled up since
+        # the last sync; checked after every batch and on idle polls
+        unsynced = self.metrics.bytes_written - self._synced_bytes
+        if not unsynced or self._fh is None:
+            return
+        if self._durability == "interval":
+            if time.monotonic() - self._synced_at < self._sync_interval:
+                return
+        elif self._durability != "bytes" or unsynced < self._sync_bytes:
+            return
+        self._sync()
 
-                    f.write(record)
-                    current_size += size
-                    # sec_count += 1
+    def _sync(self):
+        start = time.perf_counter()
+        self.file_manager.sync()
+        self._synced_bytes = self.metrics.bytes_written
+        self._synced_at = time.monotonic()
+        self.metrics.fsync.observe(time.perf_counter() - start)
 
-                    # if end - start >= 1.0:
-                    #     print(f"[Worker] Exc: {sec_count}")
-                    #     sec_count = 0
-                    #     start = end
+    def _finish(self):
+        try:
+            if self._ring is None:
+                self._write_trailing_gap()
+        finally:
+            self._close_current()
+            self._close_shared()
+            self.file_manager.shutdown()
+            self._worker_done()
+
+    # =========================== BYTE WORKER LOOP ========================
+    def _byte_worker(self, to_bytes=None):
+        self._open_current()
 
-                    self.q.task_done()
+        try:
+            while self._alive():
+                # Poll faster while other processes publish through shared channels
+                self._step(to_bytes, 0.001 if self._channels else 0.1)
+        finally:
+            self._finish()
+
+    # =========================== RING WORKER ========================
+    def _consume_ring(self, ring, gaps=None):
+        offset, count = ring.read_region(settings.BATCH_SIZE)
+        if gaps:
+            count = self._ring_gap(ring, gaps, count)
+        if not count:
+            return 0
+
+        # Slots are read in place and only released once written
+        if ring.fixed:
+            end = offset + count * ring.slot_size
+            with ring.data[offset:end] as region:
+                self._buffer_packed(_PackedBatch(region, ring.slot_size), direct=True)
+        else:
+            for record in ring.records(offset, count):
+                self._buffer_record(record)
+            self._flush_wbuf()
+
+        ring.release(count)
+        self.metrics.records_written += count
+
+        if ring is self._ring:
+            self.metrics.observe_depth(ring.readable() + count)
+            stamps = self._ring_stamps
+            if stamps:
+                tail = ring.tail()
+                now = time.perf_counter()
+                while stamps and stamps[0][0] < tail:
+                    self.metrics.latency.observe(now - stamps.popleft()[1])
+        return count
+
+    def _ring_gap(self, ring, gaps, count):
+        # Write the markers that are due and stop the region at the next gap
+        tail = ring.tail()
+        while gaps:
+            with self.overflow.lock:
+                seq, lost = gaps[0]
+                if seq > tail:
+                    return min(count, seq - tail)
+                gaps.popleft()
+            self._write_gap(lost)
+            self._flush_wbuf()
+        return count
+
+    def ring_worker(self):
+        try:
+            idle = settings.MAX_LINGER_MS / 1000 or 0.001
+            self._open_current()
 
+            try:
+                while self._alive():
+                    if not self._step():
+                        time.sleep(idle)
             finally:
-                f.close()
+                self._finish()
+        except Exception as e:
+            print(f"Exception in Ring Worker: {e}")
+
+    # =========================== BIN WORKER ========================
+    def bin_worker(self):
+        try:
+            self._byte_worker()
         except Exception as e:
             print(f"Exception in Bin Worker: {e}")
 
     # =========================== TLV BIN WORKER ========================
     def tlv_worker(self):
         try:
-            max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-            current_size = 0
-            # start = time.time()
-            # sec_count = 0
-
-            f = open(self.file_manager.current_file, "ab")
-
-            f.write(self.headers_blob)
-            f.flush()
-
-            current_size = len(self.headers_blob)
-
-            try:
-                while self._running or not self.q.empty():
-                    # end = time.time()
-                    try:
-                        record = self.q.get(timeout=0.1)
-                    except queue.Empty:
-                        continue
-
-                    size = len(record)
-
-                    if current_size + size >= max_bytes:
-                        f.close()
-
-                        self.file_manager.current_file = self.file_manager._new_log_file()
-                        f = open(self.file_manager.current_file, "ab")
-                        current_size = 0
-                        self.file_no += 1
-
-                        if self.headers_blob:
-                            f.write(self.headers_blob)
-                            f.flush()
-                            current_size += len(self.headers_blob)
-
-                        if self.file_no >= settings.MAX_FILES:
-                            self.file_manager.compress_logs()
-                            self.file_no -= 1
-
-            
-                    f.write(record)
-                    current_size += size
-                    # sec_count += 1
-
-                    # if end - start >= 1.0:
-                    #     print(f"[Worker] Exc: {sec_count}")
-                    #     sec_count = 0
-                    #     start = end
-
-                    self.q.task_done()
-
-            finally:
-                f.close()
+            self._byte_worker()
         except Exception as e:
             print(f"Exception in TLV Bin Worker: {e}")
 
+    # =========================== COLUMNAR WORKER ========================
+    def col_worker(self):
+        try:
+            self._byte_worker()
+        except Exception as e:
+            print(f"Exception in Columnar Worker: {e}")
 
     # =========================== CSV WORKER ========================
     def csv_worker(self):
         try:
-            max_bytes = settings.MAX_FILE_SIZE_MB * 1024 * 1024
-            current_size = 0
-
-            f = open(self.file_manager.current_file, "ab")
-
-            if self.headers_blob:
-                f.write(self.headers_blob)
-                f.flush()
-                current_size += len(self.headers_blob)
-
-            try:
-                while self._running or not self.q.empty():
-                    try:
-                        record = self.q.get(timeout=0.1)
-                    except queue.Empty:
-                        continue
-
-                    line = ",".join(map(str, record)) + "\n"
-
-                    encoded = line.encode("utf-8")
-                    size = len(encoded)
-
-                    if current_size + size >= max_bytes:
-                        f.close()
-
-                        self.file_manager.current_file = self.file_manager._new_log_file()
-                        f = open(self.file_manager.current_file, "ab")
-                        current_size = 0
-                        self.file_no += 1
-
-                        if self.headers_blob:
-                            f.write(self.headers_blob)
-                            f.flush()
-                            current_size += len(self.headers_blob)
-
-                        if self.file_no >= settings.MAX_FILES:
-                            self.file_manager.compress_logs()
-                            self.file_no -= 1
-
-                    f.write(encoded)
-                    current_size += size
-                    self.q.task_done()
-
-            finally:
-                f.close()
+            self._byte_worker(_csv_line)
         except Exception as e:
             print(f"Exception in CSV worker: {e}")
 
@@ -483,6 +1717,10 @@ class Logger:
         try:
             # Excel hard limit ≈ 1,048,576
             MAX_ROWS = settings.XLSX_MAX_ROWS
+            if settings.ROTATION_RECORDS:
+                MAX_ROWS = min(MAX_ROWS, settings.ROTATION_RECORDS + (1 if self.schema else 0))
+            every = settings.ROTATION_INTERVAL_S
+            rotate_at = time.monotonic() + every if every else None
             wb = Workbook(write_only=True)
             ws = wb.create_sheet(title="log")
             row_count = 0
@@ -508,29 +1746,51 @@ class Logger:
                     except queue.Empty:
                         continue
 
+                    self.metrics.observe_depth(self.q.qsize() + 1)
+
+                    stamp = 0.0
+                    if type(record) is _Marked:
+                        if record.lost:
+                            ws.append(["#gap", record.lost])
+                            row_count += 1
+                            self.overflow.add("gaps")
+                        stamp = record.t
+                        record = record.item
+
+                    records = record if type(record) is _Batch else (record,)
+
                     try:
-                        ws.append(list(record))
-                        row_count += 1
+                        for row in records:
+                            ws.append(list(row))
+                            row_count += 1
+
+                            # Rotate XLSX file
+                            if row_count >= MAX_ROWS or (rotate_at is not None and time.monotonic() >= rotate_at):
+                                start = time.perf_counter()
+                                rotate_at = time.monotonic() + every if every else None
+                                wb.save(self.file_manager.current_file)
+                                self.metrics.bytes_written += self.file_manager.current_file.stat().st_size
+                                # self._compress_event.set()
+
+                                # Setup new workbook
+                                self.file_manager.current_file = self.file_manager._new_log_file()
+                                wb = Workbook(write_only=True)
+                                ws, row_count = prepare_new_sheet(wb)
+                                self.file_no += 1
+
+                                self._compress_rotated()
+
+                                self.metrics.files_rotated += 1
+                                self.metrics.rotation.observe(time.perf_counter() - start)
+
+                        # Rows are in the workbook; the file is only written on save
+                        self.metrics.records_written += len(records)
+                        if stamp:
+                            self.metrics.latency.observe(time.perf_counter() - stamp)
                     finally:
                         # Always mark task done even if append fails
                         self.q.task_done()
 
-                    # Rotate XLSX file
-                    if row_count >= MAX_ROWS:
-                        wb.save(self.file_manager.current_file)
-                        # self._compress_event.set()
-
-                        # Setup new workbook
-                        self.file_manager.current_file = self.file_manager._new_log_file()
-                        wb = Workbook(write_only=True)
-                        ws, row_count = prepare_new_sheet(wb)
-                        self.file_no += 1
-
-                        if self.file_no >= settings.MAX_FILES:
-                            self.file_manager.compress_logs()
-                            self.file_no -= 1
-
-
             except Exception as e:
                 # Log your error here so the thread doesn't die silently
                 print(f"Worker error: {e}")
@@ -538,10 +1798,104 @@ class Logger:
                 # Only save if we actually wrote data beyond the header
                 # or if the file doesn't exist yet.
                 try:
+                    if self._gap_lost:
+                        ws.append(["#gap", self._gap_lost])
+                        self.overflow.add("gaps")
+                        self._gap_lost = 0
                     wb.save(self.file_manager.current_file)
                     wb.close()
+                    self.metrics.bytes_written += self.file_manager.current_file.stat().st_size
                 except Exception:
                     pass
+                self.file_manager.shutdown()
+                self._worker_done()
 
         except Exception as e:
             print(f"Exception in XLSX Worker: {e}")
+
+    def xlsx_segment_worker(self):
+        # Deferred xlsx: rows are encoded to the segment of the current
+        # workbook, which the FileManager renders in its process pool
+        try:
+            MAX_ROWS = settings.XLSX_MAX_ROWS
+            if settings.ROTATION_RECORDS:
+                MAX_ROWS = min(MAX_ROWS, settings.ROTATION_RECORDS + 1)
+            every = settings.ROTATION_INTERVAL_S
+            rotate_at = time.monotonic() + every if every else None
+            header = xlsx_render.segment_header(self.schema)
+            encode = xlsx_render.segment_encoder(self.schema).encode
+
+            def open_segment():
+                seg = open(xlsx_render.segment_path(self.file_manager.current_file), "wb", buffering=1024 * 1024)
+                seg.write(header)
+                return seg, 1   # the header row
+
+            seg, row_count = open_segment()
+
+            try:
+                while self._running or not self.q.empty():
+                    try:
+                        record = self.q.get(timeout=0.5)
+                    except queue.Empty:
+                        continue
+
+                    self.metrics.observe_depth(self.q.qsize() + 1)
+
+                    stamp = 0.0
+                    if type(record) is _Marked:
+                        if record.lost:
+                            seg.write(binary_format.tlv2_gap_record(record.lost))
+                            row_count += 1
+                            self.overflow.add("gaps")
+                        stamp = record.t
+                        record = record.item
+
+                    records = record if type(record) is _Batch else (record,)
+
+                    try:
+                        for row in records:
+                            try:
+                                seg.write(encode(row))
+                            except (TypeError, ValueError):
+                                seg.write(encode(xlsx_render.plain_row(row, len(self.schema))))
+                            row_count += 1
+
+                            # Rotate: the finished segment is rendered in the background
+                            if row_count >= MAX_ROWS or (rotate_at is not None and time.monotonic() >= rotate_at):
+                                start = time.perf_counter()
+                                rotate_at = time.monotonic() + every if every else None
+                                seg.close()
+                                self.file_manager.render(self.file_manager.current_file)
+
+                                self.file_manager.current_file = self.file_manager._new_log_file()
+                                seg, row_count = open_segment()
+                                self.file_no += 1
+
+                                self._compress_rotated()
+
+                                self.metrics.files_rotated += 1
+                                self.metrics.rotation.observe(time.perf_counter() - start)
+
+                        self.metrics.records_written += len(records)
+                        if stamp:
+                            self.metrics.latency.observe(time.perf_counter() - stamp)
+                    finally:
+                        self.q.task_done()
+
+            except Exception as e:
+                print(f"Worker error: {e}")
+            finally:
+                try:
+                    if self._gap_lost:
+                        seg.write(binary_format.tlv2_gap_record(self._gap_lost))
+                        self.overflow.add("gaps")
+                        self._gap_lost = 0
+                    seg.close()
+                    self.file_manager.render(self.file_manager.current_file)
+                except Exception as e:
+                    print(f"Exception in XLSX Segment Worker: {e}")
+                self.file_manager.shutdown()
+                self._worker_done()
+
+        except Exception as e:
+            print(f"Exception in XLSX Segment Worker: {e}")
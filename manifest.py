@@ -0,0 +1,374 @@
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from compressors import compressed_suffixes
+
+try:
+    import fcntl
+except ImportError:     # Windows: no advisory locks, every active file counts as interrupted
+    fcntl = None
+
+MANIFEST_NAME = ".log_manifest.json"
+LOCK_NAME = ".log_manifest.lock"
+MANIFEST_VERSION = 1
+
+ACTIVE = "active"
+RAW = "raw"
+COMPRESSED = "compressed"
+
+
+# Lock fds open in this process. A forked child (a process pool worker)
+# closes its copies: a flock belongs to the open file and would otherwise
+# stay taken for as long as the child lives.
+_held = set()
+_held_lock = threading.Lock()
+
+
+def _open_held(path, flags):
+    with _held_lock:
+        fd = os.open(path, flags, 0o644)
+        _held.add(fd)
+    return fd
+
+
+def _close_held(fd):
+    with _held_lock:
+        _held.discard(fd)
+        os.close(fd)
+
+
+def _after_fork_in_child():
+    for fd in _held:
+        try:
+            os.close(fd)
+        except OSError:
+            pass
+    _held.clear()
+    _held_lock.release()
+
+
+if fcntl is not None:
+    os.register_at_fork(before=_held_lock.acquire, after_in_parent=_held_lock.release,
+                        after_in_child=_after_fork_in_child)
+
+
+def lock_file(path, exclusive=False, wait=True):
+    # Advisory lock on a log file: a writer holds a shared one as long as the
+    # file is active, recovery takes an exclusive one. Locks belong to the
+    # open file, so two Loggers of one process exclude each other as well.
+    # Returns the fd for unlock_file(); BlockingIOError when another holder
+    # has it and wait is False
+    if fcntl is None:
+        return None
+    fd = _open_held(path, os.O_RDONLY)
+    try:
+        fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | (0 if wait else fcntl.LOCK_NB))
+    except BaseException:
+        _close_held(fd)
+        raise
+    return fd
+
+
+def unlock_file(fd):
+    if fd is not None:
+        _close_held(fd)
+
+
+def in_use(path):
+    # A live writer holds the file (see lock_file); files gone are not in use
+    try:
+        unlock_file(lock_file(path, exclusive=True, wait=False))
+    except BlockingIOError:
+        return True
+    except FileNotFoundError:
+        pass
+    return False
+
+
+@contextmanager
+def _directory_lock(path):
+    # Serialises the read-merge-write of the index between processes
+    if fcntl is None:
+        yield
+        return
+    fd = _open_held(path, os.O_RDWR | os.O_CREAT)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        yield
+    finally:
+        _close_held(fd)
+
+
+def _is_log_file(name):
+    return not name.startswith(".log_manifest") and not name.endswith((".part", ".idx", ".tmp", ".seg", ".spare"))
+
+
+# One manifest per directory and process, whichever Logger opens it first
+_manifests = {}
+_manifests_lock = threading.Lock()
+
+
+def for_directory(log_dir: Path):
+    # The manifest every FileManager of log_dir in this process shares. One
+    # already loaded is brought up to date first (refresh).
+    key = Path(log_dir).resolve()
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+        if manifest is None:
+            _manifests[key] = LogManifest.load(log_dir)
+            return _manifests[key]
+    manifest.refresh()
+    return manifest
+
+
+def is_closed(path):
+    # True when the manifest next to path lists it as closed at its current
+    # size, so its end is data and not the zeroed tail of a preallocated file
+    # that is still open or was cut short. Only reads the index file.
+    path = Path(path)
+    try:
+        with open(path.parent / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            entry = json.load(f)["files"].get(path.name)
+        return entry is not None and entry[2] != ACTIVE and entry[1] == path.stat().st_size
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        return False
+
+
+class LogManifest:
+    # In-memory, ordered view of the files in a log directory:
+    #   name -> [created, size, state]
+    # Updated incrementally by FileManager and persisted atomically to a
+    # small index file so a restart does not have to scan the directory.
+    # Loggers in other processes write the same index: every save merges
+    # their entries in, ours win for the names changed since the last save.
+
+    def __init__(self, log_dir: Path):
+        self.log_dir = Path(log_dir)
+        self.path = self.log_dir / MANIFEST_NAME
+        self.lock_path = self.log_dir / LOCK_NAME
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._dirty = set()     # names added, changed or dropped since the last save
+        self._total = 0
+        self.interrupted = []   # names that were still active when loaded, oldest first
+
+    # =========================== LOAD / SAVE ========================
+    @classmethod
+    def load(cls, log_dir: Path):
+        manifest = cls(log_dir)
+
+        try:
+            with open(manifest.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                raise ValueError(f"Unknown manifest version {data.get('version')}")
+            for name, (created, size, state) in data["files"].items():
+                manifest._entries[name] = [created, size, state]
+                manifest._total += size
+            manifest.reconcile()
+        except FileNotFoundError:
+            manifest.rebuild()
+        except Exception as e:
+            print(f"[Logger] Manifest {manifest.path} unreadable ({e}), rescanning directory")
+            manifest.rebuild()
+
+        manifest._close_interrupted()
+        return manifest
+
+    def refresh(self):
+        # Another Logger of this process joins: take in what other processes
+        # saved since, the files on disk, and files left active by a Logger
+        # that is gone
+        with self._lock:
+            self._merge()
+            self.reconcile()
+            self._close_interrupted()
+
+    def _close_interrupted(self):
+        # Whatever was being written when the last run stopped is finished now;
+        # files another live Logger holds are still being written
+        with self._lock:
+            names = [name for name in self.files(ACTIVE) if not in_use(self.log_dir / name)]
+            self.interrupted += [name for name in names if name not in self.interrupted]
+            for name in names:
+                state = COMPRESSED if name.endswith(compressed_suffixes()) else RAW
+                self.close_active(self.log_dir / name, state)
+
+    def rebuild(self):
+        with self._lock:
+            self._dirty.update(self._entries)
+            self._entries.clear()
+            self._total = 0
+
+            for f in self.log_dir.iterdir():
+                if not f.is_file() or not _is_log_file(f.name):
+                    continue
+                st = f.stat()
+                state = COMPRESSED if f.name.endswith(compressed_suffixes()) else RAW
+                self._entries[f.name] = [st.st_mtime, st.st_size, state]
+                self._dirty.add(f.name)
+                self._total += st.st_size
+
+            self.save()
+
+    def reconcile(self):
+        # One pass over the names in the directory: files the index missed
+        # are added, entries whose file is gone dropped. Only new files are stat'ed.
+        with self._lock:
+            try:
+                with os.scandir(self.log_dir) as it:
+                    names = {e.name for e in it if _is_log_file(e.name) and e.is_file()}
+            except FileNotFoundError:
+                names = set()
+            changed = False
+            for name in list(self._entries):
+                if name not in names:
+                    changed |= self._drop(name)
+            for name in names - self._entries.keys():
+                try:
+                    st = (self.log_dir / name).stat()
+                except FileNotFoundError:
+                    continue
+                if in_use(self.log_dir / name):
+                    state = ACTIVE      # another Logger has just created it
+                else:
+                    state = COMPRESSED if name.endswith(compressed_suffixes()) else RAW
+                self._entries[name] = [st.st_mtime, st.st_size, state]
+                self._dirty.add(name)
+                self._total += st.st_size
+                changed = True
+            if changed:
+                self.save()
+
+    def save(self):
+        with self._lock, _directory_lock(self.lock_path):
+            self._merge()
+            data = {
+                "version": MANIFEST_VERSION,
+                "files": self._entries,
+            }
+            # Own tmp name: a Logger without fcntl may save at the same time
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            # dumps() takes the C encoder, dump() encodes chunk by chunk in Python
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(data, separators=(",", ":")))
+            os.replace(tmp, self.path)
+            self._dirty.clear()
+
+    def _merge(self):
+        # What other processes saved since: their entries for every name this
+        # one did not touch, including their removals
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") != MANIFEST_VERSION:
+                return
+            files = data["files"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return
+        for name in list(self._entries):
+            if name not in files and name not in self._dirty:
+                del self._entries[name]
+        for name, entry in files.items():
+            if name not in self._dirty:
+                self._entries[name] = list(entry)
+        self._total = sum(entry[1] for entry in self._entries.values())
+
+    # =========================== UPDATES ========================
+    def add(self, path: Path, state=ACTIVE, size=0, created=None):
+        with self._lock:
+            self._drop(path.name)
+            self._entries[path.name] = [created or time.time(), size, state]
+            self._dirty.add(path.name)
+            self._total += size
+            self.save()
+
+    def close_active(self, path: Path, state=RAW):
+        # Rotation: the finished file's real size is one stat away
+        with self._lock:
+            if self._close(path, state):
+                self.save()
+
+    def rotated(self, closed: Path, state, path: Path):
+        # Rotation with one save: the finished file closed, the next one added
+        with self._lock:
+            self._close(closed, state)
+            self._drop(path.name)
+            self._entries[path.name] = [time.time(), 0, ACTIVE]
+            self._dirty.add(path.name)
+            self.save()
+
+    def _close(self, path, state):
+        entry = self._entries.get(path.name)
+        if entry is None:
+            return False
+        try:
+            size = path.stat().st_size
+        except FileNotFoundError:
+            return self._drop(path.name)
+        self._total += size - entry[1]
+        entry[1] = size
+        entry[2] = state
+        self._dirty.add(path.name)
+        return True
+
+    def reopen(self, path: Path):
+        # A file interrupted by a crash is written again (FileManager.resume)
+        with self._lock:
+            entry = self._entries.get(path.name)
+            if entry is not None:
+                entry[2] = ACTIVE
+                self._dirty.add(path.name)
+                self.save()
+
+    def compressed(self, src: Path, dst: Path, size):
+        # The archive keeps the original's creation time, so age order holds
+        with self._lock:
+            entry = self._entries.get(src.name)
+            created = entry[0] if entry else time.time()
+            self._drop(src.name)
+            self._entries[dst.name] = [created, size, COMPRESSED]
+            self._dirty.add(dst.name)
+            self._total += size
+            self.save()
+
+    def remove(self, path: Path):
+        with self._lock:
+            if self._drop(path.name):
+                self.save()
+
+    def _drop(self, name):
+        entry = self._entries.pop(name, None)
+        if entry is None:
+            return False
+        self._dirty.add(name)
+        self._total -= entry[1]
+        return True
+
+    # =========================== QUERIES ========================
+    def files(self, state=None):
+        # Names oldest first
+        with self._lock:
+            items = [
+                (entry[0], name) for name, entry in self._entries.items()
+                if state is None or entry[2] == state
+            ]
+        items.sort()
+        return [name for _, name in items]
+
+    def size_of(self, name):
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry[1] if entry else 0
+
+    def total_size(self):
+        return self._total
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __len__(self):
+        return len(self._entries)
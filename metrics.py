@@ -0,0 +1,196 @@
+import os
+import json
+import time
+
+# Histogram bucket i holds durations below 2**i microseconds
+_BUCKETS = 26           # up to ~33 s, the last bucket takes everything longer
+
+
+class Histogram:
+    # Log2 buckets in microseconds: one multiply and a bit_length per sample.
+    # Updated by one thread each, read by snapshot() without locking.
+
+    def __init__(self):
+        self.counts = [0] * _BUCKETS
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds, n=1):
+        i = int(seconds * 1_000_000).bit_length()
+        self.counts[i if i < _BUCKETS else _BUCKETS - 1] += n
+        self.count += n
+        self.sum += seconds * n
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        # Upper bound of the bucket holding the q-th sample
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min((1 << i) / 1_000_000, self.max)
+        return self.max
+
+    def snapshot(self):
+        return {
+            "count": self.count,
+            "sum_s": self.sum,
+            "mean_s": self.sum / self.count if self.count else 0.0,
+            "p50_s": self.quantile(0.5),
+            "p99_s": self.quantile(0.99),
+            "max_s": self.max,
+            "buckets_us": {str(1 << i): c for i, c in enumerate(self.counts) if c},
+        }
+
+
+class LoggerMetrics:
+    # Counters and timings of one Logger. Hot paths only add to plain
+    # attributes; rates and quantiles are worked out in snapshot().
+
+    def __init__(self, file_type=None):
+        self.file_type = file_type
+        self.started = time.time()
+        self._started = time.monotonic()
+
+        # Worker
+        self.records_written = 0
+        self.bytes_written = 0
+        self.queue_high_water = 0
+        self.files_rotated = 0
+
+        self.latency = Histogram()          # publish -> written (sampled records)
+        self.encode = Histogram()           # per record; csv is formatted by the worker
+        self.rotation = Histogram()
+        self.compress_logs = Histogram()    # time the worker spends in FileManager.compress_logs
+        self.compression = Histogram()      # one background compression job
+        self.render = Histogram()           # one background xlsx rendering job
+        self.fsync = Histogram()            # one durability sync of the current file
+
+    def observe_depth(self, depth):
+        if depth > self.queue_high_water:
+            self.queue_high_water = depth
+
+    def snapshot(self, since=None):
+        # Rates over the interval since `since`, an earlier snapshot the
+        # caller kept, or since the start. Leaves no state behind, so every
+        # consumer (exporter, callers of metrics_snapshot) has its own interval.
+        uptime = time.monotonic() - self._started
+        records, written = self.records_written, self.bytes_written
+
+        if since is None:
+            elapsed, prev_records, prev_bytes = uptime, 0, 0
+        else:
+            elapsed = uptime - since["uptime_s"]
+            prev_records, prev_bytes = since["records_written"], since["bytes_written"]
+        elapsed = elapsed or 1e-9
+
+        return {
+            "time": time.time(),
+            "uptime_s": uptime,
+            "file_type": self.file_type,
+            "records_written": records,
+            "bytes_written": written,
+            "records_per_s": (records - prev_records) / elapsed,
+            "bytes_per_s": (written - prev_bytes) / elapsed,
+            "queue_high_water": self.queue_high_water,
+            "files_rotated": self.files_rotated,
+            "latency": self.latency.snapshot(),
+            "encode": self.encode.snapshot(),
+            "rotation": self.rotation.snapshot(),
+            "compress_logs": self.compress_logs.snapshot(),
+            "compression": self.compression.snapshot(),
+            "render": self.render.snapshot(),
+            "fsync": self.fsync.snapshot(),
+        }
+
+
+# =========================== EXPORT ========================
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def write_json(path, snapshot):
+    _write_atomic(path, json.dumps(snapshot, indent=2))
+
+
+def _prom_histogram(lines, name, series, key):
+    lines.append(f"# TYPE {name} histogram")
+    for labels, snap in series:
+        hist = snap[key]
+        cumulative = 0
+        for i in range(_BUCKETS):
+            cumulative += int(hist["buckets_us"].get(str(1 << i), 0))
+            if cumulative:
+                lines.append(f'{name}_bucket{{{labels},le="{(1 << i) / 1_000_000:g}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist["count"]}')
+        lines.append(f"{name}_sum{{{labels}}} {hist['sum_s']:.9f}")
+        lines.append(f"{name}_count{{{labels}}} {hist['count']}")
+
+
+def to_prometheus(snapshot):
+    # The Logger's own series plus one labelled set per named stream
+    series = []
+    if snapshot["file_type"]:
+        series.append((f'file_type="{snapshot["file_type"]}"', snapshot))
+    for name, snap in snapshot.get("streams", {}).items():
+        series.append((f'file_type="{snap["file_type"]}",stream="{name}"', snap))
+    lines = []
+
+    def metric(name, kind, value):
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, snap in series:
+            lines.append(f"{name}{{{labels}}} {value(snap)}")
+
+    metric("logger_records_written_total", "counter", lambda s: s["records_written"])
+    metric("logger_bytes_written_total", "counter", lambda s: s["bytes_written"])
+    metric("logger_records_per_second", "gauge", lambda s: f"{s['records_per_s']:.3f}")
+    metric("logger_bytes_per_second", "gauge", lambda s: f"{s['bytes_per_s']:.3f}")
+    metric("logger_queue_depth", "gauge", lambda s: s["queue_depth"])
+    metric("logger_queue_capacity", "gauge", lambda s: s["queue_capacity"])
+    metric("logger_queue_high_water", "gauge", lambda s: s["queue_high_water"])
+    metric("logger_files_rotated_total", "counter", lambda s: s["files_rotated"])
+    metric("logger_dropped_total", "counter", lambda s: s["dropped_count"])
+
+    lines.append("# TYPE logger_overflow_total counter")
+    for labels, snap in series:
+        for reason, value in snap["overflow"]["totals"].items():
+            lines.append(f'logger_overflow_total{{{labels},reason="{reason}"}} {value}')
+
+    metric("logger_compression_pending", "gauge",
+           lambda s: (s.get("compression_jobs") or {}).get("pending", 0))
+    metric("logger_compression_failed_total", "counter",
+           lambda s: (s.get("compression_jobs") or {}).get("failed", 0))
+
+    # Free space of the log directory: 0 normal, 1 compress, 2 sample, 3 stop
+    metric("logger_disk_mode", "gauge", lambda s: (s.get("disk") or {}).get("level", 0))
+    metric("logger_disk_free_bytes", "gauge", lambda s: (s.get("disk") or {}).get("free_bytes", 0))
+    metric("logger_disk_used_percent", "gauge", lambda s: (s.get("disk") or {}).get("used_percent", 0))
+    lines.append("# TYPE logger_disk_transitions_total counter")
+    for labels, snap in series:
+        for mode, value in ((snap.get("disk") or {}).get("transitions") or {}).items():
+            lines.append(f'logger_disk_transitions_total{{{labels},mode="{mode}"}} {value}')
+
+    for key, name in (
+        ("latency", "logger_publish_to_write_seconds"),
+        ("encode", "logger_encode_seconds"),
+        ("rotation", "logger_rotation_seconds"),
+        ("compress_logs", "logger_compress_logs_seconds"),
+        ("compression", "logger_compression_seconds"),
+        ("render", "logger_xlsx_render_seconds"),
+        ("fsync", "logger_fsync_seconds"),
+    ):
+        _prom_histogram(lines, name, series, key)
+
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, snapshot):
+    _write_atomic(path, to_prometheus(snapshot))
@@ -0,0 +1,94 @@
+import os
+import mmap
+
+
+class MmapFile:
+    # Write-only log file backed by a shared memory mapping.
+    #
+    # The file is preallocated to `capacity` bytes when it is opened, writes
+    # are plain copies into the mapping (no syscall, no user space buffer),
+    # and close() truncates the file to the bytes actually written. A record
+    # that does not fit grows the mapping.
+    #
+    # Callers may also copy into `buffer` at tell() themselves and commit()
+    # the bytes afterwards, the mapping is then their write buffer.
+
+    def __init__(self, path, capacity):
+        self.path = path
+        self.capacity = max(int(capacity), mmap.PAGESIZE)
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self._pos = os.fstat(self._fd).st_size     # append after existing data
+            self._synced = self._pos
+            self.capacity = max(self.capacity, self._pos + mmap.PAGESIZE)
+            self._preallocate(self.capacity)
+            self._map = mmap.mmap(self._fd, self.capacity)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _preallocate(self, size):
+        # Real blocks where the filesystem supports it, a sparse file otherwise
+        try:
+            os.posix_fallocate(self._fd, 0, size)
+        except (AttributeError, OSError):
+            os.ftruncate(self._fd, size)
+
+    @property
+    def closed(self):
+        return self._map is None
+
+    @property
+    def buffer(self):
+        return self._map
+
+    def tell(self):
+        return self._pos
+
+    def commit(self, size):
+        # `size` bytes were copied into buffer at tell()
+        self._pos += size
+
+    def write(self, data):
+        size = len(data)
+        end = self._pos + size
+        if end > self.capacity:
+            self._grow(end)
+
+        self._map[self._pos:end] = data
+        self._pos = end
+        return size
+
+    def _grow(self, needed):
+        capacity = max(needed, self.capacity * 2)
+        self._preallocate(capacity)
+        self._map.resize(capacity)
+        self.capacity = capacity
+
+    def flush(self):
+        # Written bytes are already in the page cache, nothing to hand over
+        pass
+
+    def sync(self):
+        # Force the pages written since the last sync to disk
+        start = self._synced - self._synced % mmap.PAGESIZE
+        if self._pos > start:
+            self._map.flush(start, self._pos - start)
+        self._synced = self._pos
+
+    def close(self):
+        if self._map is None:
+            return
+        try:
+            self._map.close()
+            os.ftruncate(self._fd, self._pos)
+        finally:
+            self._map = None
+            os.close(self._fd)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,71 @@
+import time
+import threading
+from collections import deque
+
+# What publish does when the queue/ring is full
+POLICIES = ("drop_newest", "drop_oldest", "block", "sample")
+
+# Records lost, by reason
+LOSS_COUNTERS = ("dropped_newest", "dropped_oldest", "sampled_out", "block_timeouts", "oversized", "disk_sampled", "disk_full")
+# Events that lose nothing
+EVENT_COUNTERS = ("blocked", "gaps")
+
+
+class OverflowStats:
+    # Exact overflow counters, in total and per time window. Windows are
+    # aligned to window_s; windows without any overflow are not listed.
+
+    def __init__(self, policy, window_s=1, windows=60):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown overflow policy {policy!r}, use one of {', '.join(POLICIES)}")
+
+        self.policy = policy
+        self.window_s = window_s
+        self.lock = threading.Lock()
+
+        self.totals = dict.fromkeys(LOSS_COUNTERS + EVENT_COUNTERS, 0)
+        self.blocked_s = 0.0
+        self._window_start = None
+        self._window = None
+        self.history = deque(maxlen=windows)
+
+    def count(self, counter, n=1):
+        # Caller holds self.lock
+        self.totals[counter] += n
+        self._current()[counter] += n
+
+    def add(self, counter, n=1):
+        with self.lock:
+            self.count(counter, n)
+
+    def add_blocked(self, seconds):
+        with self.lock:
+            self.count("blocked")
+            self.blocked_s += seconds
+
+    def _current(self):
+        now = time.time()
+        start = now - now % self.window_s
+        if start != self._window_start:
+            if self._window is not None:
+                self.history.append((self._window_start, self._window))
+            self._window_start = start
+            self._window = dict.fromkeys(LOSS_COUNTERS + EVENT_COUNTERS, 0)
+        return self._window
+
+    def lost(self):
+        return sum(self.totals[k] for k in LOSS_COUNTERS)
+
+    def snapshot(self):
+        with self.lock:
+            windows = list(self.history)
+            if self._window is not None:
+                windows.append((self._window_start, dict(self._window)))
+
+            return {
+                "policy": self.policy,
+                "lost": self.lost(),
+                "totals": dict(self.totals),
+                "blocked_s": self.blocked_s,
+                "windows": [{"start": start, **counts} for start, counts in windows],
+            }
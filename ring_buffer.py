@@ -0,0 +1,145 @@
+import struct
+
+# Control block lives inside the buffer itself (head and tail on separate
+# cache lines) so the same ring also works over shared memory.
+#   head: u64  slots committed by the producer (monotonic)
+#   tail: u64  slots released by the consumer (monotonic)
+_HEAD = 0
+_TAIL = 8            # index into the u64 view -> byte offset 64
+CONTROL_SIZE = 128
+
+_LEN = struct.Struct("<H")
+
+
+class RingBuffer:
+    # Single-producer / single-consumer ring of fixed size slots.
+    #
+    # fixed=True : every record is exactly slot_size bytes, so a run of slots
+    #              is byte-for-byte what goes into the file.
+    # fixed=False: a slot holds [u16 len][payload], payload <= slot_size - 2.
+
+    def __init__(self, slots, slot_size, fixed=True, buffer=None, create=True):
+        if slots <= 0 or slot_size <= 0:
+            raise ValueError("Ring needs a positive slot count and slot size")
+        if not fixed and slot_size > 0xFFFF + 2:
+            raise ValueError("Variable slots are limited to 65537 bytes")
+
+        self.slots = slots
+        self.slot_size = slot_size
+        self.fixed = fixed
+        self.max_record = slot_size if fixed else slot_size - 2
+
+        size = self.required_size(slots, slot_size)
+        if buffer is None:
+            buffer = bytearray(size)
+        elif len(buffer) < size:
+            raise ValueError(f"Ring buffer needs {size} bytes, got {len(buffer)}")
+
+        self.buffer = buffer
+        self._view = memoryview(buffer)
+        self._ctl = self._view[:CONTROL_SIZE].cast("Q")
+        self.data = self._view[CONTROL_SIZE:size]
+
+        if create:
+            self._ctl[_HEAD] = 0
+            self._ctl[_TAIL] = 0
+
+    @staticmethod
+    def required_size(slots, slot_size):
+        return CONTROL_SIZE + slots * slot_size
+
+    def release_views(self):
+        # Needed before closing a shared memory block backing the ring
+        self.data.release()
+        self._ctl.release()
+        self._view.release()
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+
+    # =========================== PRODUCER ========================
+    def claim(self):
+        # Byte offset of the next free slot in self.data, or -1 when full
+        head = self._ctl[_HEAD]
+        if head - self._ctl[_TAIL] >= self.slots:
+            return -1
+        return (head % self.slots) * self.slot_size
+
+    def commit(self):
+        self._ctl[_HEAD] += 1
+
+    def fits(self, size):
+        return size == self.slot_size if self.fixed else size <= self.max_record
+
+    def put(self, record):
+        size = len(record)
+        if not self.fits(size):
+            return False
+
+        offset = self.claim()
+        if offset < 0:
+            return False
+
+        if self.fixed:
+            self.data[offset:offset + size] = record
+        else:
+            _LEN.pack_into(self.data, offset, size)
+            self.data[offset + 2:offset + 2 + size] = record
+
+        self.commit()
+        return True
+
+    def put_packed(self, data):
+        # Fixed mode: copy back to back records, at most two copies on wrap.
+        # Returns how many records were written.
+        slot_size = self.slot_size
+        count = len(data) // slot_size
+        head = self._ctl[_HEAD]
+        count = min(count, self.slots - (head - self._ctl[_TAIL]))
+
+        written = 0
+        with memoryview(data) as src:
+            while written < count:
+                index = (head + written) % self.slots
+                run = min(count - written, self.slots - index)
+                start = index * slot_size
+                end = start + run * slot_size
+                self.data[start:end] = src[written * slot_size:(written + run) * slot_size]
+                written += run
+
+        self._ctl[_HEAD] = head + written
+        return written
+
+    def head(self):
+        # Sequence number the next committed slot will get
+        return self._ctl[_HEAD]
+
+    # =========================== CONSUMER ========================
+    def tail(self):
+        return self._ctl[_TAIL]
+
+    def readable(self):
+        return self._ctl[_HEAD] - self._ctl[_TAIL]
+
+    def read_region(self, max_slots):
+        # (byte offset, slot count) of committed slots that are contiguous in
+        # memory; the caller reads them in place and then calls release()
+        tail = self._ctl[_TAIL]
+        available = self._ctl[_HEAD] - tail
+        if not available:
+            return 0, 0
+
+        index = tail % self.slots
+        count = min(available, self.slots - index, max_slots)
+        return index * self.slot_size, count
+
+    def records(self, offset, count):
+        # Variable mode: payload views of `count` slots starting at offset
+        data = self.data
+        slot_size = self.slot_size
+        for _ in range(count):
+            size = _LEN.unpack_from(data, offset)[0]
+            yield data[offset + 2:offset + 2 + size]
+            offset += slot_size
+
+    def release(self, count):
+        self._ctl[_TAIL] += count
@@ -10,9 +10,9 @@ def realtime_hms_ms():
     return now.strftime("%H:%M:%S") + f":{now.microsecond // 1000:03d}"
 
 
-# def time_to_ms(t: str) -> int:
-#     h, m, s, ms = map(int, t.split(":"))
-#     return ((h * 3600 + m * 60 + s) * 1000) + ms
+def time_to_ms(t: str) -> int:
+    h, m, s, ms = map(int, t.split(":"))
+    return ((h * 3600 + m * 60 + s) * 1000) + ms
 
 
 # ---------------- TLV helpers ----------------
@@ -61,14 +61,15 @@ def main():
     logger = Logger()
     logger.initialize("bin", compress=True)
 
+    # Typed fields -> fixed width records packed with one precompiled struct
     logger.headers(
-        "timestamp",
-        "degrees0", "degrees1",
-        "volts0", "amps0", "watts0",
-        "volts1", "amps1", "watts1",
-        "satellite_count",
-        "heading",
-        "latitude", "longitude"
+        "timestamp:u32",
+        "degrees0:f32", "degrees1:f32",
+        "volts0:f32", "amps0:f32", "watts0:f32",
+        "volts1:f32", "amps1:f32", "watts1:f32",
+        "satellite_count:u8",
+        "heading:f32",
+        "latitude:f32", "longitude:f32"
     )
 
     logger.start()
@@ -111,14 +112,14 @@ def main():
             pref = time.time()
 
             logger.publish([
-                realtime_hms_ms(),
-                "195.029296875", "314.12109375",
-                "24.0538711547852", "-0.014181817881763", "-0.238541349768639",
-                "-0.006679157260805", "0.018545454367995", "-0.079513780772686",
-                "9",
-                "233.245483398438",
-                "22.5792655944824",
-                "75.7095489501953"
+                time_to_ms(realtime_hms_ms()),
+                195.029296875, 314.12109375,
+                24.0538711547852, -0.014181817881763, -0.238541349768639,
+                -0.006679157260805, 0.018545454367995, -0.079513780772686,
+                9,
+                233.245483398438,
+                22.5792655944824,
+                75.7095489501953
             ], encode=True)
             # logger.publish(binary_data)
 
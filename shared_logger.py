@@ -0,0 +1,212 @@
+import struct
+from multiprocessing import shared_memory, resource_tracker
+
+from ring_buffer import RingBuffer
+import binary_format
+
+# Channel layout in one shared memory block:
+#   [0:1024)  metadata written by the Logger, counters written by the producer
+#   [1024: )  RingBuffer (control block + slots)
+CHANNEL_MAGIC = b"SHL2"
+META_SIZE = 1024
+
+_META = struct.Struct("<4sIIBB")    # magic, slots, slot_size, fixed, TLV v2 float32 mode
+_FLOAT32 = ("never", "exact", "always")
+_COUNTERS_OFFSET = 16               # u64 published, u64 dropped (producer owned)
+_SPEC_OFFSET = 32                   # u16 len + "file_type\nheader\nheader...",
+                                    # then u16 len + the file header the Logger writes
+
+
+# =========================== CHANNEL (LOGGER SIDE) ========================
+class SharedChannel:
+    # Logger side of one producer process: owns the shared memory block
+
+    def __init__(self, file_type, header_specs, headers_blob, slots, slot_size, fixed, float32="exact"):
+        spec = "\n".join((file_type, *header_specs)).encode("utf-8")
+        blob = bytes(headers_blob or b"")
+        if _SPEC_OFFSET + 4 + len(spec) + len(blob) > META_SIZE:
+            raise ValueError("Schema too large for a shared channel header")
+
+        size = META_SIZE + RingBuffer.required_size(slots, slot_size)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.name = self.shm.name
+
+        buf = self.shm.buf
+        _META.pack_into(buf, 0, CHANNEL_MAGIC, slots, slot_size, 1 if fixed else 0, _FLOAT32.index(float32))
+        struct.pack_into("<QQ", buf, _COUNTERS_OFFSET, 0, 0)
+        struct.pack_into("<H", buf, _SPEC_OFFSET, len(spec))
+        buf[_SPEC_OFFSET + 2:_SPEC_OFFSET + 2 + len(spec)] = spec
+        pos = _SPEC_OFFSET + 2 + len(spec)
+        struct.pack_into("<H", buf, pos, len(blob))
+        buf[pos + 2:pos + 2 + len(blob)] = blob
+
+        self.ring = RingBuffer(slots, slot_size, fixed=fixed, buffer=buf[META_SIZE:size])
+
+    def stats(self):
+        published, dropped = struct.unpack_from("<QQ", self.shm.buf, _COUNTERS_OFFSET)
+        return {
+            "published": published,
+            "dropped": dropped,
+            "pending": self.ring.readable(),
+        }
+
+    def close(self):
+        self.ring.release_views()
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+# =========================== PRODUCER (OTHER PROCESS) ========================
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)  # Python 3.13+
+    except TypeError:
+        pass
+
+    # Children started by multiprocessing share the Logger's resource tracker,
+    # where registering again is harmless. A standalone process gets its own
+    # tracker, which would unlink the Logger's block when the process exits.
+    inherited = resource_tracker._resource_tracker._fd is not None
+    shm = shared_memory.SharedMemory(name=name)
+    if not inherited:
+        resource_tracker.unregister(shm._name, "shared_memory")
+    return shm
+
+
+class SharedLogger:
+    # Publishes into a channel created by Logger.shared_channel() from another
+    # process. One SharedLogger per channel, used from a single thread.
+
+    def __init__(self, channel_name):
+        self.shm = _attach(channel_name)
+
+        buf = self.shm.buf
+        magic, slots, slot_size, fixed, float32 = _META.unpack_from(buf, 0)
+        if magic != CHANNEL_MAGIC:
+            self.shm.close()
+            raise ValueError(f"{channel_name} is not a logger channel")
+
+        spec_len = struct.unpack_from("<H", buf, _SPEC_OFFSET)[0]
+        file_type, *header_specs = bytes(
+            buf[_SPEC_OFFSET + 2:_SPEC_OFFSET + 2 + spec_len]
+        ).decode("utf-8").split("\n")
+        pos = _SPEC_OFFSET + 2 + spec_len
+        blob_len = struct.unpack_from("<H", buf, pos)[0]
+        blob = bytes(buf[pos + 2:pos + 2 + blob_len])
+
+        self.file_type = file_type
+        self.ring = RingBuffer(
+            slots, slot_size, fixed=bool(fixed),
+            buffer=buf[META_SIZE:META_SIZE + RingBuffer.required_size(slots, slot_size)],
+            create=False,
+        )
+        self._counters = buf[_COUNTERS_OFFSET:_COUNTERS_OFFSET + 16].cast("Q")
+
+        # Encode exactly like the Logger does for this schema. The record
+        # layout comes from the header of the Logger's file, not from this
+        # process's settings, which a spawned or separate process may not share.
+        from logger import Logger, _csv_line
+        self._encoder = Logger()
+        self._encoder.file_type = file_type
+        self._struct = None
+        match file_type:
+            case "bin" if blob:
+                header = binary_format.parse_header(blob)
+                self._encoder.schema = header["schema"]
+                if header["types"]:
+                    gap_markers = bool(header["flags"] & binary_format.LOG1_FLAG_GAP_MARKERS)
+                    self._struct = binary_format.compile_struct(header["types"], gap_markers)
+                    self._encoder.field_types = header["types"]
+                    self._encoder._bin_struct = self._struct
+            case "tlv.bin" if blob:
+                header = binary_format.parse_header(blob)
+                self._encoder.schema = header["schema"]
+                if header["version"] == binary_format.TLV2_VERSION:
+                    # Ring records are never chained: no deltas or dictionary
+                    # references, which only the worker can write in file order
+                    self._encoder._tlv2 = binary_format.Tlv2Encoder(
+                        len(header["schema"]), _FLOAT32[float32], header["delta"]
+                    )
+            case "bin" | "col.bin":
+                self._encoder.schema = tuple(binary_format.parse_field(h)[0] for h in header_specs) or None
+            case _:
+                self._encoder.schema = tuple(header_specs) or None
+        self.schema = self._encoder.schema
+        self._csv_line = _csv_line
+
+        # Fixed slots hold exactly one record of the file's layout
+        if fixed and (self._struct is None or self._struct.size != slot_size):
+            self.close()
+            raise ValueError(f"{channel_name}: producer record layout does not match the logger's file")
+
+    @property
+    def published_count(self):
+        return self._counters[0]
+
+    @property
+    def dropped_count(self):
+        return self._counters[1]
+
+    def _encode(self, values):
+        if isinstance(values, (bytes, bytearray)):
+            return values
+
+        if isinstance(values, dict):
+            values = [values.get(k) for k in self.schema]
+
+        match self.file_type:
+            case "csv":
+                return self._csv_line(values)
+            case "bin":
+                return self._encoder._encode_record_bin(values)
+            case "tlv.bin":
+                return self._encoder._encode_record_tlvbin(values)
+            case _:
+                raise ValueError(f"Unsupported file type: {self.file_type}")
+
+    # =========================== PUBLISH ========================
+    def publish(self, values):
+        ring = self.ring
+
+        # Typed bin: pack straight into the shared slot
+        if self._struct is not None and not isinstance(values, (bytes, bytearray)):
+            if isinstance(values, dict):
+                values = [values.get(k) for k in self.schema]
+
+            offset = ring.claim()
+            if offset < 0:
+                self._counters[1] += 1
+                return False
+
+            self._struct.pack_into(ring.data, offset, *values)
+            ring.commit()
+            self._counters[0] += 1
+            return True
+
+        if ring.put(self._encode(values)):
+            self._counters[0] += 1
+            return True
+
+        self._counters[1] += 1
+        return False
+
+    def publish_many(self, records):
+        written = 0
+        for values in records:
+            written += self.publish(values)
+        return written
+
+    def close(self):
+        self._counters.release()
+        self.ring.release_views()
+        self._encoder = None
+        self.shm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
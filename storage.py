@@ -1,15 +1,36 @@
+import os
+import time
 import shutil
+import threading
+from collections import deque
 from global_config import settings
 
+# What the logger does as the log directory's filesystem fills up, mildest first
+DISK_MODES = ("normal", "compress", "sample", "stop")
+DISK_NORMAL, DISK_COMPRESS, DISK_SAMPLE, DISK_STOP = range(len(DISK_MODES))
+
+
+def disk_usage(path):
+    # (total, free) bytes of the filesystem holding path; free is what an
+    # unprivileged process may still write, like df's "Avail"
+    try:
+        st = os.statvfs(path)
+        return st.f_blocks * st.f_frsize, st.f_bavail * st.f_frsize
+    except AttributeError:
+        usage = shutil.disk_usage(path)     # no statvfs on Windows
+        return usage.total, usage.free
+
+
 class SystemStorage:
-    
-    def __init__(self, threshold_value: int = settings.STORAGE_THRESHOLD_PERCENT):
-        
+
+    def __init__(self, threshold_value: int = settings.STORAGE_THRESHOLD_PERCENT, path=None):
+
         self.threshold = threshold_value
+        self.path = path or settings.LOG_DIRECTORY
 
     def checking(self):
-        usage = shutil.disk_usage("/")
-        used_percentage = (usage.used / usage.total) * 100
+        total, free = disk_usage(self.path)
+        used_percentage = (total - free) / total * 100
 
         if used_percentage >= self.threshold:
             raise RuntimeError(
@@ -18,3 +39,100 @@ class SystemStorage:
 
         return True
 
+
+class DiskMonitor:
+    # Polls the filesystem of the log directory every interval_s on its own
+    # thread and caches the result, so the hot path only reads self.mode.
+    # levels are the used percentages where compress, sample and stop start;
+    # a mode is only left again once usage is margin points below its level.
+
+    def __init__(self, path, interval_s=None, levels=None, margin=None, history=32):
+        self.path = path
+        self.interval_s = interval_s if interval_s is not None else settings.STORAGE_POLL_INTERVAL_S
+        self.levels = tuple(levels) if levels is not None else (
+            settings.STORAGE_COMPRESS_PERCENT,
+            settings.STORAGE_SAMPLE_PERCENT,
+            settings.STORAGE_THRESHOLD_PERCENT,
+        )
+        if list(self.levels) != sorted(self.levels):
+            raise ValueError(f"Disk levels must grow from compress to sample to stop, got {self.levels}")
+        self.margin = margin if margin is not None else settings.STORAGE_RECOVER_MARGIN_PERCENT
+
+        self.total = 0
+        self.free = 0
+        self.used_percent = 0.0
+        self.mode = DISK_NORMAL
+        self.checked_at = None
+        self.last_error = None
+        self.transitions = dict.fromkeys(DISK_MODES, 0)    # times each mode was entered
+        self.history = deque(maxlen=history)                # (time, old, new, used_percent)
+        self.listeners = []                                 # fn(old, new), called on the poll thread
+
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.poll()
+
+    def _mode_for(self, used):
+        level = sum(used >= limit for limit in self.levels)
+        if level >= self.mode:
+            return level
+        # Going down: only as far as the margin allows
+        return min(self.mode, sum(used >= limit - self.margin for limit in self.levels))
+
+    def poll(self):
+        try:
+            total, free = disk_usage(self.path)
+        except OSError as e:
+            self.last_error = e     # keeps the last known mode
+            print(f"Exception in disk monitor: {e}")
+            return self.mode
+
+        used = (total - free) / total * 100 if total else 0.0
+        with self._lock:
+            self.total, self.free, self.used_percent = total, free, used
+            self.checked_at = time.time()
+            old, new = self.mode, self._mode_for(used)
+            if new != old:
+                self.mode = new
+                self.transitions[DISK_MODES[new]] += 1
+                self.history.append((self.checked_at, DISK_MODES[old], DISK_MODES[new], round(used, 2)))
+            listeners = list(self.listeners) if new != old else ()
+
+        if listeners:
+            print(f"[Logger] Disk {used:.1f}% used ({free / 1024 ** 2:.0f} MB free) on {self.path}: {DISK_MODES[old]} -> {DISK_MODES[new]}")
+        for listener in listeners:
+            try:
+                listener(old, new)
+            except Exception as e:
+                print(f"Exception in disk mode listener: {e}")
+        return new
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            self.poll()
+
+    def start(self):
+        if self._thread is None and self.interval_s > 0:
+            self._thread = threading.Thread(target=self._run, name="disk-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "mode": DISK_MODES[self.mode],
+                "level": self.mode,
+                "total_bytes": self.total,
+                "free_bytes": self.free,
+                "used_percent": round(self.used_percent, 2),
+                "checked_at": self.checked_at,
+                "transitions": dict(self.transitions),
+                "history": list(self.history),
+                "last_error": str(self.last_error) if self.last_error else None,
+            }
@@ -0,0 +1,82 @@
+import re
+import time
+import threading
+from global_config import settings
+
+STREAM_NAME = re.compile(r"[A-Za-z][A-Za-z0-9_-]*")
+
+
+class StreamScheduler:
+    # A small fixed pool of writer threads shared by the named streams of a
+    # Logger. Every stream belongs to one thread (its files are only touched
+    # by that thread); a thread gives its streams turns in round robin, one
+    # batch of at most BATCH_SIZE records each, so a busy stream cannot
+    # starve the quiet ones.
+
+    def __init__(self, workers=1):
+        self._groups = [[] for _ in range(max(int(workers), 1))]
+        self._threads = []
+        self._lock = threading.Lock()
+        self._added = 0
+        self._closing = False
+
+    def add(self, stream):
+        # The stream's current file is opened here, its writes happen on the pool
+        stream._open_current()
+
+        with self._lock:
+            group = self._groups[self._added % len(self._groups)]
+            self._added += 1
+            group.append(stream)
+
+            if not self._threads:
+                for i, g in enumerate(self._groups):
+                    thread = threading.Thread(
+                        target=self._run, args=(g,), name=f"stream-writer-{i}", daemon=True
+                    )
+                    thread.start()
+                    self._threads.append(thread)
+
+    def writes(self, stream):
+        # The stream is on a writer thread: started and not finished yet
+        with self._lock:
+            return any(stream in group for group in self._groups)
+
+    def close(self):
+        # Threads exit once all of their streams are stopped and written out
+        self._closing = True
+
+    def join(self, timeout=None):
+        for thread in tuple(self._threads):
+            thread.join(timeout)
+
+    def _run(self, group):
+        idle = settings.MAX_LINGER_MS / 1000 or 0.001
+
+        while True:
+            with self._lock:
+                streams = tuple(group)
+            if not streams and self._closing:
+                return
+
+            written = 0
+            for stream in streams:
+                try:
+                    written += stream._step(stream._to_bytes())
+                    if stream._alive():
+                        continue
+                except Exception as e:
+                    print(f"Exception in stream {stream.stream_name}: {e}")
+                    stream._enabled = False
+                    stream._running = False
+
+                # Stopped and drained (or failed): close its files, drop it
+                with self._lock:
+                    group.remove(stream)
+                try:
+                    stream._finish()
+                except Exception as e:
+                    print(f"Exception in stream {stream.stream_name}: {e}")
+
+            if not written:
+                time.sleep(idle)
@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import struct
+from pathlib import Path
+from openpyxl import Workbook
+import binary_format
+
+# Deferred xlsx: the worker writes every rotation's rows to a segment file
+# (TLV v2, float64 floats, no deltas or dictionaries) next to the workbook,
+# log_<time>.xlsx.seg. A process pool turns it into log_<time>.xlsx, the
+# only place openpyxl runs, and deletes the segment.
+SEGMENT_SUFFIX = ".seg"
+
+_F32 = struct.Struct("<f")
+_F64 = struct.Struct("<d")
+
+
+def segment_path(path):
+    return Path(path).with_name(Path(path).name + SEGMENT_SUFFIX)
+
+
+def segment_encoder(schema):
+    return binary_format.Tlv2Encoder(len(schema), "never")
+
+
+def segment_header(schema):
+    return binary_format.build_tlv1_header(schema, binary_format.TLV2_VERSION)
+
+
+def plain_row(row, width):
+    # Values the segment cannot hold (datetime, Decimal, ...) as their text,
+    # rows cut or padded to the header
+    row = [v if v is None or isinstance(v, (bool, int, float, str, bytes)) else str(v) for v in row]
+    return row[:width] + [None] * (width - len(row))
+
+
+# =========================== READING ========================
+def segment_rows(data, pos):
+    # Rows (or ["#gap", lost]) of the segment records from pos on; a record
+    # cut short by a crash ends it
+    read_varint = binary_format.read_varint
+    end = len(data)
+
+    while pos < end:
+        try:
+            length, body = read_varint(data, pos)
+        except IndexError:
+            break
+        stop = body + length
+        if not length or stop > end:
+            break
+
+        row = []
+        while body < stop:
+            kind = data[body]
+            body += 1
+            if kind == binary_format.TLV2_INT:
+                value, body = read_varint(data, body)
+                row.append(binary_format.unzigzag(value))
+            elif kind == binary_format.TLV2_FLOAT64:
+                row.append(_F64.unpack_from(data, body)[0])
+                body += 8
+            elif kind == binary_format.TLV2_FLOAT32:
+                row.append(_F32.unpack_from(data, body)[0])
+                body += 4
+            elif kind in (binary_format.TLV2_STRING, binary_format.TLV2_BYTES):
+                size, body = read_varint(data, body)
+                raw = bytes(data[body:body + size])
+                body += size
+                # Excel cells have no bytes type
+                row.append(raw.decode("utf-8") if kind == binary_format.TLV2_STRING else raw.hex())
+            elif kind == binary_format.TLV2_TRUE:
+                row.append(True)
+            elif kind == binary_format.TLV2_FALSE:
+                row.append(False)
+            elif kind == binary_format.TLV2_NONE:
+                row.append(None)
+            elif kind == binary_format.TLV2_GAP:
+                value, body = read_varint(data, body)
+                row = ["#gap", value]
+            else:
+                raise ValueError(f"Unexpected value type {kind} in xlsx segment")
+        yield row
+        pos = stop
+
+
+# =========================== RENDERING ========================
+def render_segment(segment, target):
+    # Runs in the render pool. Writes the workbook next to the target and
+    # renames it into place, then drops the segment.
+    # Returns (workbook size, rows, seconds).
+    start = time.perf_counter()
+    with open(segment, "rb") as f:
+        data = f.read()
+    header = binary_format.parse_header(data)
+    schema = header["schema"]
+    rows = 0
+
+    part = str(target) + ".part"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title="log")
+    if schema:
+        ws.append(list(schema))
+    for row in segment_rows(data, header["header_size"]):
+        ws.append(row)
+        rows += 1
+    try:
+        wb.save(part)
+    except BaseException:
+        try:
+            os.unlink(part)
+        except FileNotFoundError:
+            pass
+        raise
+    os.replace(part, target)
+    os.unlink(segment)
+    return os.path.getsize(target), rows, time.perf_counter() - start
+
+
+def main():
+    # python xlsx_render.py LOG_DIR... : render segments left by a crash
+    for arg in sys.argv[1:]:
+        path = Path(arg)
+        segments = sorted(path.glob("*.xlsx" + SEGMENT_SUFFIX)) if path.is_dir() else [path]
+        for segment in segments:
+            target = segment.with_name(segment.name[:-len(SEGMENT_SUFFIX)])
+            try:
+                size, rows, seconds = render_segment(segment, target)
+            except Exception as e:
+                print(f"Exception in render_segment: {e}")
+                continue
+            print(f"{segment.name} -> {target.name}: {rows} rows, {size} bytes in {seconds:.2f} s")
+
+
+if __name__ == "__main__":
+    main()